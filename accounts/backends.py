@@ -0,0 +1,43 @@
+"""
+Authentication backend that caches the per-request user lookup.
+"""
+
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+
+from .models import user_cache_key
+
+
+class CachedModelBackend(ModelBackend):
+    """
+    ModelBackend that serves session user lookups from the cache.
+
+    Every authenticated request resolves the session's user id to a user
+    object; this backend keeps that object in the cache for
+    ``AUTH_USER_CACHE_TTL`` seconds instead of querying ``CustomUser`` each
+    time. Entries are dropped as soon as the user is saved or deleted (see
+    ``accounts.models``), which covers password, role and activation changes.
+    The short TTL bounds staleness when the cache is not shared between
+    worker processes.
+    """
+
+    def get_user(self, user_id):
+        """Return the active user with ``user_id`` from the cache or the database."""
+        key = user_cache_key(user_id)
+        user = cache.get(key)
+        if user is None:
+            user = super().get_user(user_id)
+            if user is not None:
+                cache.set(key, user, settings.AUTH_USER_CACHE_TTL)
+        return user
+
+    async def aget_user(self, user_id):
+        """Async counterpart of ``get_user``."""
+        key = user_cache_key(user_id)
+        user = await cache.aget(key)
+        if user is None:
+            user = await super().aget_user(user_id)
+            if user is not None:
+                await cache.aset(key, user, settings.AUTH_USER_CACHE_TTL)
+        return user
@@ -1,5 +1,7 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
 from django.shortcuts import redirect
 from django.urls import reverse
+from django.utils.functional import cached_property
 
 
 class ForcePasswordChangeMiddleware:
@@ -11,9 +13,13 @@ class ForcePasswordChangeMiddleware:
     redirects them to a password-change page before allowing access to
     the rest of the site.
 
-    It is executed before and after every request.
+    It is executed before and after every request. The middleware supports
+    both WSGI and ASGI, so async views are not forced through a thread.
     """
 
+    sync_capable = True
+    async_capable = True
+
     def __init__(self, get_response):
         """
         Initialize the ForcePasswordChangeMiddleware.
@@ -22,6 +28,8 @@ class ForcePasswordChangeMiddleware:
             get_response (callable): The next middleware or view in the request chain.
         """
         self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
 
     def __call__(self, request):
         """
@@ -39,26 +47,56 @@ class ForcePasswordChangeMiddleware:
             HttpResponse: The response returned by the next middleware or view,
             or a redirect response if a password change is required.
         """
-        user = getattr(request, "user", None)
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
 
-        if not user or not user.is_authenticated:
-            return self.get_response(request)
+        if self._requires_password_change(request, getattr(request, "user", None)):
+            return redirect("first_login_password")
+        return self.get_response(request)
 
-        first_login_url = reverse("first_login_password")
-        login_url = reverse("login")
-        logout_url = reverse("logout")
-        safe_exact = {first_login_url, login_url, logout_url}
-        safe_prefixes = (
-            "/static/",
-            "/media/",
-        )
+    async def __acall__(self, request):
+        """Async counterpart of ``__call__``; loads the user with ``request.auser()``."""
+        user = await request.auser() if hasattr(request, "auser") else None
+        if self._requires_password_change(request, user):
+            return redirect("first_login_password")
+        return await self.get_response(request)
+
+    def _requires_password_change(self, request, user):
+        """
+        Check whether the request must be redirected to the password change page.
+
+        Args:
+            request (HttpRequest): The incoming HTTP request object.
+            user (User | None): The user making the request.
+
+        Returns:
+            bool: True if the user still has to replace their first-login password.
+        """
+        if not user or not user.is_authenticated:
+            return False
 
         # Avoid redirect loop & allow static/media
-        if request.path in safe_exact or any(request.path.startswith(p) for p in safe_prefixes):
-            return self.get_response(request)
+        safe_exact, safe_prefixes = self.safe_paths
+        if request.path in safe_exact or request.path.startswith(safe_prefixes):
+            return False
 
         # Force first-time password update
-        if getattr(user, "first_login", False):
-            return redirect("first_login_password")
+        return bool(getattr(user, "first_login", False))
 
-        return self.get_response(request)
+    @cached_property
+    def safe_paths(self):
+        """
+        Paths that never trigger the password-change redirect.
+
+        Resolved on first use rather than in ``__init__`` so the URLconf is
+        only imported once the first request arrives.
+
+        Returns:
+            tuple[frozenset[str], tuple[str, ...]]: Exact paths and path prefixes.
+        """
+        safe_exact = frozenset({reverse("first_login_password"), reverse("login"), reverse("logout")})
+        safe_prefixes = (
+            "/static/",
+            "/media/",
+        )
+        return safe_exact, safe_prefixes
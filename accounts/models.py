@@ -1,6 +1,17 @@
 from django.contrib.auth.models import AbstractUser
+from django.core.cache import cache
 from django.core.validators import RegexValidator
 from django.db import models
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+ROLE_COUNTS_CACHE_KEY = "auth:role_counts"
+ROLE_COUNTS_TTL = 60 * 60  # dropped on every user save/delete anyway
+
+
+def user_cache_key(user_id):
+    """Return the cache key under which ``CachedModelBackend`` stores a session user."""
+    return f"auth:user:{user_id}"
 
 
 class CustomUser(AbstractUser):
@@ -57,3 +68,26 @@ class CustomUser(AbstractUser):
             str: The username of the user.
         """
         return self.username
+
+
+def role_counts():
+    """
+    Return the number of users per role, including roles nobody has.
+
+    The grouped count is cached until a user is saved or deleted.
+
+    Returns:
+        dict[str, int]: Count per role value, in ``ROLE_CHOICES`` order.
+    """
+    counts = cache.get(ROLE_COUNTS_CACHE_KEY)
+    if counts is None:
+        grouped = dict(CustomUser.objects.order_by().values_list("role").annotate(n=models.Count("id")))
+        counts = {role: grouped.get(role, 0) for role, _ in CustomUser.ROLE_CHOICES}
+        cache.set(ROLE_COUNTS_CACHE_KEY, counts, ROLE_COUNTS_TTL)
+    return counts
+
+
+@receiver([post_save, post_delete], sender=CustomUser)
+def invalidate_cached_user(sender, instance, **kwargs):
+    """Drop the cached session user and role counts so the next request sees the saved changes."""
+    cache.delete_many([user_cache_key(instance.pk), ROLE_COUNTS_CACHE_KEY])
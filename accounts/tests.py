@@ -1,5 +1,6 @@
 from django.contrib.auth import get_user_model
 from django.contrib.messages import get_messages
+from django.core.cache import cache
 from django.test import Client, TestCase
 from django.urls import reverse
 
@@ -226,6 +227,15 @@ class AccountsEdgeCaseTests(TestCase):
         response = self.client.post(reverse("login"), {"username": "firstlogin", "password": "TempPass123!"}, follow=True)
         self.assertRedirects(response, reverse("first_login_password"))
 
+    async def test_first_login_redirect_on_async_path(self):
+        await self.async_client.aforce_login(self.first_login_user)
+        response = await self.async_client.get(reverse("get_projects"))
+        self.assertRedirects(response, reverse("first_login_password"), fetch_redirect_response=False)
+
+        await self.async_client.aforce_login(self.staff)
+        response = await self.async_client.get(reverse("get_projects"))
+        self.assertEqual(response.status_code, 200)
+
     # ---------------- SIGNUP VIEW EDGE CASES ----------------
     def test_signup_view_invalid_role(self):
         self.client.login(username="superadmin", password="SuperAdmin123!")
@@ -331,3 +341,42 @@ class AccountsEdgeCaseTests(TestCase):
         self.assertFalse(user.first_login)
         response = self.client.get(reverse("dashboard"))
         self.assertEqual(response.status_code, 200)
+
+
+class CachedSessionUserTests(TestCase):
+    """Tests for the cached session user lookup and the middleware fast path."""
+
+    def setUp(self):
+        cache.clear()
+        self.staff = User.objects.create_user(username="staff", password="Staff123!", role="inventory", first_login=False)
+        self.client.force_login(self.staff)
+
+    def test_authenticated_request_reuses_cached_user(self):
+        """Test repeat requests do not query the user or session tables."""
+        self.assertEqual(self.client.get(reverse("dashboard")).status_code, 200)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(reverse("dashboard")).status_code, 200)
+
+    def test_saving_user_invalidates_cache(self):
+        """Test a saved flag change is seen on the very next request."""
+        self.client.get(reverse("dashboard"))
+        self.staff.first_login = True
+        self.staff.save()
+        response = self.client.get(reverse("dashboard"))
+        self.assertRedirects(response, reverse("first_login_password"), fetch_redirect_response=False)
+
+    def test_password_change_ends_other_sessions(self):
+        """Test changing the password invalidates sessions holding the cached user."""
+        self.client.get(reverse("dashboard"))
+        self.staff.set_password("Changed123!")
+        self.staff.save()
+        response = self.client.get(reverse("dashboard"))
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(response.url.startswith(reverse("login")))
+
+    def test_deleted_user_is_logged_out(self):
+        """Test deleting a user removes its cached entry."""
+        self.client.get(reverse("dashboard"))
+        self.staff.delete()
+        response = self.client.get(reverse("dashboard"))
+        self.assertTrue(response.url.startswith(reverse("login")))
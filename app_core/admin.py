@@ -1,7 +1,39 @@
 # Register your models here.
 from django.contrib import admin
 
-from .models import Project, UploadedDR
+from inventory.pagination import EstimatedCountPaginator
+
+from .models import AssetTool, AssetUpdate, Project, UploadedDR
+
+
+@admin.register(AssetTool)
+class AssetToolAdmin(admin.ModelAdmin):
+    list_display = ("tool_name", "assigned_user", "warranty_date", "date_added", "is_deleted")
+    list_filter = ("is_deleted",)
+    search_fields = ("tool_name", "assigned_user")
+    ordering = ("-date_added",)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+@admin.register(AssetUpdate)
+class AssetUpdateAdmin(admin.ModelAdmin):
+    """
+    Admin for asset reassignments, set up for long histories.
+
+    The list joins asset and updater into one query, drills down by
+    ``transaction_date`` through its index, and picks assets and users with
+    autocomplete widgets.
+    """
+
+    list_display = ("asset", "previous_user", "assigned_to", "updated_by", "transaction_date")
+    list_select_related = ("asset", "updated_by")
+    date_hierarchy = "transaction_date"
+    search_fields = ("asset__tool_name", "previous_user", "assigned_to", "remarks")
+    autocomplete_fields = ("asset", "updated_by")
+    ordering = ("-transaction_date",)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 
 @admin.register(Project)
@@ -0,0 +1,103 @@
+"""
+Compare WSGI and ASGI throughput of the read-only JSON endpoints.
+
+Both runs go through the full middleware stack in-process: the WSGI run uses a
+pool of threads each driving a synchronous test client, the ASGI run uses one
+event loop with the same number of concurrent async clients. Network and
+server overhead are excluded, so the numbers isolate the request handling
+itself. Run it against a database that holds realistic data.
+"""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import AsyncClient, Client, override_settings
+from django.urls import reverse
+
+from app_core.models import Project
+from inventory.models import ItemUpdate
+
+
+class Command(BaseCommand):
+    help = "Benchmark the read-only JSON endpoints under WSGI (threads) and ASGI (event loop)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("paths", nargs="*", help="Paths to request (default: project summary lookups).")
+        parser.add_argument("--requests", type=int, default=500, help="Total requests per run.")
+        parser.add_argument("--concurrency", type=int, default=20, help="Concurrent clients per run.")
+
+    def handle(self, *args, **options):
+        paths = options["paths"] or self.default_paths()
+        if not paths:
+            raise CommandError("No projects found; pass the paths to benchmark explicitly.")
+
+        total, concurrency = options["requests"], options["concurrency"]
+        self.stdout.write(f"{total} requests, {concurrency} concurrent, over {len(paths)} path(s)")
+
+        # The test clients always address "testserver"
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"]):
+            for label, run in (("WSGI", self.run_wsgi), ("ASGI", self.run_asgi)):
+                elapsed, errors = run(paths, total, concurrency)
+                line = f"{label}: {total / elapsed:8.1f} req/s  ({elapsed:.2f}s, {errors} non-200)"
+                self.stdout.write(self.style.WARNING(line) if errors else line)
+
+    def default_paths(self):
+        """Build a mix of project summary lookups from the first projects in the database."""
+        paths = [reverse("get_projects")]
+        for project in Project.objects.order_by("id")[:5]:
+            paths.append(reverse("get_project_details", args=[project.id]))
+            dr_no = ItemUpdate.objects.filter(po_client=project.po_no).exclude(dr_no__isnull=True).exclude(dr_no="")
+            dr_no = dr_no.values_list("dr_no", flat=True).first()
+            if dr_no:
+                paths.append(reverse("get_dr_details", args=[dr_no]))
+        return paths if len(paths) > 1 else []
+
+    def run_wsgi(self, paths, total, concurrency):
+        """Issue ``total`` requests from ``concurrency`` threads; return (seconds, errors)."""
+        counter = iter(range(total))
+        lock = threading.Lock()
+        errors = []
+
+        def worker():
+            client = Client()
+            try:
+                while True:
+                    with lock:
+                        index = next(counter, None)
+                    if index is None:
+                        return
+                    if client.get(paths[index % len(paths)]).status_code != 200:
+                        errors.append(index)
+            finally:
+                connections.close_all()
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            for future in [pool.submit(worker) for _ in range(concurrency)]:
+                future.result()
+        return time.perf_counter() - start, len(errors)
+
+    def run_asgi(self, paths, total, concurrency):
+        """Issue ``total`` requests from ``concurrency`` coroutines; return (seconds, errors)."""
+
+        async def main():
+            counter = iter(range(total))
+            errors = []
+
+            async def worker():
+                client = AsyncClient()
+                for index in counter:
+                    response = await client.get(paths[index % len(paths)])
+                    if response.status_code != 200:
+                        errors.append(index)
+
+            start = time.perf_counter()
+            await asyncio.gather(*(worker() for _ in range(concurrency)))
+            return time.perf_counter() - start, len(errors)
+
+        return asyncio.run(main())
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("app_core", "0011_remove_uploadeddr_uploaded_at_uploadeddr_po_number_and_more"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="uploadeddr",
+            name="thumbnail",
+            field=models.ImageField(blank=True, null=True, upload_to="uploaded_drs/thumbnails/"),
+        ),
+    ]
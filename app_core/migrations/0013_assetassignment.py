@@ -0,0 +1,86 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:54
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_assignments(apps, schema_editor):
+    """Create the current assignment of every asset that has a holder."""
+    AssetTool = apps.get_model("app_core", "AssetTool")
+    AssetUpdate = apps.get_model("app_core", "AssetUpdate")
+    AssetAssignment = apps.get_model("app_core", "AssetAssignment")
+
+    latest = {}
+    for update in AssetUpdate.objects.order_by("asset_id", "transaction_date", "id").iterator(chunk_size=2000):
+        latest[update.asset_id] = update
+
+    assignments = []
+    for asset in AssetTool.objects.exclude(assigned_user__isnull=True).exclude(assigned_user="").iterator(chunk_size=2000):
+        update = latest.get(asset.id)
+        if update is None or update.assigned_to != asset.assigned_user:
+            update = None
+        assignments.append(
+            AssetAssignment(
+                asset_id=asset.id,
+                holder=asset.assigned_user,
+                holder_key=" ".join(asset.assigned_user.split()).casefold(),
+                assigned_at=update.transaction_date if update else asset.updated_at,
+                assigned_by_id=update.updated_by_id if update else None,
+                last_update=update,
+            )
+        )
+    AssetAssignment.objects.bulk_create(assignments, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("app_core", "0012_uploadeddr_thumbnail"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="AssetAssignment",
+            fields=[
+                (
+                    "asset",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="assignment",
+                        serialize=False,
+                        to="app_core.assettool",
+                    ),
+                ),
+                ("holder", models.CharField(max_length=255)),
+                ("holder_key", models.CharField(editable=False, help_text="Normalized holder name used for lookups.", max_length=255)),
+                ("assigned_at", models.DateTimeField()),
+                (
+                    "assigned_by",
+                    models.ForeignKey(
+                        blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name="+", to=settings.AUTH_USER_MODEL
+                    ),
+                ),
+                (
+                    "last_update",
+                    models.ForeignKey(
+                        blank=True,
+                        help_text="The update that made this assignment.",
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to="app_core.assetupdate",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(fields=["holder_key", "-assigned_at"], name="assignment_holder_idx"),
+                    models.Index(fields=["-assigned_at"], name="assignment_assigned_at_idx"),
+                ],
+            },
+        ),
+        migrations.RunPython(backfill_assignments, migrations.RunPython.noop),
+    ]
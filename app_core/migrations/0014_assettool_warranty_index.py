@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("app_core", "0013_assetassignment"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="assettool",
+            index=models.Index(condition=models.Q(("is_deleted", False)), fields=["warranty_date", "id"], name="asset_warranty_idx"),
+        ),
+    ]
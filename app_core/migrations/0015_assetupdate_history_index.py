@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:56
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("app_core", "0014_assettool_warranty_index"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="assetupdate",
+            index=models.Index(fields=["asset", "-transaction_date", "-id"], name="assetupdate_history_idx"),
+        ),
+    ]
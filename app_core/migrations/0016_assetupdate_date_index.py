@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:59
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("app_core", "0015_assetupdate_history_index"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="assetupdate",
+            index=models.Index(fields=["transaction_date"], name="assetupdate_date_idx"),
+        ),
+    ]
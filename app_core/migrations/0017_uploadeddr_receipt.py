@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-19 01:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def _key(value):
+    """Frozen copy of ``inventory.models.normalize_ref`` as of this migration."""
+    return (value or "").strip().lower()
+
+
+def link_uploaded_drs(apps, schema_editor):
+    """Attach every uploaded image to its receipt (creating image-only receipts) and count them."""
+    UploadedDR = apps.get_model("app_core", "UploadedDR")
+    DeliveryReceipt = apps.get_model("inventory", "DeliveryReceipt")
+    receipts = {(r.po_key, r.dr_key): r for r in DeliveryReceipt.objects.all()}
+    for upload in UploadedDR.objects.all().iterator(chunk_size=2000):
+        key = (_key(upload.po_number), _key(upload.dr_number))
+        if key not in receipts:
+            receipts[key] = DeliveryReceipt.objects.create(
+                po_key=key[0], dr_key=key[1], po_no=upload.po_number.strip(), dr_no=upload.dr_number.strip()
+            )
+        upload.receipt_id = receipts[key].id
+        upload.save(update_fields=["receipt"])
+    for row in UploadedDR.objects.values("receipt").annotate(n=Count("id")).order_by():
+        DeliveryReceipt.objects.filter(id=row["receipt"]).update(image_count=row["n"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("app_core", "0016_assetupdate_date_index"),
+        ("inventory", "0033_delivery_receipt"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="uploadeddr",
+            name="receipt",
+            field=models.ForeignKey(
+                blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name="images", to="inventory.deliveryreceipt"
+            ),
+        ),
+        migrations.RunPython(link_uploaded_drs, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-19 01:08
+
+from django.db import migrations, models
+
+
+def fill_po_keys(apps, schema_editor):
+    """Store each project's normalized P.O. (a frozen ``normalize_ref``)."""
+    Project = apps.get_model("app_core", "Project")
+    projects = list(Project.objects.all())
+    for project in projects:
+        project.po_key = (project.po_no or "").strip().lower()
+    Project.objects.bulk_update(projects, ["po_key"], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("app_core", "0017_uploadeddr_receipt"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="project",
+            name="po_key",
+            field=models.CharField(
+                blank=True, db_index=True, editable=False, help_text="Normalized P.O. used to match ledger lines.", max_length=50
+            ),
+        ),
+        migrations.RunPython(fill_po_keys, migrations.RunPython.noop),
+    ]
@@ -1,7 +1,57 @@
+from collections import defaultdict
+from datetime import timedelta
+
 from django.conf import settings
 from django.db import models
+from django.db.models import Count, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 from django.utils import timezone
 
+from inventory.models import (
+    DeliveryReceipt,
+    ItemUpdate,
+    ProjectItemRollup,
+    ResourceVersion,
+    normalize_ref,
+)
+
+
+class AssetToolQuerySet(models.QuerySet):
+    """
+    Warranty queries evaluated by the database.
+
+    ``on`` defaults to today (``timezone.now().date()``, as
+    ``AssetTool.is_warranty_active`` uses). Filtering live assets by
+    ``warranty_date`` and ordering by ``(warranty_date, id)`` is served by
+    ``asset_warranty_idx``.
+    """
+
+    def live(self):
+        return self.filter(is_deleted=False)
+
+    def warranty_active(self, on=None):
+        return self.filter(warranty_date__gte=on or timezone.now().date())
+
+    def warranty_expired(self, on=None):
+        return self.filter(warranty_date__lt=on or timezone.now().date())
+
+    def warranty_expiring(self, days=30, on=None):
+        """Assets whose warranty ends between ``on`` and ``days`` days later, inclusive."""
+        on = on or timezone.now().date()
+        return self.filter(warranty_date__range=(on, on + timedelta(days=days)))
+
+    def with_warranty_status(self, on=None):
+        """Annotate ``warranty_is_active`` so the status can be filtered and sorted on."""
+        return self.annotate(
+            warranty_is_active=models.Case(
+                models.When(warranty_date__gte=on or timezone.now().date(), then=models.Value(True)),
+                default=models.Value(False),
+                output_field=models.BooleanField(),
+            )
+        )
+
 
 # Create your models here.
 class AssetTool(models.Model):
@@ -20,10 +70,15 @@ class AssetTool(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     is_deleted = models.BooleanField(default=False)
 
+    objects = AssetToolQuerySet.as_manager()
+
     class Meta:
         ordering = ["-date_added"]
         verbose_name = "Asset/Tool"
         verbose_name_plural = "Assets/Tools"
+        indexes = [
+            models.Index(fields=["warranty_date", "id"], name="asset_warranty_idx", condition=models.Q(is_deleted=False)),
+        ]
 
     def __str__(self):
         return f"{self.tool_name} - {self.date_added}"
@@ -70,13 +125,65 @@ class AssetUpdate(models.Model):
     )
     transaction_date = models.DateTimeField(auto_now_add=True, help_text="The date and time this update was recorded.")
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["asset", "-transaction_date", "-id"], name="assetupdate_history_idx"),
+            models.Index(fields=["transaction_date"], name="assetupdate_date_idx"),
+        ]
+
     def __str__(self):
         return f"Update for {self.asset.tool_name} on {self.transaction_date.strftime('%Y-%m-%d %H:%M:%S')}"
 
 
+def holder_key(name):
+    """Normalize a free-text holder name for lookups: trimmed, single-spaced, case-folded."""
+    return " ".join((name or "").split()).casefold()
+
+
+class AssetAssignment(models.Model):
+    """
+    The current holder of an asset, one row per assigned asset.
+
+    Maintained by signal receivers from ``AssetUpdate`` and ``AssetTool``
+    saves, so "who holds this" and "what does this person hold" are index
+    lookups instead of scans over the update history. Unassigned assets have
+    no row.
+    """
+
+    asset = models.OneToOneField(AssetTool, on_delete=models.CASCADE, primary_key=True, related_name="assignment")
+    holder = models.CharField(max_length=255)
+    holder_key = models.CharField(max_length=255, editable=False, help_text="Normalized holder name used for lookups.")
+    assigned_at = models.DateTimeField()
+    assigned_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name="+")
+    last_update = models.ForeignKey(
+        AssetUpdate, on_delete=models.SET_NULL, null=True, blank=True, related_name="+", help_text="The update that made this assignment."
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["holder_key", "-assigned_at"], name="assignment_holder_idx"),
+            models.Index(fields=["-assigned_at"], name="assignment_assigned_at_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.asset.tool_name} held by {self.holder}"
+
+    def save(self, *args, **kwargs):
+        self.holder_key = holder_key(self.holder)
+        super().save(*args, **kwargs)
+
+    @staticmethod
+    def held_by(name):
+        """Return the live assets currently held by ``name``, most recently assigned first."""
+        return AssetTool.objects.filter(is_deleted=False, assignment__holder_key=holder_key(name)).order_by("-assignment__assigned_at")
+
+
 class Project(models.Model):
     project_title = models.CharField(max_length=255)
     po_no = models.CharField(max_length=50, verbose_name="P.O. No.")
+    po_key = models.CharField(
+        max_length=50, blank=True, db_index=True, editable=False, help_text="Normalized P.O. used to match ledger lines."
+    )
     remarks = models.TextField(blank=True, null=True)
     location = models.CharField(max_length=255, blank=True, null=True)
     created_date = models.DateField(default=timezone.now)
@@ -84,6 +191,10 @@ class Project(models.Model):
     def __str__(self):
         return f"{self.po_no} - {self.project_title}"
 
+    def save(self, *args, **kwargs):
+        self.po_key = normalize_ref(self.po_no)
+        super().save(*args, **kwargs)
+
     class Meta:
         unique_together = ("project_title", "po_no")
 
@@ -92,7 +203,117 @@ class UploadedDR(models.Model):
     dr_number = models.CharField(max_length=100)  # required
     po_number = models.CharField(max_length=100)  # required
     image = models.ImageField(upload_to="uploaded_drs/")  # at least one image required
+    thumbnail = models.ImageField(upload_to="uploaded_drs/thumbnails/", blank=True, null=True)
     uploaded_date = models.DateField()  # manually entered date
+    receipt = models.ForeignKey(DeliveryReceipt, on_delete=models.SET_NULL, null=True, blank=True, related_name="images")
 
     def __str__(self):
         return f"DR: {self.dr_number} | PO: {self.po_number} | {self.image.name}"
+
+    def save(self, *args, **kwargs):
+        """Link the image to the delivery receipt of its P.O. and DR before saving."""
+        previous = self.receipt_id
+        keys = (normalize_ref(self.po_number), normalize_ref(self.dr_number))
+        if self.receipt is None or (self.receipt.po_key, self.receipt.dr_key) != keys:
+            self.receipt = DeliveryReceipt.for_refs(self.po_number, self.dr_number)
+        super().save(*args, **kwargs)
+        if previous and previous != self.receipt_id:
+            count_receipt_images([previous])
+
+
+def count_receipt_images(receipt_ids):
+    """
+    Store the number of linked images in ``image_count`` of each receipt.
+
+    Called after images are written without ``save()`` (``bulk_create``);
+    single saves and deletes are counted by ``count_uploaded_dr_images``.
+    """
+    images = UploadedDR.objects.filter(receipt=OuterRef("pk")).order_by().values("receipt").annotate(n=Count("id")).values("n")
+    DeliveryReceipt.objects.filter(id__in=receipt_ids).update(image_count=Coalesce(Subquery(images), 0))
+
+
+@receiver(post_save, sender=AssetUpdate)
+def record_asset_assignment(sender, instance, created, **kwargs):
+    """Point the asset's current assignment at a newly logged reassignment."""
+    if not created or not instance.assigned_to:
+        return
+    AssetAssignment(
+        asset_id=instance.asset_id,
+        holder=instance.assigned_to,
+        assigned_at=instance.transaction_date,
+        assigned_by=instance.updated_by,
+        last_update=instance,
+    ).save()
+
+
+@receiver(post_save, sender=AssetTool)
+def sync_asset_assignment(sender, instance, **kwargs):
+    """Keep the assignment row in step with ``assigned_user`` when it is set without an AssetUpdate."""
+    assignment = AssetAssignment.objects.filter(asset=instance).first()
+    if not instance.assigned_user:
+        if assignment is not None:
+            assignment.delete()
+    elif assignment is None or assignment.holder != instance.assigned_user:
+        AssetAssignment(asset=instance, holder=instance.assigned_user, assigned_at=instance.updated_at).save()
+
+
+@receiver(post_save, sender=Project)
+def link_project_ledger(sender, instance, **kwargs):
+    """
+    Point the ledger lines of the project's P.O. at the project.
+
+    Covers lines posted before the project existed and a project whose P.O.
+    was edited (its old lines move to whichever project now matches). Lines
+    already linked to another project are left alone.
+    """
+    # A scan per project save, which is rare; the normalized match is done here
+    candidates = Q(project=instance)
+    if instance.po_key:
+        candidates |= Q(po_client__icontains=instance.po_key)
+
+    link, unlink, refs, items = [], defaultdict(list), set(), defaultdict(set)
+    rows = ItemUpdate.objects.filter(candidates).values_list("id", "po_client", "dr_no", "project_id", "item_id")
+    for pk, po, dr, project_id, item_id in rows:
+        matches = instance.po_key and normalize_ref(po) == instance.po_key
+        if matches and project_id is None:
+            link.append(pk)
+        elif not matches and project_id == instance.pk:
+            unlink[normalize_ref(po)].append(pk)
+        else:
+            continue
+        refs.add((po, dr))
+        items[normalize_ref(po)].add(item_id)
+    if not refs:
+        return
+
+    # Only the pairs lines actually moved out of or into
+    pairs = {(instance.pk, item_id) for item_ids in items.values() for item_id in item_ids}
+    for po_key, ids in unlink.items():
+        project = ItemUpdate.project_for(po_key)
+        ItemUpdate.objects.filter(id__in=ids).update(project=project)
+        if project:
+            pairs.update((project.pk, item_id) for item_id in items[po_key])
+    ItemUpdate.objects.filter(id__in=link).update(project=instance)
+    # .update() sends no post_save
+    DeliveryReceipt.refresh(refs)
+    ProjectItemRollup.refresh(pairs)
+    ResourceVersion.bump(*{key for po, dr in refs for key in ResourceVersion.ledger_keys(po_client=po, dr_no=dr)})
+
+
+@receiver([post_save, post_delete], sender=Project)
+def bump_project_versions(sender, instance, **kwargs):
+    """Invalidate the project list and the project's own cached details."""
+    ResourceVersion.bump("projects", f"project:{instance.pk}")
+
+
+@receiver([post_save, post_delete], sender=UploadedDR)
+def bump_uploaded_dr_versions(sender, instance, **kwargs):
+    """Invalidate the PO and DR whose scanned images changed."""
+    ResourceVersion.bump(*ResourceVersion.ledger_keys(po_client=instance.po_number, dr_no=instance.dr_number))
+
+
+@receiver([post_save, post_delete], sender=UploadedDR)
+def count_uploaded_dr_images(sender, instance, **kwargs):
+    """Recount the images of the receipt a saved or deleted image belongs to."""
+    if instance.receipt_id:
+        count_receipt_images([instance.receipt_id])
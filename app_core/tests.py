@@ -1,17 +1,28 @@
 # app_core/tests.py
+import asyncio
+import io
 from datetime import timedelta
 from io import BytesIO
+from unittest import mock
 
 from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import Client, TestCase
+from django.core.management import call_command
+from django.db import DatabaseError, connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.utils import timezone
 from PIL import Image
 
-from inventory.models import Item, ItemUpdate
+from accounts.models import role_counts
+from inventory.ledger import convert_allocations, undo_updates
+from inventory.models import DeliveryReceipt, Item, ItemUpdate, ProjectItemRollup
+from inventory.pagination import encode_cursor
 
-from .models import AssetTool, AssetUpdate, Project, UploadedDR
+from .models import AssetAssignment, AssetTool, AssetUpdate, Project, UploadedDR
+from .uploads import store_dr_images
 
 User = get_user_model()
 
@@ -137,6 +148,37 @@ class CoreAppViewsTests(TestCase):
         self.assertIn("users", response.context)
         self.assertEqual(response.context["users"].count(), 3)
 
+    def test_admin_view_annotates_activity_stats(self):
+        """Test per-user activity numbers come from the listing query itself"""
+        self.client.force_login(self.admin)
+        item = Item.objects.create(item_name="Cable", user=self.admin)
+        ItemUpdate.objects.create(item=item, transaction_type="IN", quantity=2, user=self.admin)
+        ItemUpdate.objects.create(item=item, transaction_type="IN", quantity=1, user=self.admin)
+        asset_update = AssetUpdate.objects.create(asset=self.create_asset(), assigned_to="John", updated_by=self.admin)
+        self.client.get(reverse("admin_page"))  # warm the session/user and role caches
+
+        with self.assertNumQueries(2):  # page count + annotated page
+            response = self.client.get(reverse("admin_page"))
+        rows = {user.username: user for user in response.context["page_obj"]}
+        self.assertEqual((rows["admin"].item_update_count, rows["admin"].asset_update_count), (2, 1))
+        self.assertEqual(rows["admin"].last_activity, asset_update.transaction_date)
+        self.assertEqual((rows["regular"].item_update_count, rows["regular"].last_activity), (0, None))
+
+    def test_admin_view_search_role_filter_and_cached_role_counts(self):
+        """Test server-side search and role filter, and role counts cached until users change"""
+        self.client.force_login(self.superadmin)
+
+        response = self.client.get(reverse("admin_page"), {"search": "regular"})
+        self.assertEqual([u.username for u in response.context["page_obj"]], ["regular"])
+        response = self.client.get(reverse("admin_page"), {"role": "admin"})
+        self.assertEqual([u.username for u in response.context["page_obj"]], ["admin"])
+        self.assertIn(("admin", "Admin", 1), response.context["role_counts"])
+
+        with self.assertNumQueries(0):
+            role_counts()
+        User.objects.create_user(username="admin2", password="testpass123", role="admin")
+        self.assertEqual(role_counts()["admin"], 2)
+
     # ===== ASSETS & TOOLS TESTS =====
 
     def test_assets_tools_view_shows_only_non_deleted(self):
@@ -329,6 +371,158 @@ class CoreAppViewsTests(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertEqual(len(response.context["updates"]), 0)
 
+    def test_asset_history_json_pages_with_fixed_query_count(self):
+        """Test the JSON history pages newest first at the same query cost per page"""
+        self.client.force_login(self.regular_user)
+        asset = self.create_asset("Shared Tool")
+        for i in range(7):
+            AssetUpdate.objects.create(asset=asset, assigned_to=f"User {i}", updated_by=self.superadmin)
+        url = reverse("asset_history", args=[asset.id])
+        self.client.get(url)  # warm the session/user caches
+
+        with CaptureQueriesContext(connection) as first:
+            data = self.client.get(url, {"format": "json", "limit": 5}).json()
+        self.assertEqual([row["assigned_to"] for row in data["results"]], [f"User {i}" for i in range(6, 1, -1)])
+        self.assertEqual(data["results"][0]["updated_by"], "superadmin")
+
+        with self.assertNumQueries(len(first.captured_queries)):
+            data = self.client.get(url, {"format": "json", "limit": 5, "cursor": data["next"]}).json()
+        self.assertEqual([row["assigned_to"] for row in data["results"]], ["User 1", "User 0"])
+        self.assertIsNone(data["next"])
+
+        response = self.client.get(url, {"limit": 5})
+        self.assertContains(response, "Load more")
+
+    def test_asset_history_json_pages_through_rows_in_one_millisecond(self):
+        """Test the history cursor keeps microseconds so no update is skipped"""
+        self.client.force_login(self.regular_user)
+        asset = self.create_asset("Busy Tool")
+        moment = timezone.now().replace(microsecond=500000)
+        for i in range(3):
+            update = AssetUpdate.objects.create(asset=asset, assigned_to=f"User {i}", updated_by=self.superadmin)
+            AssetUpdate.objects.filter(pk=update.pk).update(transaction_date=moment + timedelta(microseconds=(i % 2) * 100))
+        url = reverse("asset_history", args=[asset.id])
+
+        first = self.client.get(url, {"format": "json", "limit": 1}).json()
+        rest = self.client.get(url, {"format": "json", "limit": 5, "cursor": first["next"]}).json()
+        self.assertEqual([row["assigned_to"] for row in first["results"] + rest["results"]], ["User 1", "User 2", "User 0"])
+
+    # ===== CURRENT ASSIGNMENT TESTS =====
+
+    def test_reassignment_updates_current_assignment(self):
+        """Test a reassignment points the asset's assignment at the new update"""
+        self.client.force_login(self.superadmin)
+        asset = self.create_asset("Laptop", assigned_user="John Doe")
+        self.assertEqual(asset.assignment.holder, "John Doe")
+        self.assertIsNone(asset.assignment.last_update)
+
+        self.client.post(reverse("update_asset_tool", args=[asset.id]), {"assigned_user": "Jane  Roe", "remarks": ""})
+
+        assignment = AssetAssignment.objects.get(asset=asset)
+        update = AssetUpdate.objects.get(asset=asset)
+        self.assertEqual((assignment.holder, assignment.holder_key), ("Jane  Roe", "jane roe"))
+        self.assertEqual(assignment.last_update, update)
+        self.assertEqual(assignment.assigned_by, self.superadmin)
+
+    def test_held_by_lists_live_assets_of_holder(self):
+        """Test the holder lookup ignores case, spacing and deleted assets"""
+        drill = self.create_asset("Drill", assigned_user="John Doe")
+        self.create_asset("Saw", assigned_user="Jane Roe")
+        ladder = self.create_asset("Ladder", assigned_user="john doe")
+        ladder.is_deleted = True
+        ladder.save()
+
+        self.assertEqual(list(AssetAssignment.held_by(" JOHN   doe ")), [drill])
+
+        drill.assigned_user = None
+        drill.save()
+        self.assertFalse(AssetAssignment.objects.filter(asset=drill).exists())
+
+    def test_assets_tools_holder_filter_without_history(self):
+        """Test the listing filters by holder and never reads the update history"""
+        self.client.force_login(self.regular_user)
+        drill = self.create_asset("Drill", assigned_user="John Doe")
+        self.create_asset("Saw", assigned_user="Jane Roe")
+        AssetUpdate.objects.create(asset=drill, assigned_to="John Doe", updated_by=self.superadmin)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("assets_tools"), {"holder": "john doe"})
+        self.assertEqual(list(response.context["page_obj"].object_list), [drill])
+        self.assertFalse(any(AssetUpdate._meta.db_table in q["sql"] for q in queries.captured_queries))
+
+    # ===== WARRANTY TESTS =====
+
+    def create_asset_with_warranty(self, tool_name, days):
+        asset = self.create_asset(tool_name)
+        asset.warranty_date = None if days is None else timezone.now().date() + timedelta(days=days)
+        asset.save()
+        return asset
+
+    def test_warranty_queryset_filters(self):
+        """Test the warranty status is filterable and sortable in the database"""
+        expired = self.create_asset_with_warranty("Expired", -1)
+        soon = self.create_asset_with_warranty("Soon", 5)
+        later = self.create_asset_with_warranty("Later", 90)
+        self.create_asset_with_warranty("No Warranty", None)
+
+        self.assertCountEqual(AssetTool.objects.warranty_active(), [soon, later])
+        self.assertEqual(list(AssetTool.objects.warranty_expired()), [expired])
+        self.assertEqual(list(AssetTool.objects.warranty_expiring(days=30)), [soon])
+
+        statuses = AssetTool.objects.with_warranty_status().order_by("-warranty_is_active", "warranty_date")
+        self.assertEqual([a.warranty_is_active for a in statuses if a.warranty_date], [True, True, False])
+        self.assertEqual(soon.is_warranty_active(), statuses.get(pk=soon.pk).warranty_is_active)
+
+    def test_expiring_warranties_json_pages_with_cursor(self):
+        """Test the report walks every expiring asset once, in warranty order"""
+        self.client.force_login(self.regular_user)
+        expected = [self.create_asset_with_warranty(f"Tool {i}", i % 7).id for i in range(7)]
+        self.create_asset_with_warranty("Far", 120)
+        deleted = self.create_asset_with_warranty("Deleted", 3)
+        deleted.is_deleted = True
+        deleted.save()
+
+        url = reverse("expiring_warranties")
+        seen, cursor, pages = [], None, 0
+        while True:
+            params = {"format": "json", "days": 30, "limit": 3, **({"cursor": cursor} if cursor else {})}
+            data = self.client.get(url, params).json()
+            seen += [row["id"] for row in data["results"]]
+            pages += 1
+            cursor = data["next"]
+            if not cursor:
+                break
+
+        ordered = list(AssetTool.objects.filter(id__in=expected).order_by("warranty_date", "id").values_list("id", flat=True))
+        self.assertEqual(seen, ordered)
+        self.assertEqual(pages, 3)
+
+    def test_cursors_with_values_of_the_wrong_type_are_rejected(self):
+        """Test well-formed cursors holding values the sort fields cannot take are a 400, not a 500"""
+        self.client.force_login(self.regular_user)
+        asset = self.create_asset_with_warranty("Soon", 2)
+        urls = [reverse("expiring_warranties"), reverse("asset_history", args=[asset.id])]
+
+        for url in urls:
+            for values in (["x", 1], ["2024-01-01", "y"], [None, 1], [{"a": 1}, 1]):
+                with self.subTest(url=url, values=values):
+                    response = self.client.get(url, {"format": "json", "cursor": encode_cursor(values)})
+                    self.assertEqual(response.status_code, 400)
+
+    def test_expiring_warranties_rejects_bad_cursor(self):
+        """Test a tampered cursor is a 400 for JSON and a message for the page"""
+        self.client.force_login(self.regular_user)
+        self.create_asset_with_warranty("Soon", 2)
+        url = reverse("expiring_warranties")
+
+        response = self.client.get(url, {"format": "json", "cursor": "not-a-cursor"})
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(response.json()["success"])
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Soon")
+
     # ===== PROJECT TESTS =====
 
     def test_add_project_success(self):
@@ -659,6 +853,251 @@ class CoreAppViewsTests(TestCase):
         uploads = UploadedDR.objects.filter(po_number="po-concurrent", dr_number="dr-same")
         self.assertEqual(uploads.count(), 5)
 
+    def test_upload_dr_creates_thumbnails(self):
+        """Test that each uploaded DR image gets a stored thumbnail"""
+        self.client.force_login(self.regular_user)
+
+        data = {
+            "po_number": "PO-THUMB",
+            "dr_number": "DR-THUMB",
+            "uploaded_date": "2024-01-15",
+            "images": [self.create_test_image() for _ in range(2)],
+        }
+
+        result = self.client.post(reverse("upload_dr"), data).json()
+
+        self.assertTrue(result["success"])
+        uploads = UploadedDR.objects.filter(dr_number="dr-thumb")
+        self.assertEqual(uploads.count(), 2)
+        for upload in uploads:
+            self.assertTrue(upload.thumbnail.name.startswith("uploaded_drs/thumbnails/"))
+            self.assertTrue(upload.thumbnail.storage.exists(upload.thumbnail.name))
+
+    def test_upload_dr_rejects_invalid_image(self):
+        """Test that a non-image file aborts the whole upload"""
+        self.client.force_login(self.regular_user)
+
+        data = {
+            "po_number": "PO-BAD",
+            "dr_number": "DR-BAD",
+            "uploaded_date": "2024-01-15",
+            "images": [self.create_test_image(), SimpleUploadedFile("notes.png", b"not an image", content_type="image/png")],
+        }
+
+        result = self.client.post(reverse("upload_dr"), data).json()
+
+        self.assertFalse(result["success"])
+        self.assertIn("not a valid image", result["error"])
+        self.assertFalse(UploadedDR.objects.filter(dr_number="dr-bad").exists())
+
+    def test_upload_dr_removes_stored_files_when_insert_fails(self):
+        """Test images written before a failed insert are deleted again"""
+        self.client.force_login(self.regular_user)
+        stored = []
+
+        def store(images):
+            stored.extend(store_dr_images(images))
+            return stored
+
+        data = {"po_number": "PO-FAIL", "dr_number": "DR-FAIL", "uploaded_date": "2024-01-15", "images": [self.create_test_image()]}
+        with (
+            mock.patch("app_core.views.store_dr_images", side_effect=store),
+            mock.patch.object(UploadedDR.objects, "bulk_create", side_effect=DatabaseError("insert failed")),
+        ):
+            result = self.client.post(reverse("upload_dr"), data).json()
+
+        self.assertFalse(result["success"])
+        self.assertEqual(len(stored), 1)
+        self.assertFalse(any(default_storage.exists(name) for names in stored for name in names))
+        self.assertFalse(UploadedDR.objects.filter(dr_number="dr-fail").exists())
+
+    @override_settings(DR_UPLOAD_MAX_IMAGE_SIZE=64)
+    def test_upload_dr_rejects_oversized_image(self):
+        """Test that images above the size limit are refused"""
+        self.client.force_login(self.regular_user)
+
+        data = {
+            "po_number": "PO-BIG",
+            "dr_number": "DR-BIG",
+            "uploaded_date": "2024-01-15",
+            "images": [self.create_test_image()],
+        }
+
+        result = self.client.post(reverse("upload_dr"), data).json()
+
+        self.assertFalse(result["success"])
+        self.assertIn("larger than", result["error"])
+        self.assertFalse(UploadedDR.objects.filter(dr_number="dr-big").exists())
+
+    @override_settings(DR_UPLOAD_MAX_IMAGES=2)
+    def test_upload_dr_rejects_too_many_images(self):
+        """Test that the per-request image count limit is enforced"""
+        self.client.force_login(self.regular_user)
+
+        data = {
+            "po_number": "PO-MANY",
+            "dr_number": "DR-MANY",
+            "uploaded_date": "2024-01-15",
+            "images": [self.create_test_image() for _ in range(3)],
+        }
+
+        result = self.client.post(reverse("upload_dr"), data).json()
+
+        self.assertFalse(result["success"])
+        self.assertIn("at most 2 images", result["error"])
+
+    # ===== CONDITIONAL GET TESTS =====
+
+    def assertRevalidates(self, url, change):
+        """GET url, expect 304 on an unchanged re-request and 200 after change() runs"""
+        first = self.client.get(url)
+        self.assertEqual(first.status_code, 200)
+        self.assertIn("ETag", first)
+        self.assertIn("no-cache", first["Cache-Control"])
+
+        unchanged = self.client.get(url, HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(unchanged.status_code, 304)
+        self.assertEqual(unchanged["ETag"], first["ETag"])
+
+        change()
+        changed = self.client.get(url, HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed["ETag"], first["ETag"])
+
+    def create_dr_line(self, po_client="PO-ETAG", dr_no="DR-ETAG", **extra):
+        """Helper to create an OUT transaction on a DR"""
+        item = Item.objects.create(item_name="ETag Item", total_stock=10, user=self.superadmin)
+        return ItemUpdate.objects.create(
+            item=item, transaction_type="OUT", quantity=1, po_client=po_client, dr_no=dr_no, user=self.superadmin, **extra
+        )
+
+    def test_get_projects_conditional_get(self):
+        """Test project list answers 304 until a project is added"""
+        self.client.force_login(self.regular_user)
+        self.create_project("First", "PO-1")
+        self.assertRevalidates(reverse("get_projects"), lambda: self.create_project("Second", "PO-2"))
+
+    def test_get_project_details_conditional_get(self):
+        """Test project details change when a DR line is posted to the project's PO"""
+        self.client.force_login(self.regular_user)
+        project = self.create_project("ETag Project", "PO-ETAG")
+        self.assertRevalidates(reverse("get_project_details", args=[project.id]), lambda: self.create_dr_line(po_client=" po-etag "))
+
+    def test_project_drs_api_conditional_get(self):
+        """Test project DR list changes when a scanned DR image is recorded"""
+        self.client.force_login(self.regular_user)
+        project = self.create_project("ETag Project", "PO-ETAG")
+        self.create_dr_line()
+
+        def upload():
+            UploadedDR.objects.create(po_number="po-etag", dr_number="dr-etag", uploaded_date=timezone.now().date(), image="x.png")
+
+        self.assertRevalidates(reverse("project_drs_api", args=[project.id]), upload)
+
+    def test_dr_upload_invalidates_project_payloads(self):
+        """Test a DR image upload through the view changes the project details and DR list ETags"""
+        self.client.force_login(self.regular_user)
+        project = self.create_project("ETag Project", "PO-ETAG")
+        self.create_dr_line()
+        urls = [reverse("get_project_details", args=[project.id]), reverse("project_drs_api", args=[project.id])]
+        etags = [self.client.get(url)["ETag"] for url in urls]
+
+        data = {"po_number": "PO-ETAG", "dr_number": "DR-ETAG", "uploaded_date": "2024-01-15", "images": [self.create_test_image()]}
+        self.assertTrue(self.client.post(reverse("upload_dr"), data).json()["success"])
+
+        for url, etag in zip(urls, etags):
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_get_dr_details_conditional_get(self):
+        """Test DR details change when one of its lines is undone"""
+        self.client.force_login(self.regular_user)
+        line = self.create_dr_line()
+
+        def undo():
+            line.undone = True
+            line.save(update_fields=["undone"])
+
+        self.assertRevalidates(reverse("get_dr_details", args=["DR-ETAG"]), undo)
+
+    def test_item_edits_invalidate_dr_and_project_payloads(self):
+        """Test renaming an item on a DR changes the DR and project ETags, while stock writes do not"""
+        self.client.force_login(self.regular_user)
+        project = self.create_project("Item Edit Project", "PO-ETAG")
+        item = self.create_dr_line().item
+        urls = [reverse("get_dr_details", args=["DR-ETAG"]), reverse("get_project_details", args=[project.id])]
+        etags = [self.client.get(url)["ETag"] for url in urls]
+
+        ItemUpdate.objects.create(item=item, transaction_type="IN", quantity=1, user=self.superadmin)  # saves the created instance
+        item = Item.objects.get(pk=item.pk)
+        item.total_stock += 1
+        item.save()
+        for url, etag in zip(urls, etags):
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        item.item_name = "Renamed ETag Item"
+        item.save()
+        for url, etag in zip(urls, etags):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200)
+            self.assertIn("Renamed ETag Item", response.content.decode())
+
+    def test_get_dr_details_etag_varies_with_query(self):
+        """Test the po_client filter is part of the DR details ETag"""
+        self.client.force_login(self.regular_user)
+        self.create_dr_line()
+        url = reverse("get_dr_details", args=["DR-ETAG"])
+        self.assertNotEqual(self.client.get(url)["ETag"], self.client.get(url, {"po_client": "PO-ETAG"})["ETag"])
+
+    def test_get_serials_conditional_get(self):
+        """Test serial lookups revalidate against the item's ledger version"""
+        self.client.force_login(self.regular_user)
+        line = self.create_dr_line(serial_numbers=["SN-1"])
+        self.assertRevalidates(
+            reverse("get_serials", args=[line.id]),
+            lambda: ItemUpdate.objects.create(item=line.item, transaction_type="IN", quantity=1, user=self.superadmin),
+        )
+
+    def test_conditional_get_missing_resource_still_404(self):
+        """Test unknown projects and transactions are not answered with 304"""
+        self.client.force_login(self.regular_user)
+        self.assertEqual(self.client.get(reverse("get_project_details", args=[9999]), HTTP_IF_NONE_MATCH="*").status_code, 404)
+        self.assertEqual(self.client.get(reverse("get_serials", args=[9999]), HTTP_IF_NONE_MATCH="*").status_code, 404)
+
+    async def test_json_lookups_served_async(self):
+        """Test the project summary lookups answer concurrent requests on the ASGI path"""
+        await self.async_client.aforce_login(self.regular_user)
+        project = await Project.objects.acreate(project_title="Async Project", po_no="PO-ASYNC", created_date=timezone.now().date())
+        item = await Item.objects.acreate(item_name="Async Item", total_stock=5, user=self.superadmin)
+        line = await ItemUpdate.objects.acreate(
+            item=item,
+            transaction_type="OUT",
+            quantity=1,
+            po_client="PO-ASYNC",
+            dr_no="DR-ASYNC",
+            serial_numbers=["SN-A"],
+            user=self.superadmin,
+        )
+
+        responses = await asyncio.gather(
+            self.async_client.get(reverse("get_projects")),
+            self.async_client.get(reverse("get_project_details", args=[project.id])),
+            self.async_client.get(reverse("get_dr_details", args=["DR-ASYNC"])),
+            self.async_client.get(reverse("get_serials", args=[line.id])),
+        )
+
+        self.assertEqual([r.status_code for r in responses], [200] * 4)
+        self.assertEqual(responses[1].json()["drs"][0]["dr_no"], "DR-ASYNC")
+        self.assertEqual(responses[2].json()["transactions"][0]["item_name"], "Async Item")
+        self.assertEqual(responses[3].json()["serial_numbers"], ["SN-A"])
+
+        unchanged = await self.async_client.get(reverse("get_projects"), headers={"if-none-match": responses[0]["ETag"]})
+        self.assertEqual(unchanged.status_code, 304)
+
+    async def test_get_project_details_async_not_found(self):
+        """Test missing projects still return 404 from the async view"""
+        response = await self.async_client.get(reverse("get_project_details", args=[9999]))
+        self.assertEqual(response.status_code, 404)
+
     # ===== DR DETAILS TESTS =====
 
     def test_get_dr_details_with_transactions(self):
@@ -693,6 +1132,44 @@ class CoreAppViewsTests(TestCase):
         self.assertEqual(result["transactions"][0]["dr_no"], "DR-001")
         self.assertEqual(len(result["transactions"][0]["serial_numbers"]), 5)
 
+    def test_ledger_lines_link_to_project_by_normalized_po(self):
+        """Test lines get the project FK whether they are posted before or after the project"""
+        item = Item.objects.create(item_name="Linked Item", total_stock=10, user=self.superadmin)
+        early = ItemUpdate.objects.create(
+            item=item, transaction_type="OUT", quantity=1, po_client="PO-LINK ", dr_no="DR-1", user=self.superadmin
+        )
+        self.assertIsNone(early.project)
+
+        project = self.create_project("Linked Project", "po-link")
+        late = ItemUpdate.objects.create(
+            item=item, transaction_type="OUT", quantity=1, po_client="Po-Link", dr_no="DR-2", user=self.superadmin
+        )
+        other = ItemUpdate.objects.create(
+            item=item, transaction_type="OUT", quantity=1, po_client="PO-LINKED", dr_no="DR-3", user=self.superadmin
+        )
+
+        self.assertEqual(set(project.ledger_lines.values_list("id", flat=True)), {early.id, late.id})
+        self.assertEqual(set(project.receipts.values_list("dr_key", flat=True)), {"dr-1", "dr-2"})
+        self.assertIsNone(ItemUpdate.objects.get(pk=other.pk).project)
+
+        # Changing the project's P.O. moves it to the other lines
+        project.po_no = "PO-LINKED"
+        project.save()
+        self.assertEqual(list(project.ledger_lines.values_list("id", flat=True)), [other.id])
+        self.assertEqual(list(project.receipts.values_list("dr_key", flat=True)), ["dr-3"])
+
+    def test_get_dr_details_by_project(self):
+        """Test DR details narrowed by project match the DR number case-insensitively"""
+        self.client.force_login(self.regular_user)
+        project = self.create_project("DR Project", "PO-DRP")
+        item = Item.objects.create(item_name="DR Item", total_stock=10, user=self.superadmin)
+        for po_client, dr_no in [("PO-DRP", "DR-9"), ("po-drp", "dr-9"), ("PO-ELSE", "DR-9")]:
+            ItemUpdate.objects.create(item=item, transaction_type="OUT", quantity=1, po_client=po_client, dr_no=dr_no, user=self.superadmin)
+
+        response = self.client.get(reverse("get_dr_details", args=["DR-9"]), {"project_id": project.id})
+
+        self.assertEqual(sorted(tx["po_client"] for tx in response.json()["transactions"]), ["PO-DRP", "po-drp"])
+
     def test_get_dr_details_excludes_allocated_and_undone(self):
         """Test that ALLOCATED and undone transactions are excluded"""
         self.client.force_login(self.regular_user)
@@ -1012,6 +1489,59 @@ class CoreAppViewsTests(TestCase):
         self.assertEqual(len(result["drs"]), 1)
         self.assertEqual(len(result["drs"][0]["images"]), 1)
 
+    def test_upload_dr_links_images_to_receipt(self):
+        """Test uploaded images are attached to the DR's receipt and counted"""
+        self.client.force_login(self.regular_user)
+        project = self.create_project("Receipt Project", "PO-RCPT")
+        item = Item.objects.create(item_name="Receipt Item", total_stock=10, user=self.superadmin)
+        ItemUpdate.objects.create(item=item, transaction_type="OUT", quantity=1, po_client="PO-RCPT", dr_no="DR-RCPT", user=self.superadmin)
+
+        data = {
+            "po_number": "po-rcpt",
+            "dr_number": " dr-rcpt ",
+            "uploaded_date": "2024-01-15",
+            "images": [self.create_test_image(), self.create_test_image()],
+        }
+        self.client.post(reverse("upload_dr"), data)
+
+        receipt = DeliveryReceipt.objects.get()
+        self.assertEqual((receipt.dr_no, receipt.line_count, receipt.image_count), ("DR-RCPT", 1, 2))
+        self.assertEqual(receipt.images.count(), 2)
+
+        UploadedDR.objects.filter(receipt=receipt).first().delete()
+        receipt.refresh_from_db()
+        self.assertEqual(receipt.image_count, 1)
+
+        result = self.client.get(reverse("get_project_details", args=[project.id])).json()
+        self.assertEqual([(dr["dr_no"], len(dr["images"])) for dr in result["drs"]], [("DR-RCPT", 1)])
+
+    def test_project_details_queries_do_not_grow_with_drs(self):
+        """Test project details read receipts and their images in a fixed number of queries"""
+        self.client.force_login(self.regular_user)
+        project = self.create_project("Busy Project", "PO-BUSY")
+        item = Item.objects.create(item_name="Busy Item", total_stock=50, user=self.superadmin)
+
+        def add_dr(n):
+            ItemUpdate.objects.create(
+                item=item, transaction_type="OUT", quantity=1, po_client="PO-BUSY", dr_no=f"DR-{n}", user=self.superadmin
+            )
+            UploadedDR.objects.create(po_number="po-busy", dr_number=f"dr-{n}", uploaded_date=timezone.now().date(), image="x.png")
+
+        def count_queries():
+            with CaptureQueriesContext(connection) as ctx:
+                self.client.get(reverse("get_project_details", args=[project.id]))
+            return len(ctx.captured_queries)
+
+        add_dr(1)
+        count_queries()  # warm up the session
+        one = count_queries()
+        for n in range(2, 6):
+            add_dr(n)
+        self.assertEqual(count_queries(), one)
+
+        drs = self.client.get(reverse("project_drs_api", args=[project.id])).json()
+        self.assertEqual(len(drs), 5)
+
     def test_asset_reassignment_chain(self):
         """Test multiple reassignments create proper history chain"""
         self.client.force_login(self.superadmin)
@@ -1098,3 +1628,95 @@ class CoreAppViewsTests(TestCase):
         self.assertEqual(asset.tool_name, original_name)
         self.assertEqual(asset.description, original_description)
         self.assertEqual(asset.warranty_date, original_warranty)
+
+
+class ProjectItemRollupTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="roller", password="testpass123", role="superadmin", first_login=False)
+        self.project = Project.objects.create(project_title="Rollup Project", po_no="PO-ROLL")
+        self.item = Item.objects.create(item_name="Rollup Item", total_stock=50, user=self.user)
+
+    def add(self, transaction_type, quantity, dr_no=None, **extra):
+        field = "allocated_quantity" if transaction_type == "ALLOCATED" else "quantity"
+        return ItemUpdate.objects.create(
+            item=self.item,
+            transaction_type=transaction_type,
+            po_client="po-roll",
+            dr_no=dr_no,
+            user=self.user,
+            **{field: quantity},
+            **extra,
+        )
+
+    def rollup(self):
+        return ProjectItemRollup.objects.get(project=self.project, item=self.item)
+
+    def test_write_undo_and_convert_keep_totals_current(self):
+        self.add("OUT", 3, dr_no="DR-1", date=timezone.now() - timedelta(days=1))
+        out = self.add("OUT", 2, dr_no="DR-2")
+        allocation = self.add("ALLOCATED", 4, dr_no="DR-3", date=timezone.now() - timedelta(days=2))
+        self.assertEqual((self.rollup().shipped_quantity, self.rollup().allocated_quantity, self.rollup().last_dr_no), (5, 4, "DR-2"))
+
+        undo_updates([out], self.user)
+        self.assertEqual((self.rollup().shipped_quantity, self.rollup().last_dr_no), (3, "DR-1"))
+
+        convert_allocations([allocation], self.user)
+        self.assertEqual((self.rollup().shipped_quantity, self.rollup().allocated_quantity, self.rollup().last_dr_no), (7, 0, "DR-3"))
+
+    def test_writes_apply_deltas_without_recomputing_the_pair(self):
+        self.add("OUT", 3, dr_no="DR-1", date=timezone.now() - timedelta(days=1))
+        ProjectItemRollup.objects.update(shipped_quantity=100)  # a recompute would undo this
+
+        with mock.patch.object(ProjectItemRollup, "refresh") as refresh:
+            out = self.add("OUT", 2, dr_no="DR-2")
+            allocation = self.add("ALLOCATED", 4)
+            undo_updates([out], self.user)
+            convert_allocations([allocation], self.user)
+
+        refresh.assert_not_called()
+        self.assertEqual((self.rollup().shipped_quantity, self.rollup().allocated_quantity, self.rollup().last_dr_no), (104, 0, "DR-1"))
+
+    def test_deletes_relink_the_last_dr_and_drop_empty_rollups(self):
+        first = self.add("OUT", 3, dr_no="DR-1", date=timezone.now() - timedelta(days=1))
+        latest = self.add("OUT", 2, dr_no="DR-2")
+
+        latest.delete()
+        self.assertEqual((self.rollup().shipped_quantity, self.rollup().last_dr_no), (3, "DR-1"))
+
+        first.delete()
+        self.assertFalse(ProjectItemRollup.objects.exists())
+
+    def test_project_details_include_item_totals(self):
+        self.add("OUT", 3, dr_no="DR-1")
+        self.client.force_login(self.user)
+
+        result = self.client.get(reverse("get_project_details", args=[self.project.id])).json()
+
+        self.assertEqual([(i["item_name"], i["shipped"], i["last_dr_no"]) for i in result["items"]], [("Rollup Item", 3, "DR-1")])
+
+    def test_projects_sharing_a_po_all_list_its_drs_and_totals(self):
+        later = Project.objects.create(project_title="Rollup Phase 2", po_no="po-roll ")
+        self.add("OUT", 3, dr_no="DR-1")
+        self.client.force_login(self.user)
+
+        for project in (self.project, later):
+            result = self.client.get(reverse("get_project_details", args=[project.id])).json()
+            self.assertEqual([dr["dr_no"] for dr in result["drs"]], ["DR-1"])
+            self.assertEqual([(i["item_name"], i["shipped"]) for i in result["items"]], [("Rollup Item", 3)])
+            lines = self.client.get(reverse("get_dr_details", args=["DR-1"]), {"project_id": project.id}).json()
+            self.assertEqual(len(lines["transactions"]), 1)
+
+    def test_rebuild_matches_incremental_rollups(self):
+        self.add("OUT", 3, dr_no="DR-1")
+        self.add("ALLOCATED", 2)
+        expected = list(ProjectItemRollup.objects.values("project", "item", "shipped_quantity", "allocated_quantity", "last_dr_no"))
+        ProjectItemRollup.objects.update(shipped_quantity=0, allocated_quantity=0)
+        ProjectItemRollup.objects.create(project=self.project, item=Item.objects.create(item_name="Gone", user=self.user))
+
+        out = io.StringIO()
+        call_command("rebuild_project_rollups", stdout=out)
+
+        self.assertEqual(
+            list(ProjectItemRollup.objects.values("project", "item", "shipped_quantity", "allocated_quantity", "last_dr_no")), expected
+        )
+        self.assertIn("removed 1 stale", out.getvalue())
@@ -0,0 +1,127 @@
+"""
+Streaming upload handling and image processing for scanned DR images.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from pathlib import PurePosixPath
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadhandler import SkipFile, TemporaryFileUploadHandler
+from PIL import Image, UnidentifiedImageError
+
+from .models import UploadedDR
+
+
+class InvalidDRImage(Exception):
+    """Raised when an uploaded file is not a readable image."""
+
+
+class DRImageUploadHandler(TemporaryFileUploadHandler):
+    """
+    Upload handler that streams every DR image straight to a temporary file on disk.
+
+    Files larger than ``settings.DR_UPLOAD_MAX_IMAGE_SIZE`` are dropped as soon as
+    the limit is crossed; their names are collected in ``rejected`` so the view can
+    report them instead of silently ignoring them.
+    """
+
+    def __init__(self, request=None):
+        super().__init__(request)
+        self.max_size = settings.DR_UPLOAD_MAX_IMAGE_SIZE
+        self.rejected = []
+        self.received = 0
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > self.max_size:
+            self.rejected.append(self.file_name)
+            raise SkipFile()
+        return super().receive_data_chunk(raw_data, start)
+
+
+def store_dr_image(uploaded):
+    """
+    Validate one uploaded DR image, move it into media storage and write its thumbnail.
+
+    Runs inside a worker thread and never touches the database.
+
+    Args:
+        uploaded (UploadedFile): The streamed upload (normally a temporary file on disk).
+
+    Returns:
+        tuple[str, str]: Storage names of the original image and of its thumbnail.
+
+    Raises:
+        InvalidDRImage: If the file cannot be decoded as an image.
+    """
+    try:
+        with Image.open(uploaded) as img:
+            img.verify()
+        uploaded.seek(0)
+        with Image.open(uploaded) as img:
+            img.thumbnail(settings.DR_THUMBNAIL_SIZE)
+            thumbnail = BytesIO()
+            img.convert("RGB").save(thumbnail, "JPEG", quality=80)
+    except (UnidentifiedImageError, OSError, SyntaxError) as e:
+        raise InvalidDRImage(uploaded.name) from e
+
+    uploaded.seek(0)
+    image_field = UploadedDR._meta.get_field("image")
+    image_name = default_storage.save(image_field.generate_filename(None, uploaded.name), uploaded)
+
+    thumbnail_field = UploadedDR._meta.get_field("thumbnail")
+    thumbnail_name = default_storage.save(
+        thumbnail_field.generate_filename(None, f"{PurePosixPath(image_name).stem}.jpg"),
+        ContentFile(thumbnail.getvalue()),
+    )
+    return image_name, thumbnail_name
+
+
+def store_dr_images(images):
+    """
+    Process a batch of uploaded DR images in a bounded thread pool.
+
+    Either every image is stored or none is: when one image fails, the files
+    already written for the batch are deleted before the error is re-raised.
+
+    Args:
+        images (list[UploadedFile]): The uploaded images.
+
+    Returns:
+        list[tuple[str, str]]: ``(image_name, thumbnail_name)`` pairs in upload order.
+    """
+    workers = max(1, min(settings.DR_UPLOAD_WORKERS, len(images)))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(store_dr_image, img) for img in images]
+
+    stored, error = [], None
+    for future in futures:
+        try:
+            stored.append(future.result())
+        except Exception as e:
+            error = error or e
+
+    if error is not None:
+        delete_dr_images(stored)
+        raise error
+
+    return stored
+
+
+def delete_dr_images(stored):
+    """
+    Delete files written by ``store_dr_images`` that no row will point at.
+
+    Args:
+        stored (list[tuple[str, str]]): ``(image_name, thumbnail_name)`` pairs.
+    """
+    for names in stored:
+        for name in names:
+            default_storage.delete(name)
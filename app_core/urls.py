@@ -22,4 +22,5 @@ urlpatterns = [
     path("update-asset-tool/<int:asset_id>/", views.update_asset, name="update_asset_tool"),
     path("delete-asset-tool/<int:asset_id>/", views.delete_asset_tool, name="delete_asset_tool"),
     path("asset/<int:asset_id>/history/", views.asset_history, name="asset_history"),
+    path("assets-tools/warranties/expiring/", views.expiring_warranties, name="expiring_warranties"),
 ]
@@ -1,21 +1,70 @@
 from datetime import datetime
 
+from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth import authenticate, get_user_model
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.core.paginator import Paginator
 from django.db import transaction
-from django.db.models import Max, Prefetch, Q
+from django.db.models import Count, Max, OuterRef, Prefetch, Q, Subquery
+from django.db.models.functions import Coalesce, Greatest, Lower
 from django.http import JsonResponse
-from django.shortcuts import get_object_or_404, redirect, render
+from django.shortcuts import aget_object_or_404, get_object_or_404, redirect, render
 from django.utils import timezone
 from django.utils.dateparse import parse_date
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
+
+from accounts.models import role_counts
+from inventory.conditional import versioned_response
+from inventory.models import (
+    DeliveryReceipt,
+    ItemUpdate,
+    ProjectItemRollup,
+    ResourceVersion,
+    normalize_ref,
+)
+from inventory.pagination import EstimatedCountPaginator, InvalidCursor, keyset_page
+from inventory.replicas import use_replica
+
+from .models import (
+    AssetAssignment,
+    AssetTool,
+    AssetUpdate,
+    Project,
+    UploadedDR,
+    count_receipt_images,
+)
+from .uploads import (
+    DRImageUploadHandler,
+    InvalidDRImage,
+    delete_dr_images,
+    store_dr_images,
+)
 
-from inventory.models import ItemUpdate
+User = get_user_model()
 
-from .models import AssetTool, AssetUpdate, Project, UploadedDR
 
-User = get_user_model()
+async def _project_version_keys(request, project_id):
+    """Version keys of a project's detail/DR payloads, or None if it does not exist."""
+    po_no = await Project.objects.filter(id=project_id).values_list("po_no", flat=True).afirst()
+    if po_no is None:
+        return None
+    return [f"project:{project_id}", *ResourceVersion.ledger_keys(po_client=po_no)]
+
+
+async def _projects_version_keys(request):
+    return ["projects"]
+
+
+async def _dr_version_keys(request, dr_no):
+    return ResourceVersion.ledger_keys(dr_no=dr_no)
+
+
+async def _serial_version_keys(request, update_id):
+    item_id = await ItemUpdate.objects.filter(id=update_id).values_list("item_id", flat=True).afirst()
+    if item_id is None:
+        return None
+    return ResourceVersion.ledger_keys(item_id=item_id)
 
 
 @login_required
@@ -32,6 +81,39 @@ def dashboard_view(request):
     return render(request, "app_core/dashboard.html")
 
 
+ADMIN_PAGE_SIZE = 25
+
+
+def _count_by_user(model, user_field):
+    """Subquery counting ``model`` rows that point at the outer user."""
+    rows = model.objects.filter(**{user_field: OuterRef("pk")}).order_by().values(user_field)
+    return Coalesce(Subquery(rows.annotate(n=Count("pk")).values("n")), 0)
+
+
+def _latest_by_user(model, user_field, date_field):
+    """Subquery returning the outer user's most recent ``date_field`` on ``model``."""
+    rows = model.objects.filter(**{user_field: OuterRef("pk")}).order_by().values(user_field)
+    return Subquery(rows.annotate(latest=Max(date_field)).values("latest"))
+
+
+def _with_activity_stats(users):
+    """
+    Annotate users with their activity, computed by the database in the same query.
+
+    Adds ``item_update_count``, ``asset_update_count`` and ``last_activity``
+    (the latest ItemUpdate or AssetUpdate they posted, or None) as
+    correlated subqueries, so a page of users is still a single SELECT.
+    """
+    last_item = _latest_by_user(ItemUpdate, "user", "date")
+    last_asset = _latest_by_user(AssetUpdate, "updated_by", "transaction_date")
+    return users.annotate(
+        item_update_count=_count_by_user(ItemUpdate, "user"),
+        asset_update_count=_count_by_user(AssetUpdate, "updated_by"),
+        # GREATEST is NULL if any argument is on some backends; coalesce each side with the other
+        last_activity=Greatest(Coalesce(last_item, last_asset), Coalesce(last_asset, last_item)),
+    )
+
+
 @login_required
 def admin_view(request):
     """
@@ -40,6 +122,11 @@ def admin_view(request):
     Only users with the 'admin' or 'superadmin' role can access this view.
     If an unauthorized user attempts access, they are redirected to the dashboard.
 
+    Users are searched (``?search=``) and filtered by role (``?role=``) in
+    the database and paginated. Each row carries its activity numbers from
+    ``_with_activity_stats``; the per-role totals come from the cached
+    ``role_counts``.
+
     Args:
         request (HttpRequest): The incoming HTTP request from the user.
 
@@ -55,9 +142,34 @@ def admin_view(request):
         messages.error(request, "You do not have permission to view this page.")
         return redirect("dashboard")
 
+    search_query = request.GET.get("search", "").strip()
+    role = request.GET.get("role", "")
+
     # Only visible to admin/superadmin
     users = User.objects.all().order_by("id")
-    context = {"users": users}
+    if search_query:
+        users = users.filter(
+            Q(first_name__icontains=search_query)
+            | Q(last_name__icontains=search_query)
+            | Q(username__icontains=search_query)
+            | Q(email__icontains=search_query)
+            | Q(position__icontains=search_query)
+            | Q(contact_no__icontains=search_query)
+        )
+    if role:
+        users = users.filter(role=role)
+
+    counts = role_counts()
+    paginator = Paginator(_with_activity_stats(users), ADMIN_PAGE_SIZE)
+    page_obj = paginator.get_page(request.GET.get("page"))
+
+    context = {
+        "users": users,
+        "page_obj": page_obj,
+        "search_query": search_query,
+        "role": role,
+        "role_counts": [(value, label, counts[value]) for value, label in User.ROLE_CHOICES],
+    }
     return render(request, "app_core/admin.html", context)
 
 
@@ -66,25 +178,20 @@ def assets_tools(request):
     """
     Display the Assets & Tools overview page with search functionality.
 
-    This view filters out soft-deleted assets, prefetches related updates,
-    and supports comprehensive server-side search.
+    This view filters out soft-deleted assets and supports comprehensive
+    server-side search. ``?holder=`` lists what one person currently holds,
+    using the AssetAssignment index. The listing shows the holder stored on
+    the asset itself, so no update history is loaded.
     """
 
     search_query = request.GET.get("search", "").strip()
-
-    # Prefetch latest updates for performance
-    latest_updates = Prefetch(
-        "updates",  # related_name from AssetUpdate
-        queryset=AssetUpdate.objects.select_related("updated_by").order_by("-transaction_date"),
-        to_attr="prefetched_updates",
-    )
+    holder = request.GET.get("holder", "").strip()
 
     # Base queryset
-    assets = (
-        AssetTool.objects.filter(is_deleted=False)
-        .prefetch_related(latest_updates)
-        .order_by("-updated_at")  # Or "-date_added" if you prefer
-    )
+    if holder:
+        assets = AssetAssignment.held_by(holder)
+    else:
+        assets = AssetTool.objects.filter(is_deleted=False).order_by("-updated_at")  # Or "-date_added" if you prefer
 
     # Search filter
     if search_query:
@@ -95,8 +202,8 @@ def assets_tools(request):
             | Q(assigned_by__icontains=search_query)  # Assigned by
         ).distinct()
 
-    # Pagination
-    paginator = Paginator(assets, 10)
+    # Pagination; the unfiltered listing may use the planner's estimate
+    paginator = EstimatedCountPaginator(assets, 10, estimate_filtered=not (search_query or holder))
     page_number = request.GET.get("page", 1)
     page_obj = paginator.get_page(page_number)
 
@@ -106,7 +213,8 @@ def assets_tools(request):
         {
             "page_obj": page_obj,
             "search_query": search_query,
-            "total_assets": assets.count(),
+            "holder": holder,
+            "total_assets": paginator.count,
         },
     )
 
@@ -266,57 +374,196 @@ def delete_asset_tool(request, asset_id):
     return redirect("assets_tools")
 
 
+EXPIRING_WARRANTY_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+def _page_limit(request, default):
+    """Rows per page from ``?limit=``, clamped to 1..MAX_PAGE_SIZE."""
+    try:
+        return min(max(int(request.GET.get("limit", default)), 1), MAX_PAGE_SIZE)
+    except ValueError:
+        return default
+
+
+@login_required
+def expiring_warranties(request):
+    """
+    Report the live assets whose warranty ends within the next ``?days=`` days (30 by default).
+
+    Rows are sorted by warranty date and paged with a keyset cursor
+    (``?cursor=``, ``?limit=`` rows per page), so every page is one range
+    scan of ``asset_warranty_idx`` no matter how many assets exist.
+    ``?format=json`` returns the same page as JSON.
+    """
+    try:
+        days = min(max(int(request.GET.get("days", 30)), 0), 3650)
+    except ValueError:
+        days = 30
+    limit = _page_limit(request, EXPIRING_WARRANTY_PAGE_SIZE)
+    want_json = request.GET.get("format") == "json"
+
+    assets = AssetTool.objects.live().warranty_expiring(days=days).only("id", "tool_name", "warranty_date", "assigned_user")
+    try:
+        page, next_cursor = keyset_page(assets, ["warranty_date", "id"], request.GET.get("cursor"), limit)
+    except InvalidCursor as exc:
+        if want_json:
+            return JsonResponse({"success": False, "error": str(exc)}, status=400)
+        messages.error(request, str(exc))
+        return redirect(f"{request.path}?days={days}")
+
+    today = timezone.now().date()
+    for asset in page:
+        asset.days_left = (asset.warranty_date - today).days
+
+    if want_json:
+        return JsonResponse(
+            {
+                "days": days,
+                "results": [
+                    {
+                        "id": asset.id,
+                        "tool_name": asset.tool_name,
+                        "warranty_date": asset.warranty_date.isoformat(),
+                        "days_left": asset.days_left,
+                        "assigned_user": asset.assigned_user,
+                    }
+                    for asset in page
+                ],
+                "next": next_cursor,
+            }
+        )
+
+    return render(
+        request,
+        "app_core/expiring_warranties.html",
+        {"assets": page, "days": days, "next_cursor": next_cursor},
+    )
+
+
+ASSET_HISTORY_PAGE_SIZE = 50
+
+
 @login_required
 def asset_history(request, asset_id):
-    """Display the transaction history of a specific asset."""
+    """
+    Display the transaction history of a specific asset, newest first.
+
+    Updates are paged with a keyset cursor over ``(transaction_date, id)``
+    and joined with their updater, so each page costs the same few queries
+    however long the history is. ``?format=json`` returns one page
+    (``?limit=`` rows) for infinite scroll; ``next`` is the cursor of the
+    following page.
+    """
     asset = get_object_or_404(AssetTool, id=asset_id)
+    want_json = request.GET.get("format") == "json"
 
     # Fetch related updates from AssetUpdate, most recent first
-    updates = asset.updates.all().order_by("-transaction_date")
+    updates = asset.updates.select_related("updated_by")
+    try:
+        page, next_cursor = keyset_page(
+            updates, ["-transaction_date", "-id"], request.GET.get("cursor"), _page_limit(request, ASSET_HISTORY_PAGE_SIZE)
+        )
+    except InvalidCursor as exc:
+        if want_json:
+            return JsonResponse({"success": False, "error": str(exc)}, status=400)
+        return redirect("asset_history", asset_id=asset.id)
+
+    if want_json:
+        return JsonResponse(
+            {
+                "results": [
+                    {
+                        "id": update.id,
+                        "transaction_date": timezone.localtime(update.transaction_date).strftime("%B %d, %Y - %I:%M %p"),
+                        "previous_user": update.previous_user,
+                        "assigned_to": update.assigned_to,
+                        "remarks": update.remarks,
+                        "updated_by": update.updated_by.username if update.updated_by else None,
+                    }
+                    for update in page
+                ],
+                "next": next_cursor,
+            }
+        )
 
     context = {
         "asset": asset,
-        "updates": updates,
+        "updates": page,
+        "next_cursor": next_cursor,
     }
 
     return render(request, "app_core/asset_history.html", context)
 
 
+def _on_project(project):
+    """
+    Filter for rows linked to ``project`` or to a project sharing its P.O.
+
+    Ledger lines link to the oldest project of their P.O., so projects that
+    share a P.O. all see its DRs and totals, as matching on the P.O. did.
+    """
+    return Q(project__po_key=project.po_key) if project.po_key else Q(project=project)
+
+
+def _project_receipts(project):
+    """Delivery receipts with ledger lines on ``project``'s P.O., newest first."""
+    return DeliveryReceipt.objects.filter(_on_project(project), line_count__gt=0).order_by("-last_date")
+
+
+def _project_items(project):
+    """The per-item rollups of ``project``'s P.O., by item name."""
+    return ProjectItemRollup.objects.filter(_on_project(project)).select_related("item").order_by("item__item_name", "item_id")
+
+
+def _rollup_json(rollup):
+    return {
+        "item_id": rollup.item_id,
+        "item_name": rollup.item.item_name,
+        "unit_of_quantity": rollup.item.unit_of_quantity,
+        "shipped": rollup.shipped_quantity,
+        "allocated": rollup.allocated_quantity,
+        "last_dr_no": rollup.last_dr_no or "",
+        "last_dr_date": rollup.last_dr_date.strftime("%Y-%m-%d") if rollup.last_dr_date else "",
+    }
+
+
 def project_summary_view(request):
     """Render the project summary page and list all projects with DRs."""
     projects = Project.objects.all().order_by("project_title")
     selected_project_id = request.GET.get("project_id")
     selected_project = None
     drs = []
+    item_rollups = []
 
     if selected_project_id:
         selected_project = get_object_or_404(Project, id=selected_project_id)
-        # Fetch all DRs (ItemUpdates) connected to the project's P.O.
-        drs = (
-            ItemUpdate.objects.filter(po_client=selected_project.po_no).order_by("dr_no", "-date").distinct("dr_no")
-        )  # one entry per DR number
+        # One receipt per DR of the project's ledger lines, newest first
+        drs = _project_receipts(selected_project)
+        item_rollups = _project_items(selected_project)
 
     context = {
         "projects": projects,
         "selected_project": selected_project,
         "drs": drs,
+        "item_rollups": item_rollups,
     }
     return render(request, "app_core/project_summary.html", context)
 
 
-def project_drs_api(request, project_id):
+@use_replica
+@versioned_response(_project_version_keys)
+async def project_drs_api(request, project_id):
     """API endpoint: returns all DRs belonging to a specific project (by P.O.)"""
-    project = get_object_or_404(Project, id=project_id)
-    drs = ItemUpdate.objects.filter(po_client=project.po_no).order_by("-date").distinct("dr_no")
-
+    project = await aget_object_or_404(Project, id=project_id)
     data = [
         {
             "dr_no": dr.dr_no,
             "remarks": dr.remarks,
             "location": dr.location,
-            "date": dr.date.strftime("%Y-%m-%d") if dr.date else "",
+            "date": dr.last_date.strftime("%Y-%m-%d") if dr.last_date else "",
         }
-        for dr in drs
+        async for dr in _project_receipts(project)
     ]
     return JsonResponse(data, safe=False)
 
@@ -341,52 +588,39 @@ def add_project(request):
     return JsonResponse({"success": False, "error": "Invalid request method."}, status=405)
 
 
-def get_projects(request):
+@use_replica
+@versioned_response(_projects_version_keys)
+async def get_projects(request):
     """Return all projects as JSON for dropdown or selection fields."""
-    projects = Project.objects.all().order_by("project_title")
-    data = [{"id": p.id, "display": f"{p.po_no} | {p.project_title}"} for p in projects]
+    projects = Project.objects.order_by("project_title").values_list("id", "po_no", "project_title")
+    data = [{"id": pk, "display": f"{po_no} | {title}"} async for pk, po_no, title in projects]
     return JsonResponse({"projects": data})
 
 
-def get_project_details(request, project_id):
-    """Return detailed information about a project, including DRs and uploaded images."""
+@use_replica
+@versioned_response(_project_version_keys)
+async def get_project_details(request, project_id):
+    """Return detailed information about a project, including DRs, uploaded images and per-item totals."""
     try:
-        project = Project.objects.get(id=project_id)
+        project = await Project.objects.aget(id=project_id)
     except Project.DoesNotExist:
         return JsonResponse({"success": False, "error": "Project not found"}, status=404)
 
     # Normalize PO number for comparison
     po_no = project.po_no.strip()
 
-    # Group by DR No. and get the latest date for each
-    drs = (
-        ItemUpdate.objects.filter(po_client=po_no)
-        .exclude(dr_no__isnull=True)
-        .exclude(dr_no__exact="")
-        .values("dr_no")
-        .annotate(date=Max("date"))
-        .order_by("-date")
-    )
-
-    # Get all uploaded DR images that match this project's P.O.
-    uploaded_drs = UploadedDR.objects.filter(po_number__iexact=po_no)
-    dr_image_map = {}
-
-    for dr in uploaded_drs:
-        normalized_dr_no = dr.dr_number.strip().lower()
-        dr_image_map.setdefault(normalized_dr_no, []).append(dr.image.url)
+    # The receipts carry their ledger dates; their images come in one prefetch query
+    receipts = _project_receipts(project).prefetch_related(Prefetch("images", queryset=UploadedDR.objects.order_by("id")))
 
-    # Build response safely
     dr_list = []
-    for dr in drs:
-        dr_no = (dr["dr_no"] or "").strip()
-        normalized_dr_no = dr_no.lower()
-
+    async for receipt in receipts:
+        images = receipt.images.all()
         dr_list.append(
             {
-                "dr_no": dr_no,
-                "date_created": dr["date"].strftime("%Y-%m-%d") if dr["date"] else "",
-                "images": dr_image_map.get(normalized_dr_no, []),
+                "dr_no": receipt.dr_no,
+                "date_created": receipt.last_date.strftime("%Y-%m-%d") if receipt.last_date else "",
+                "images": [image.image.url for image in images],
+                "thumbnails": [(image.thumbnail or image.image).url for image in images],
                 "po_number": po_no,
             }
         )
@@ -401,43 +635,41 @@ def get_project_details(request, project_id):
             "location": project.location or "N/A",
             "date": project.created_date.strftime("%Y-%m-%d") if project.created_date else "N/A",
             "drs": dr_list,
+            "items": [_rollup_json(rollup) async for rollup in _project_items(project)],
         }
     )
 
 
-def get_dr_details(request, dr_no):
+@use_replica
+@versioned_response(_dr_version_keys)
+async def get_dr_details(request, dr_no):
     """
     Returns all transactions under a specific DR number,
     including their serial numbers directly from ItemUpdate.
+
+    The DR number is matched case-insensitively. ``?project_id=`` narrows the
+    lines to one project; the older ``?po_client=`` narrows them by P.O.
     """
     try:
         po_client = request.GET.get("po_client")
+        project_id = request.GET.get("project_id")
 
         qs = (
-            ItemUpdate.objects.filter(dr_no=dr_no)
+            ItemUpdate.objects.alias(dr_lower=Lower("dr_no"))
+            .filter(dr_lower=normalize_ref(dr_no))
             .exclude(transaction_type__in=["ALLOCATED", "UPLOAD"])
             .exclude(undone=True)
             .exclude(item__isnull=True)  # ensure valid item reference
+            .select_related("item")
         )
-        if po_client:
+        if project_id and project_id.isdigit():
+            project = await Project.objects.filter(id=project_id).afirst()
+            qs = qs.filter(_on_project(project)) if project else qs.none()
+        elif po_client:
             qs = qs.filter(po_client=po_client)
 
         transactions = []
-        for tx in qs.order_by("-date"):
-            # Parse serial_numbers properly (JSON or comma string)
-            serials_raw = tx.serial_numbers
-            if isinstance(serials_raw, str):
-                try:
-                    import json
-
-                    serials = json.loads(serials_raw)
-                except json.JSONDecodeError:
-                    serials = [s.strip() for s in serials_raw.split(",") if s.strip()]
-            elif isinstance(serials_raw, list):
-                serials = serials_raw
-            else:
-                serials = []
-
+        async for tx in qs.order_by("-date"):
             transactions.append(
                 {
                     "id": tx.id,
@@ -455,7 +687,7 @@ def get_dr_details(request, dr_no):
                     "dr_no": tx.dr_no,
                     "remarks": tx.remarks,
                     "updated_by_user": tx.updated_by_user,
-                    "serial_numbers": serials or [],  # correct serials for this transaction
+                    "serial_numbers": tx.serial_numbers or [],  # stored as a list on save
                 }
             )
 
@@ -468,12 +700,13 @@ def get_dr_details(request, dr_no):
 # ===================================
 # Serial Numbers View
 # ===================================
-def get_serials(request, update_id):
+@versioned_response(_serial_version_keys)
+async def get_serials(request, update_id):
     """
     Returns the serial numbers involved in a specific ItemUpdate transaction.
     """
     try:
-        update = ItemUpdate.objects.get(id=update_id)
+        update = await ItemUpdate.objects.aget(id=update_id)
         serials = update.serial_numbers or []  # safely handle None
         return JsonResponse({"serial_numbers": serials})
     except ItemUpdate.DoesNotExist:
@@ -483,23 +716,41 @@ def get_serials(request, update_id):
 
 
 @login_required
-@transaction.atomic
+@csrf_exempt
 def upload_dr(request):
     """
     Handles DR image uploads without creating ItemUpdate entries.
+
+    Images are streamed straight to disk by ``DRImageUploadHandler`` (CSRF is
+    still enforced by ``_upload_dr``; the handler must be installed before the
+    CSRF middleware reads the request body).
     """
+    request.upload_handlers = [DRImageUploadHandler(request)]
+    return _upload_dr(request)
+
+
+@csrf_protect
+def _upload_dr(request):
     try:
         po_number = request.POST.get("po_number", "").strip()
         dr_number = request.POST.get("dr_number", "").strip()
         uploaded_date = request.POST.get("uploaded_date", "").strip()
         images = request.FILES.getlist("images")
+        rejected = request.upload_handlers[0].rejected
 
         if not po_number or not dr_number or not uploaded_date:
             return JsonResponse({"success": False, "error": "Missing required fields."})
 
+        if rejected:
+            limit_mb = settings.DR_UPLOAD_MAX_IMAGE_SIZE // (1024 * 1024)
+            return JsonResponse({"success": False, "error": f"Images larger than {limit_mb} MB are not allowed: {', '.join(rejected)}"})
+
         if not images:
             return JsonResponse({"success": False, "error": "Please upload at least one image."})
 
+        if len(images) > settings.DR_UPLOAD_MAX_IMAGES:
+            return JsonResponse({"success": False, "error": f"You can upload at most {settings.DR_UPLOAD_MAX_IMAGES} images per DR."})
+
         # Convert date string safely
         try:
             uploaded_date = datetime.strptime(uploaded_date, "%Y-%m-%d").date()
@@ -510,14 +761,36 @@ def upload_dr(request):
         normalized_dr = dr_number.strip().lower()
         normalized_po = po_number.strip().lower()
 
-        # Save each uploaded image in UploadedDR model only
-        for img in images:
-            UploadedDR.objects.create(
-                po_number=normalized_po,
-                dr_number=normalized_dr,
-                uploaded_date=uploaded_date,
-                image=img,
-            )
+        # Validate, store and thumbnail the images outside of any DB transaction
+        try:
+            stored = store_dr_images(images)
+        except InvalidDRImage as e:
+            return JsonResponse({"success": False, "error": f"'{e}' is not a valid image."})
+
+        # Files are on disk; record them all in one short transaction, or remove
+        # them again so a failed insert leaves no orphaned files behind
+        try:
+            with transaction.atomic():
+                receipt = DeliveryReceipt.for_refs(po_number, dr_number)
+                UploadedDR.objects.bulk_create(
+                    [
+                        UploadedDR(
+                            po_number=normalized_po,
+                            dr_number=normalized_dr,
+                            uploaded_date=uploaded_date,
+                            image=image_name,
+                            thumbnail=thumbnail_name,
+                            receipt=receipt,
+                        )
+                        for image_name, thumbnail_name in stored
+                    ]
+                )
+                # bulk_create skips UploadedDR.save() and its signals
+                count_receipt_images([receipt.id])
+                ResourceVersion.bump(*ResourceVersion.ledger_keys(po_client=po_number, dr_no=dr_number))
+        except Exception:
+            delete_dr_images(stored)
+            raise
 
         return JsonResponse({"success": True, "message": "DR and images uploaded successfully!"})
 
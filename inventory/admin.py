@@ -1,6 +1,15 @@
 from django.contrib import admin
 
-from .models import Item, ItemSerial, ItemUpdate
+from .models import (
+    DeliveryReceipt,
+    Item,
+    ItemLocationBalance,
+    ItemSerial,
+    ItemUpdate,
+    Location,
+    TransactionHistory,
+)
+from .pagination import EstimatedCountPaginator
 
 
 class ItemSerialInline(admin.TabularInline):
@@ -61,16 +70,27 @@ class ItemUpdateAdmin(admin.ModelAdmin):
     Displays transaction history such as stock-ins, stock-outs,
     and allocations, with filtering and search options for ease of tracking.
 
+    The ledger is the largest table, so the changelist joins item and user
+    into its one list query, pages with the planner's row estimate instead of
+    COUNT(*), and drills down by date through ``date_hierarchy``, whose
+    year/month/day links become ranges on the ``date`` index. Foreign keys
+    use autocomplete widgets instead of dropdowns listing every row.
+
     Attributes:
         list_display (tuple): Columns shown in the list view.
-        list_filter (tuple): Sidebar filters for transaction type and date.
+        list_select_related (tuple): Relations joined into the list query.
+        list_filter (tuple): Sidebar filters for transaction type.
+        date_hierarchy (str): Date drilldown above the list.
         search_fields (tuple): Fields searchable in the admin.
+        autocomplete_fields (tuple): Foreign keys edited with autocomplete widgets.
         readonly_fields (tuple): Fields that cannot be modified.
         ordering (tuple): Default sorting order for entries.
     """
 
     list_display = ("item", "transaction_type", "quantity", "date", "user")
-    list_filter = ("transaction_type", "date")
+    list_select_related = ("item", "user")
+    list_filter = ("transaction_type",)
+    date_hierarchy = "date"
     search_fields = (
         "item__item_name",
         "location",
@@ -79,5 +99,78 @@ class ItemUpdateAdmin(admin.ModelAdmin):
         "po_client",
         "dr_no",
     )
+    autocomplete_fields = ("item", "user", "source_allocation", "project", "site")
     readonly_fields = ("date",)
     ordering = ("-date",)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_queryset(self, request):
+        # __str__ reads the item name, so autocomplete results and the change
+        # form need the join too. ChangeList skips list_select_related once a
+        # queryset already has select_related, so repeat it here.
+        return super().get_queryset(request).select_related(*self.list_select_related)
+
+
+@admin.register(TransactionHistory)
+class TransactionHistoryAdmin(admin.ModelAdmin):
+    """
+    Read-only admin for the TransactionHistory audit log.
+
+    Configured like ``ItemUpdateAdmin`` for large tables: joined list query,
+    estimated page counts and a ``timestamp`` drilldown on its index.
+    """
+
+    list_display = ("timestamp", "item", "action_type", "quantity", "previous_stock", "new_stock", "user")
+    list_select_related = ("item", "user")
+    list_filter = ("action_type",)
+    date_hierarchy = "timestamp"
+    search_fields = ("item__item_name", "remarks")
+    ordering = ("-timestamp",)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(DeliveryReceipt)
+class DeliveryReceiptAdmin(admin.ModelAdmin):
+    """Read-only admin for the DR index, which is maintained from the ledger and DR uploads."""
+
+    list_display = ("dr_no", "po_no", "line_count", "active_line_count", "image_count", "last_date")
+    search_fields = ("dr_key", "po_key")
+    ordering = ("-last_date",)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(Location)
+class LocationAdmin(admin.ModelAdmin):
+    """Admin for the locations ledger lines are resolved to; renaming one keeps its key."""
+
+    list_display = ("name", "key", "created_at")
+    search_fields = ("key", "name")
+    readonly_fields = ("key", "created_at")
+
+
+@admin.register(ItemLocationBalance)
+class ItemLocationBalanceAdmin(admin.ModelAdmin):
+    """Read-only admin for the per-location balances, which are maintained from the ledger."""
+
+    list_display = ("item", "location", "quantity", "allocated_quantity", "updated_at")
+    list_select_related = ("item", "location")
+    search_fields = ("item__item_name", "location__key")
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,84 @@
+"""
+Conditional GET (ETag / Last-Modified) for read-only JSON endpoints.
+"""
+
+import hashlib
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+from .models import ResourceVersion
+
+
+def _response_validators(request, keys):
+    return _validators(request, *ResourceVersion.stamp(keys))
+
+
+async def _aresponse_validators(request, keys):
+    return _validators(request, *await ResourceVersion.astamp(keys))
+
+
+def _validators(request, digest, last_modified):
+    etag = '"%s"' % hashlib.md5(f"{request.get_full_path()}|{digest}".encode(), usedforsecurity=False).hexdigest()
+    return etag, int(last_modified.timestamp()) if last_modified else None
+
+
+def _add_validators(request, response, etag, last_modified):
+    if request.method in ("GET", "HEAD") and response.status_code in (200, 304):
+        response.headers.setdefault("ETag", etag)
+        if last_modified:
+            response.headers.setdefault("Last-Modified", http_date(last_modified))
+    # Let the browser keep the payload but always revalidate it with the ETag
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def versioned_response(keys_func):
+    """
+    Answer unchanged resources with 304 based on ``ResourceVersion`` stamps.
+
+    ``keys_func`` receives the view's arguments and returns the version keys
+    the response depends on, or ``None`` when the resource does not exist (the
+    view then runs normally so it can produce its own 404).
+
+    Args:
+        keys_func (Callable[..., list[str] | None]): Maps a request to version keys.
+
+    Returns:
+        Callable: A view decorator.
+    """
+
+    def decorator(view):
+        if iscoroutinefunction(view):
+
+            @wraps(view)
+            async def ainner(request, *args, **kwargs):
+                keys = await keys_func(request, *args, **kwargs)
+                if keys is None:
+                    return await view(request, *args, **kwargs)
+
+                etag, last_modified = await _aresponse_validators(request, keys)
+                response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+                if response is None:
+                    response = await view(request, *args, **kwargs)
+                return _add_validators(request, response, etag, last_modified)
+
+            return ainner
+
+        @wraps(view)
+        def inner(request, *args, **kwargs):
+            keys = keys_func(request, *args, **kwargs)
+            if keys is None:
+                return view(request, *args, **kwargs)
+
+            etag, last_modified = _response_validators(request, keys)
+            response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+            if response is None:
+                response = view(request, *args, **kwargs)
+            return _add_validators(request, response, etag, last_modified)
+
+        return inner
+
+    return decorator
@@ -0,0 +1,265 @@
+"""
+Streaming exports of the transaction ledger and of the current inventory.
+
+Rows are read with ``QuerySet.iterator(chunk_size=...)`` (server-side cursors on
+PostgreSQL) so exports run in constant memory no matter how many rows match,
+and streamed downloads start as soon as the first chunk has been fetched.
+"""
+
+import csv
+import json
+import tempfile
+from itertools import groupby
+from operator import itemgetter
+
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils import timezone
+
+from .models import Item, ItemSerial
+
+try:
+    from openpyxl import Workbook
+except ImportError:  # XLSX export is optional; CSV always works
+    Workbook = None
+
+EXPORT_CHUNK_SIZE = 2000
+EXPORT_FORMATS = ("csv", "xlsx")
+SNAPSHOT_FORMATS = ("csv", "jsonl")
+XLSX_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+#: Rows an XLSX sheet can hold, header included
+XLSX_MAX_ROWS = 1_048_576
+
+
+def _serials(value):
+    if isinstance(value, list):
+        return ", ".join(str(sn) for sn in value)
+    return value or ""
+
+
+def _username(user):
+    return user.username if user else ""
+
+
+#: (header, getter) pairs describing one exported ItemUpdate row.
+LEDGER_COLUMNS = [
+    ("Transaction ID", lambda u: u.id),
+    ("Date", lambda u: timezone.localtime(u.date).strftime("%Y-%m-%d %H:%M:%S")),
+    ("Item ID", lambda u: u.item_id),
+    ("Item", lambda u: u.item.item_name),
+    ("Unit", lambda u: u.item.unit_of_quantity),
+    ("Type", lambda u: u.transaction_type),
+    ("Quantity", lambda u: u.quantity),
+    ("Allocated Quantity", lambda u: u.allocated_quantity),
+    ("Stock After", lambda u: u.stock_after_transaction),
+    ("Allocated After", lambda u: u.allocated_after_transaction),
+    ("Serial Numbers", lambda u: _serials(u.serial_numbers)),
+    ("Location", lambda u: u.location or ""),
+    ("P.O From Supplier", lambda u: u.po_supplier or ""),
+    ("P.O To Client", lambda u: u.po_client or ""),
+    ("DR No.", lambda u: u.dr_no or ""),
+    ("Remarks", lambda u: u.remarks or ""),
+    ("Transaction By", lambda u: _username(u.user) or u.updated_by_user or ""),
+    ("Undone", lambda u: "yes" if u.undone else "no"),
+    ("Converted", lambda u: "yes" if u.is_converted else "no"),
+    ("Source Allocation", lambda u: u.source_allocation_id or ""),
+]
+
+
+class Echo:
+    """File-like object whose ``write`` returns the value, so csv.writer yields lines."""
+
+    def write(self, value):
+        return value
+
+
+def ledger_rows(*querysets):
+    """
+    Yield export rows for every ItemUpdate in ``querysets``.
+
+    Querysets are exported one after the other, each streamed in its own
+    order (e.g. the archived rows, then the live ledger they were folded from).
+
+    Args:
+        *querysets (QuerySet[ItemUpdate | ArchivedItemUpdate]): Already
+            filtered and ordered ledger rows.
+
+    Yields:
+        list: One value per entry of ``LEDGER_COLUMNS``.
+    """
+    for queryset in querysets:
+        for update in queryset.select_related("item", "user").iterator(chunk_size=EXPORT_CHUNK_SIZE):
+            yield [getter(update) for _, getter in LEDGER_COLUMNS]
+
+
+def stream_csv(header, rows, filename):
+    """
+    Stream rows as a CSV attachment.
+
+    Args:
+        header (list[str]): Column titles.
+        rows (Iterable[list]): Row values, consumed lazily while the response is sent.
+        filename (str): Download name without extension.
+
+    Returns:
+        StreamingHttpResponse: The CSV download.
+    """
+    writer = csv.writer(Echo())
+
+    def lines():
+        yield "\ufeff"  # BOM so Excel opens the file as UTF-8
+        yield writer.writerow(header)
+        for row in rows:
+            yield writer.writerow(row)
+
+    response = StreamingHttpResponse(lines(), content_type="text/csv; charset=utf-8")
+    response["Content-Disposition"] = f'attachment; filename="{filename}.csv"'
+    return response
+
+
+def xlsx_file(header, rows, filename):
+    """
+    Write rows to a write-only XLSX workbook on disk and return it as a download.
+
+    openpyxl's write-only mode keeps memory flat, but the whole workbook is
+    written before the first byte is sent; large exports should use CSV. The
+    finished file lives in an anonymous temporary file that is removed once
+    the response is closed.
+    """
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(title="Ledger")
+    sheet.append(header)
+    for row in rows:
+        sheet.append(row)
+
+    output = tempfile.TemporaryFile()
+    workbook.save(output)
+    output.seek(0)
+    return FileResponse(output, as_attachment=True, filename=f"{filename}.xlsx", content_type=XLSX_CONTENT_TYPE)
+
+
+def ledger_export_response(request, queryset, filename, archived=None):
+    """
+    Export ``queryset`` in the format requested by ``?format=`` (csv by default).
+
+    Args:
+        request (HttpRequest): The incoming request.
+        queryset (QuerySet[ItemUpdate]): Ledger rows to export.
+        filename (str): Download name without extension.
+        archived (QuerySet[ArchivedItemUpdate] | None): Archived rows,
+            exported ahead of ``queryset`` since they precede the live ledger.
+
+    Returns:
+        HttpResponse: The download, or a 400/501 response for unusable formats
+        and for XLSX exports with more rows than a sheet can hold.
+    """
+    export_format = request.GET.get("format", "csv").lower()
+    if export_format not in EXPORT_FORMATS:
+        return HttpResponse(f"Unsupported export format '{export_format}'.", status=400)
+
+    header = [title for title, _ in LEDGER_COLUMNS]
+    querysets = [queryset] if archived is None else [archived, queryset]
+    if export_format == "xlsx":
+        if Workbook is None:
+            return HttpResponse("XLSX export requires the openpyxl package.", status=501)
+        # Checked up front: the sheet would otherwise fail once it is full
+        rows = sum(qs.count() for qs in querysets)
+        if rows >= XLSX_MAX_ROWS:
+            return HttpResponse(
+                f"The export has {rows:,} rows but an XLSX sheet holds at most {XLSX_MAX_ROWS - 1:,}. "
+                "Use format=csv, or narrow the date range.",
+                status=400,
+            )
+        return xlsx_file(header, ledger_rows(*querysets), filename)
+
+    return stream_csv(header, ledger_rows(*querysets), filename)
+
+
+#: Item fields included in an inventory snapshot, in output order.
+SNAPSHOT_FIELDS = ["id", "item_name", "unit_of_quantity", "total_stock", "allocated_quantity", "part_no"]
+SNAPSHOT_HEADER = ["Item ID", "Item", "Unit", "Total Stock", "Allocated", "Part No."]
+
+
+def _available_serials_by_item():
+    """Yield ``(item_id, [serial_no, ...])`` for every live item, in item id order."""
+    serials = (
+        ItemSerial.objects.filter(is_available=True, item__is_deleted=False)
+        .order_by("item_id", "serial_no")
+        .values_list("item_id", "serial_no")
+        .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
+    for item_id, group in groupby(serials, key=itemgetter(0)):
+        yield item_id, [serial_no for _, serial_no in group]
+
+
+def inventory_snapshot_records(flatten=False):
+    """
+    Yield the current inventory joined with each item's available serials.
+
+    Items and serials are read by two cursors ordered by item id and
+    merge-joined here, so neither side is ever loaded in full.
+
+    Args:
+        flatten (bool): Emit one record per available serial (``serial_no``)
+            instead of one record per item (``available_serials``). Items
+            without serials still produce a single record.
+
+    Yields:
+        dict: One snapshot record.
+    """
+    items = Item.objects.filter(is_deleted=False).order_by("id").values(*SNAPSHOT_FIELDS).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    serial_groups = _available_serials_by_item()
+    pending = next(serial_groups, None)
+
+    for item in items:
+        serials = []
+        while pending is not None and pending[0] < item["id"]:
+            pending = next(serial_groups, None)
+        if pending is not None and pending[0] == item["id"]:
+            serials = pending[1]
+            pending = next(serial_groups, None)
+
+        if not flatten:
+            yield {**item, "available_serials": serials}
+        elif not serials:
+            yield {**item, "serial_no": None}
+        else:
+            for serial_no in serials:
+                yield {**item, "serial_no": serial_no}
+
+
+def stream_jsonl(records, filename):
+    """Stream dict records as a JSON Lines attachment."""
+
+    def lines():
+        for record in records:
+            yield json.dumps(record, ensure_ascii=False) + "\n"
+
+    response = StreamingHttpResponse(lines(), content_type="application/x-ndjson; charset=utf-8")
+    response["Content-Disposition"] = f'attachment; filename="{filename}.jsonl"'
+    return response
+
+
+def inventory_snapshot_response(request):
+    """
+    Export the inventory snapshot in the format requested by ``?format=`` (csv by default).
+
+    ``?flatten=1`` switches to one line per available serial.
+    """
+    export_format = request.GET.get("format", "csv").lower()
+    if export_format not in SNAPSHOT_FORMATS:
+        return HttpResponse(f"Unsupported export format '{export_format}'.", status=400)
+
+    flatten = request.GET.get("flatten", "").lower() in ("1", "true", "yes")
+    records = inventory_snapshot_records(flatten=flatten)
+    filename = f"inventory-{timezone.localdate():%Y%m%d}"
+
+    if export_format == "jsonl":
+        return stream_jsonl(records, filename)
+
+    if flatten:
+        header = SNAPSHOT_HEADER + ["Serial No."]
+        rows = ([r[f] for f in SNAPSHOT_FIELDS] + [r["serial_no"] or ""] for r in records)
+    else:
+        header = SNAPSHOT_HEADER + ["Available Serials"]
+        rows = ([r[f] for f in SNAPSHOT_FIELDS] + [", ".join(r["available_serials"])] for r in records)
+    return stream_csv(header, rows, filename)
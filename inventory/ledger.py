@@ -0,0 +1,327 @@
+"""
+Ledger maintenance: recomputing running totals, reversing transactions and
+converting allocations.
+
+Reversals and conversions work on whole sets of ``ItemUpdate`` rows with
+set-based queries, so handling a 20-line DR costs a handful of statements
+instead of a full recompute per line.
+"""
+
+from collections import defaultdict
+from copy import copy
+from functools import reduce
+from operator import or_
+
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.functional import cached_property
+
+from .models import (
+    DeliveryReceipt,
+    Item,
+    ItemLocationBalance,
+    ItemSerial,
+    ItemUpdate,
+    ProjectItemRollup,
+    ResourceVersion,
+    TransactionHistory,
+)
+
+
+def replay_step(total, allocated, transaction_type, quantity, allocated_quantity, is_converted):
+    """
+    Apply one active transaction to an item's running totals.
+
+    Returns:
+        tuple[int, int]: The ``total_stock`` and ``allocated_quantity`` after
+        the transaction, neither below zero.
+    """
+    if transaction_type in ("IN", "BALANCE"):
+        total += quantity or 0
+    elif transaction_type == "OUT":
+        total -= quantity or 0
+    elif transaction_type == "ALLOCATED" and not is_converted:
+        # Only count allocations that have NOT been converted to OUT
+        allocated += allocated_quantity or 0
+    return max(total, 0), max(allocated, 0)
+
+
+def recalculate_item_stock(item):
+    """
+    Recompute an item's running totals from its active transactions.
+
+    Walks the non-undone updates in chronological order, rewrites the
+    ``stock_after_transaction``/``allocated_after_transaction`` snapshots that
+    changed with one ``bulk_update`` and stores the final totals on the item.
+
+    Args:
+        item (Item): The item to recompute.
+
+    Returns:
+        tuple[int, int]: The new ``total_stock`` and ``allocated_quantity``.
+    """
+    total = 0
+    allocated = 0
+    changed = []
+    # Always from the first row: the stored snapshots are only ever outputs, never
+    # trusted as a starting point, so stale ones are repaired instead of copied forward
+    for update in item.updates.filter(undone=False).order_by("date", "id"):
+        total, allocated = replay_step(
+            total, allocated, update.transaction_type, update.quantity, update.allocated_quantity, update.is_converted
+        )
+        if update.stock_after_transaction != total or update.allocated_after_transaction != allocated:
+            update.stock_after_transaction = total
+            update.allocated_after_transaction = allocated
+            changed.append(update)
+
+    if changed:
+        ItemUpdate.objects.bulk_update(changed, ["stock_after_transaction", "allocated_after_transaction"], batch_size=500)
+        # bulk_update sends no post_save, so invalidate the cached payloads here
+        ResourceVersion.bump(*{key for u in changed for key in ResourceVersion.ledger_keys(u.item_id, u.po_client, u.dr_no)})
+
+    item.total_stock = total
+    item.allocated_quantity = allocated
+    item.date_last_modified = timezone.now()
+    item.save(update_fields=["total_stock", "allocated_quantity", "date_last_modified"])
+    return total, allocated
+
+
+def _serial_filter(serials_by_item):
+    """Build one Q matching every ``(item_id, serial_no)`` pair in the mapping."""
+    return reduce(or_, (Q(item_id=item_id, serial_no__in=serials) for item_id, serials in serials_by_item.items()))
+
+
+def undo_updates(updates, user):
+    """
+    Reverse a set of transactions and recompute each affected item once.
+
+    Every reversal marks the transaction undone and corrects serial
+    availability: serials received by an IN are removed, serials of an OUT
+    or ALLOCATED become available again, and an OUT converted from an
+    allocation hands its serials back to that (restored) allocation.
+
+    Args:
+        updates (Iterable[ItemUpdate]): Transactions to reverse; rows that are
+            already undone and BALANCE rows are skipped.
+        user (CustomUser): The user performing the undo, recorded in
+            TransactionHistory.
+
+    Returns:
+        list[ItemUpdate]: The transactions that were actually reversed.
+    """
+    updates = [u for u in updates if not u.undone and u.transaction_type != "BALANCE"]
+    if not updates:
+        return []
+
+    removed = defaultdict(set)
+    released = defaultdict(set)
+    reserved = defaultdict(set)
+    restored_allocations = []
+    undone_ids = {u.id for u in updates}
+
+    for update in updates:
+        serials = update.serial_numbers or []
+        source_id = update.source_allocation_id
+        if source_id is not None:
+            restored_allocations.append(source_id)
+        if not serials:
+            continue
+        if update.transaction_type == "IN":
+            removed[update.item_id].update(serials)
+        elif source_id is not None and source_id not in undone_ids:
+            # The allocation stays open and keeps the serials; if it is undone too they are released
+            reserved[update.item_id].update(serials)
+        else:
+            released[update.item_id].update(serials)
+
+    # The rows as they were, and as they are after the updates below, for the per-line rollup and balance deltas
+    before = {u.id: u for u in updates}
+    if restored_allocations:
+        restored = ItemUpdate.objects.filter(id__in=restored_allocations, transaction_type="ALLOCATED").exclude(id__in=list(before))
+        before.update((a.id, a) for a in restored)
+    after = {pk: copy(line) for pk, line in before.items()}
+    for update in updates:
+        after[update.id].undone = True
+    for pk in restored_allocations:
+        if pk in after and after[pk].transaction_type == "ALLOCATED":
+            after[pk].is_converted = False
+
+    ItemUpdate.objects.filter(id__in=[u.id for u in updates]).update(undone=True)
+    if restored_allocations:
+        ItemUpdate.objects.filter(id__in=restored_allocations, transaction_type="ALLOCATED").update(is_converted=False)
+
+    if released:
+        ItemSerial.objects.filter(_serial_filter(released)).update(is_available=True)
+    if reserved:
+        ItemSerial.objects.filter(_serial_filter(reserved)).update(is_available=False)
+    if removed:
+        ItemSerial.objects.filter(_serial_filter(removed)).delete()
+
+    # .update() sends no post_save, so invalidate the cached payloads and refresh the DR index here
+    ResourceVersion.bump(*{key for u in updates for key in ResourceVersion.ledger_keys(u.item_id, u.po_client, u.dr_no)})
+    DeliveryReceipt.refresh((u.po_client, u.dr_no) for u in updates)
+    ProjectItemRollup.adjust(removed=before.values(), added=after.values())
+    ItemLocationBalance.adjust(removed=before.values(), added=after.values())
+
+    history = []
+    items = Item.objects.in_bulk({u.item_id for u in updates})
+    for item_id, item in items.items():
+        previous_stock = item.total_stock
+        new_stock, _ = recalculate_item_stock(item)
+        history.extend(
+            TransactionHistory(
+                item=item,
+                user=user,
+                action_type="undo",
+                quantity=update.quantity or update.allocated_quantity,
+                previous_stock=previous_stock,
+                new_stock=new_stock,
+                remarks=f"Reverted {update.transaction_type} transaction (ID: {update.id})",
+            )
+            for update in updates
+            if update.item_id == item_id
+        )
+    TransactionHistory.objects.bulk_create(history)
+
+    for update in updates:
+        update.undone = True
+    return updates
+
+
+def convert_allocations(allocations, user):
+    """
+    Convert ALLOCATED transactions into OUT transactions in bulk.
+
+    Creates one OUT row per allocation with ``bulk_create``, flags the
+    allocations converted in a single UPDATE, reserves their serials and
+    recomputes each affected item once.
+
+    Args:
+        allocations (Iterable[ItemUpdate]): ALLOCATED transactions to convert;
+            converted or undone rows are skipped.
+        user (CustomUser): The user performing the conversion.
+
+    Returns:
+        list[ItemUpdate]: The OUT transactions that were created.
+    """
+    allocations = [a for a in allocations if a.transaction_type == "ALLOCATED" and not a.is_converted and not a.undone]
+    if not allocations:
+        return []
+
+    now = timezone.now()
+    outs = []
+    reserved = defaultdict(set)
+    for allocation in allocations:
+        serials = allocation.serial_numbers or []
+        if serials:
+            reserved[allocation.item_id].update(serials)
+        outs.append(
+            ItemUpdate(
+                item_id=allocation.item_id,
+                transaction_type="OUT",
+                quantity=allocation.allocated_quantity or 0,
+                allocated_quantity=0,
+                serial_numbers=serials or None,
+                date=now,
+                location=allocation.location,
+                remarks=f"Converted from ALLOCATED #{allocation.id}",
+                source_allocation=allocation,
+                dr_no=allocation.dr_no,
+                po_supplier=allocation.po_supplier,
+                po_client=allocation.po_client,
+                project_id=allocation.project_id,
+                site_id=allocation.site_id,
+                user=user,
+                updated_by_user=user.username,
+            )
+        )
+
+    # bulk_create bypasses ItemUpdate.save(); totals are recomputed below instead
+    outs = ItemUpdate.objects.bulk_create(outs, batch_size=500)
+    ItemUpdate.objects.filter(id__in=[a.id for a in allocations]).update(is_converted=True)
+    if reserved:
+        ItemSerial.objects.filter(_serial_filter(reserved)).update(is_available=False)
+
+    ResourceVersion.bump(*{key for u in allocations for key in ResourceVersion.ledger_keys(u.item_id, u.po_client, u.dr_no)})
+    DeliveryReceipt.refresh((u.po_client, u.dr_no) for u in allocations)
+    converted = [copy(a) for a in allocations]
+    for allocation in converted:
+        allocation.is_converted = True
+    ProjectItemRollup.adjust(removed=allocations, added=converted + outs)
+    ItemLocationBalance.adjust(removed=allocations, added=converted + outs)
+
+    history = []
+    items = Item.objects.in_bulk({a.item_id for a in allocations})
+    for item_id, item in items.items():
+        previous_stock = item.total_stock
+        new_stock, _ = recalculate_item_stock(item)
+        history.extend(
+            TransactionHistory(
+                item=item,
+                user=user,
+                action_type="out",
+                quantity=allocation.allocated_quantity or 0,
+                previous_stock=previous_stock,
+                new_stock=new_stock,
+                remarks=f"Converted from ALLOCATED (ID: {allocation.id})",
+            )
+            for allocation in allocations
+            if allocation.item_id == item_id
+        )
+    TransactionHistory.objects.bulk_create(history)
+
+    for allocation in allocations:
+        allocation.is_converted = True
+    return outs
+
+
+class ItemHistory:
+    """
+    An item's live ledger followed by its archived rows, as one sliceable sequence.
+
+    ``Paginator`` only needs ``count()`` and slicing, so history pages run
+    through the live rows first and then continue into the archive without
+    the view having to know where the live window ends. Pages inside the
+    live rows never count them; only pages reaching past their end do. The
+    count is always exact: one item's rows are a filtered result the planner
+    can only estimate from table-wide statistics, and the ``(item, date)``
+    indexes keep counting them cheap.
+
+    Args:
+        live (QuerySet[ItemUpdate]): Live rows, already ordered.
+        archived (QuerySet[ArchivedItemUpdate]): Archived rows, already ordered.
+    """
+
+    def __init__(self, live, archived):
+        self.live = live
+        self.archived = archived
+
+    @cached_property
+    def live_count(self):
+        return self.live.count()
+
+    def count(self):
+        return self.live_count + self.archived.count()
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            rows = self[index : index + 1]
+            if not rows:
+                raise IndexError(index)
+            return rows[0]
+
+        start, stop = index.start or 0, index.stop
+        if stop is None:
+            stop = self.count()
+        rows = list(self.live[start:stop])
+        if len(rows) == stop - start:
+            return rows
+        # The live rows ended inside (or before) this page
+        if rows:
+            self.live_count = start + len(rows)
+        live_count = self.live_count
+        rows.extend(self.archived[max(start - live_count, 0) : stop - live_count])
+        return rows
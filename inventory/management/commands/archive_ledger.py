@@ -0,0 +1,160 @@
+"""
+Move old ledger rows into the archive tables.
+
+ItemUpdate rows older than ``LEDGER_ARCHIVE_AFTER_DAYS`` (and undone rows
+older than ``LEDGER_ARCHIVE_UNDONE_AFTER_DAYS``) are copied to
+ArchivedItemUpdate and removed from the live ledger. For every item that
+loses active rows, one BALANCE row dated at its oldest archived row carries
+their net stock forward, so recomputing the live ledger gives the same totals.
+TransactionHistory rows older than the horizon move to
+ArchivedTransactionHistory.
+
+Rows the live ledger still depends on stay where they are: open allocations
+(they can still be converted) and converted allocations whose OUT row is not
+being archived.
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from inventory.ledger import recalculate_item_stock
+from inventory.models import (
+    ArchivedItemUpdate,
+    ArchivedTransactionHistory,
+    DeliveryReceipt,
+    Item,
+    ItemLocationBalance,
+    ItemUpdate,
+    ProjectItemRollup,
+    ResourceVersion,
+    TransactionHistory,
+    paused_ledger_receivers,
+)
+
+
+def _copy(row, archive_model):
+    """Build an archive instance holding every column of ``row`` the archive table has."""
+    return archive_model(**{f.attname: getattr(row, f.attname) for f in archive_model._meta.concrete_fields if f.attname != "archived_at"})
+
+
+class Command(BaseCommand):
+    help = "Archive old ledger rows and carry each item's balance forward."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=settings.LEDGER_ARCHIVE_AFTER_DAYS, help="Archive ledger rows older than this.")
+        parser.add_argument(
+            "--undone-days", type=int, default=settings.LEDGER_ARCHIVE_UNDONE_AFTER_DAYS, help="Archive undone rows older than this."
+        )
+        parser.add_argument("--item", type=int, action="append", dest="items", help="Only archive these item ids.")
+        parser.add_argument("--batch-size", type=int, default=2000, help="History rows moved per transaction.")
+        parser.add_argument("--dry-run", action="store_true", help="Report what would be archived without changing anything.")
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        horizon = now - timedelta(days=options["days"])
+        undone_horizon = now - timedelta(days=options["undone_days"])
+        old_rows = Q(date__lt=horizon) | Q(undone=True, date__lt=undone_horizon)
+
+        # Items whose only old row is their previous BALANCE have nothing new to archive
+        candidates = ItemUpdate.objects.filter(old_rows).exclude(transaction_type="BALANCE")
+        if options["items"]:
+            candidates = candidates.filter(item_id__in=options["items"])
+        item_ids = sorted(set(candidates.values_list("item_id", flat=True)))
+
+        if options["dry_run"]:
+            history = TransactionHistory.objects.filter(timestamp__lt=horizon).count()
+            self.stdout.write(f"Would archive up to {candidates.count()} ledger rows of {len(item_ids)} items and {history} history rows.")
+            return
+
+        archived = sum(self.archive_item(item_id, old_rows) for item_id in item_ids)
+        history = self.archive_history(horizon, options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Archived {archived} ledger rows of {len(item_ids)} items and {history} history rows."))
+
+    @transaction.atomic
+    def archive_item(self, item_id, old_rows):
+        """
+        Archive one item's old rows and replace them with a BALANCE row.
+
+        The item is recomputed before and after; if the totals differ the
+        item's transaction is rolled back and the command stops.
+
+        Returns:
+            int: The number of ledger rows archived.
+        """
+        item = Item.objects.select_for_update().get(pk=item_id)
+        expected = recalculate_item_stock(item)
+
+        rows = list(item.updates.filter(old_rows).order_by("date", "id"))
+        ids = {row.id for row in rows}
+        pinned = set(
+            ItemUpdate.objects.filter(source_allocation_id__in=ids).exclude(id__in=ids).values_list("source_allocation_id", flat=True)
+        )
+        archive = [
+            row
+            for row in rows
+            if row.id not in pinned and not (row.transaction_type == "ALLOCATED" and not row.is_converted and not row.undone)
+        ]
+        if all(row.transaction_type == "BALANCE" for row in archive):
+            return 0  # folding the balance into a new one would change nothing
+
+        # Only IN/OUT/BALANCE move the stock, and every remaining active row of
+        # those types is newer than the archived ones
+        carried = 0
+        active = 0
+        for row in archive:
+            if row.undone:
+                continue
+            active += 1
+            if row.transaction_type in ("IN", "BALANCE"):
+                carried += row.quantity or 0
+            elif row.transaction_type == "OUT":
+                carried = max(carried - (row.quantity or 0), 0)
+
+        ArchivedItemUpdate.objects.bulk_create([_copy(row, ArchivedItemUpdate) for row in archive])
+        with paused_ledger_receivers():
+            ItemUpdate.objects.filter(id__in=[row.id for row in archive]).delete()
+        # The archived copies still count towards receipts, rollups and
+        # balances: one refresh per item instead of one per deleted row
+        DeliveryReceipt.refresh({(row.po_client, row.dr_no) for row in archive})
+        ProjectItemRollup.refresh({(row.project_id, row.item_id) for row in archive})
+        ItemLocationBalance.refresh({(row.site_id, row.item_id) for row in archive})
+        keys = set(ResourceVersion.ledger_keys(item_id=item.id))
+        keys.update(key for row in archive for key in ResourceVersion.ledger_keys(po_client=row.po_client, dr_no=row.dr_no))
+        ResourceVersion.bump(*keys)
+
+        if active:
+            # bulk_create skips ItemUpdate.save(), which would adjust the item again
+            ItemUpdate.objects.bulk_create(
+                [
+                    ItemUpdate(
+                        item=item,
+                        transaction_type="BALANCE",
+                        quantity=carried,
+                        date=rows[0].date,
+                        remarks=f"Balance carried forward from {active} archived transactions",
+                        updated_by_user="system",
+                    )
+                ]
+            )
+
+        actual = recalculate_item_stock(item)
+        if actual != expected:
+            raise CommandError(f"Item {item.id}: totals changed from {expected} to {actual}; archival rolled back.")
+        return len(archive)
+
+    def archive_history(self, horizon, batch_size):
+        """Move TransactionHistory rows older than ``horizon`` in batches; return how many moved."""
+        moved = 0
+        while True:
+            with transaction.atomic():
+                batch = list(TransactionHistory.objects.filter(timestamp__lt=horizon).order_by("id")[:batch_size])
+                if not batch:
+                    return moved
+                ArchivedTransactionHistory.objects.bulk_create([_copy(row, ArchivedTransactionHistory) for row in batch])
+                TransactionHistory.objects.filter(id__in=[row.id for row in batch]).delete()
+            moved += len(batch)
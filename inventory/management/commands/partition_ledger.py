@@ -0,0 +1,192 @@
+"""
+Monthly range partitioning of the transaction history table (PostgreSQL only).
+
+``TransactionHistory`` is an append-only audit log with no foreign keys
+pointing at it, so it can be turned into a declaratively partitioned table
+(``PARTITION BY RANGE ("timestamp")``) without changing the Django model.
+``ItemUpdate`` stays a plain table: ``source_allocation`` references it by
+``id`` alone, and PostgreSQL requires the partition key in every unique key
+a foreign key points at. Its date queries are served by the
+``(item, date)`` index instead.
+
+Usage::
+
+    python manage.py partition_ledger --convert   # one-time conversion
+    python manage.py partition_ledger             # e.g. nightly from cron
+
+Each run creates the partitions for the next ``--months-ahead`` months, so
+new rows normally never land in the catch-all default partition. If the job
+fell behind and rows did land there, the run also creates the partitions for
+their months and moves the rows out of the default partition into them.
+"""
+
+import re
+from datetime import date
+from datetime import timezone as dt_timezone
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from inventory.models import TransactionHistory
+
+PARTITION_COLUMN = "timestamp"
+
+
+def month_start(value):
+    """Return the first day of ``value``'s month."""
+    return date(value.year, value.month, 1)
+
+
+def add_months(value, months):
+    """Return the first day of the month ``months`` after ``value``'s month."""
+    index = value.year * 12 + value.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def month_ranges(first, last):
+    """
+    Yield ``(start, end)`` bounds of every month from ``first`` to ``last`` inclusive.
+
+    Args:
+        first (date): Any day of the first month.
+        last (date): Any day of the last month.
+
+    Yields:
+        tuple[date, date]: The month's first day and the next month's first day.
+    """
+    start = month_start(first)
+    while start <= last:
+        end = add_months(start, 1)
+        yield start, end
+        start = end
+
+
+class Command(BaseCommand):
+    help = "Partition the transaction history table by month and create upcoming partitions (PostgreSQL only)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--convert", action="store_true", help="Convert the existing table into a partitioned table.")
+        parser.add_argument("--months-ahead", type=int, default=3, help="Future monthly partitions to keep ready.")
+
+    def handle(self, *args, **options):
+        if connection.vendor != "postgresql":
+            raise CommandError("Ledger partitioning requires PostgreSQL; other databases keep the plain tables.")
+
+        table = TransactionHistory._meta.db_table
+        # Partition bounds are UTC month boundaries
+        today = timezone.now().date()
+        last = add_months(today, options["months_ahead"])
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            if options["convert"]:
+                if self.is_partitioned(cursor, table):
+                    raise CommandError(f"{table} is already partitioned.")
+                self.convert(cursor, table, last)
+            elif not self.is_partitioned(cursor, table):
+                raise CommandError(f"{table} is not partitioned; run with --convert first.")
+
+            # Rows that reached the default partition while the job was behind get their months too
+            cursor.execute(
+                f"SELECT MIN({connection.ops.quote_name(PARTITION_COLUMN)}) FROM {connection.ops.quote_name(table + '_default')}"
+            )
+            stranded = cursor.fetchone()[0]
+            first = min(today, stranded.astimezone(dt_timezone.utc).date()) if stranded else today
+            created = self.ensure_partitions(cursor, table, first, last)
+
+        self.stdout.write(self.style.SUCCESS(f"{table}: {created} new partition(s), ready through {last:%Y-%m}."))
+
+    def is_partitioned(self, cursor, table):
+        cursor.execute(
+            "SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid WHERE c.oid = to_regclass(%s)",
+            [table],
+        )
+        return cursor.fetchone() is not None
+
+    def ensure_partitions(self, cursor, table, first, last):
+        """
+        Create any missing monthly partitions between ``first`` and ``last``.
+
+        PostgreSQL refuses a new partition while the default partition holds
+        rows of its range, so for such a month the default partition is
+        detached, the partition created, the month's rows moved into it and
+        the default partition attached again.
+
+        Returns:
+            int: The number of partitions added.
+        """
+        qn = connection.ops.quote_name
+        default = f"{table}_default"
+        created = 0
+        for start, end in month_ranges(first, last):
+            name = f"{table}_p{start:%Y%m}"
+            cursor.execute("SELECT to_regclass(%s)", [name])
+            if cursor.fetchone()[0] is not None:
+                continue
+            bounds = [f"{start.isoformat()} 00:00:00+00", f"{end.isoformat()} 00:00:00+00"]
+            cursor.execute(
+                f"SELECT EXISTS (SELECT 1 FROM {qn(default)} WHERE {qn(PARTITION_COLUMN)} >= %s AND {qn(PARTITION_COLUMN)} < %s)", bounds
+            )
+            stranded = cursor.fetchone()[0]
+            if stranded:
+                cursor.execute(f"ALTER TABLE {qn(table)} DETACH PARTITION {qn(default)}")
+            cursor.execute(f"CREATE TABLE {qn(name)} PARTITION OF {qn(table)} " f"FOR VALUES FROM ('{bounds[0]}') TO ('{bounds[1]}')")
+            if stranded:
+                in_month = f"{qn(PARTITION_COLUMN)} >= %s AND {qn(PARTITION_COLUMN)} < %s"
+                cursor.execute(f"INSERT INTO {qn(name)} SELECT * FROM {qn(default)} WHERE {in_month}", bounds)
+                cursor.execute(f"DELETE FROM {qn(default)} WHERE {in_month}", bounds)
+                moved = cursor.rowcount
+                cursor.execute(f"ALTER TABLE {qn(table)} ATTACH PARTITION {qn(default)} DEFAULT")
+                self.stdout.write(f"Moved {moved} row(s) from {default} into {name}.")
+            created += 1
+        return created
+
+    def convert(self, cursor, table, last):
+        """
+        Rebuild ``table`` as a partitioned table holding the same rows.
+
+        The primary key becomes ``(id, timestamp)`` as PostgreSQL requires;
+        Django keeps treating ``id`` as the key. Indexes and foreign keys are
+        recreated on the parent so every partition inherits them.
+        """
+        qn = connection.ops.quote_name
+        old = f"{table}_unpartitioned"
+
+        cursor.execute(f"LOCK TABLE {qn(table)} IN ACCESS EXCLUSIVE MODE")
+        cursor.execute(f"ALTER TABLE {qn(table)} RENAME TO {qn(old)}")
+
+        cursor.execute("SELECT indexdef FROM pg_indexes WHERE tablename = %s AND indexname NOT LIKE %s", [old, "%_pkey"])
+        index_defs = [row[0] for row in cursor.fetchall()]
+        cursor.execute(
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint WHERE conrelid = to_regclass(%s) AND contype = 'f'", [old]
+        )
+        foreign_keys = cursor.fetchall()
+        cursor.execute(f"SELECT MIN({qn(PARTITION_COLUMN)}) FROM {qn(old)}")
+        oldest = cursor.fetchone()[0]
+
+        cursor.execute(
+            f"CREATE TABLE {qn(table)} (LIKE {qn(old)} INCLUDING DEFAULTS INCLUDING IDENTITY INCLUDING CONSTRAINTS) "
+            f"PARTITION BY RANGE ({qn(PARTITION_COLUMN)})"
+        )
+        cursor.execute(f"CREATE TABLE {qn(table + '_default')} PARTITION OF {qn(table)} DEFAULT")
+        first = oldest.astimezone(dt_timezone.utc).date() if oldest else timezone.now().date()
+        self.ensure_partitions(cursor, table, first, last)
+
+        cursor.execute(f"INSERT INTO {qn(table)} SELECT * FROM {qn(old)}")
+
+        # Keep the id sequence: identity columns got a fresh one, serial columns
+        # still use the old table's sequence and must not be dropped with it
+        cursor.execute("SELECT pg_get_serial_sequence(%s, 'id'), pg_get_serial_sequence(%s, 'id')", [table, old])
+        new_sequence, old_sequence = cursor.fetchone()
+        if new_sequence:
+            cursor.execute(f"SELECT setval(%s, COALESCE(MAX(id), 0) + 1, false) FROM {qn(table)}", [new_sequence])
+        elif old_sequence:
+            cursor.execute(f"ALTER SEQUENCE {old_sequence} OWNED BY {qn(table)}.id")
+
+        cursor.execute(f"DROP TABLE {qn(old)}")
+        cursor.execute(f"ALTER TABLE {qn(table)} ADD PRIMARY KEY (id, {qn(PARTITION_COLUMN)})")
+
+        for index_def in index_defs:
+            cursor.execute(re.sub(rf" ON (\S+\.)?{re.escape(qn(old))} | ON (\S+\.)?{re.escape(old)} ", f" ON {qn(table)} ", index_def))
+        for name, definition in foreign_keys:
+            cursor.execute(f"ALTER TABLE {qn(table)} ADD CONSTRAINT {qn(name)} {definition}")
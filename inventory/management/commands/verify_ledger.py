@@ -0,0 +1,179 @@
+"""
+Check every item's counters and running snapshots against its ledger.
+
+``Item.total_stock``/``allocated_quantity`` and the
+``stock_after_transaction``/``allocated_after_transaction`` snapshots are
+adjusted incrementally by several code paths, which can drift from what
+``recalculate_item_stock`` derives from the active transactions. This
+command replays the whole ledger with the same arithmetic and reports every
+item whose stored values differ; ``--fix`` writes the replayed values back
+with bulk updates.
+
+Items are split into id ranges that worker processes check in parallel.
+Each worker streams its range's rows in ``(item, date)`` index order with
+``QuerySet.iterator()``, which PostgreSQL serves from a server-side cursor,
+so memory stays flat however long the ledger is. With ``--fix`` a worker
+locks its range's items while it replays and repairs them, so concurrent
+transactions wait instead of being overwritten.
+
+Usage::
+
+    python manage.py verify_ledger                # report only
+    python manage.py verify_ledger --fix          # report and repair
+    python manage.py verify_ledger --workers 1    # no worker processes
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import groupby
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections, transaction
+from django.db.models import Max, Min
+
+from inventory.ledger import replay_step
+from inventory.models import Item, ItemUpdate, ResourceVersion
+
+LEDGER_COLUMNS = (
+    "item_id",
+    "id",
+    "transaction_type",
+    "quantity",
+    "allocated_quantity",
+    "is_converted",
+    "stock_after_transaction",
+    "allocated_after_transaction",
+    "po_client",
+    "dr_no",
+)
+
+
+def _init_worker():
+    # Spawned workers start without Django; forked ones reopen their own connections on first use
+    django.setup()
+
+
+def verify_range(start, stop, item_ids=None, fix=False, chunk_size=2000):
+    """
+    Replay the ledger of the items with ``start <= id < stop``.
+
+    Args:
+        start (int): First item id of the range.
+        stop (int): Item id the range ends before.
+        item_ids (list[int] | None): Only check these items of the range.
+        fix (bool): Write the replayed values back.
+        chunk_size (int): Rows fetched per round trip of the ledger cursor.
+
+    Returns:
+        dict: ``items`` and ``rows`` checked, ``snapshots`` that differ and
+        ``drifted``, a list of ``(item_id, item_name, stored, expected,
+        snapshot_count)`` tuples where ``stored``/``expected`` are
+        ``(total_stock, allocated_quantity)`` pairs.
+    """
+    items = Item.objects.filter(id__gte=start, id__lt=stop)
+    lines = ItemUpdate.objects.filter(item_id__gte=start, item_id__lt=stop, undone=False)
+    if item_ids is not None:
+        items = items.filter(id__in=item_ids)
+        lines = lines.filter(item_id__in=item_ids)
+
+    with transaction.atomic():
+        if fix:
+            items = items.select_for_update()
+        stored = {
+            pk: (name, (total, allocated))
+            for pk, name, total, allocated in items.values_list("id", "item_name", "total_stock", "allocated_quantity")
+        }
+
+        expected = {}
+        snapshots = {}
+        rows = 0
+        stream = lines.order_by("item_id", "date", "id").values_list(*LEDGER_COLUMNS, named=True).iterator(chunk_size=chunk_size)
+        for item_id, item_rows in groupby(stream, key=lambda row: row.item_id):
+            total = allocated = 0
+            for row in item_rows:
+                rows += 1
+                total, allocated = replay_step(
+                    total, allocated, row.transaction_type, row.quantity, row.allocated_quantity, row.is_converted
+                )
+                if (row.stock_after_transaction, row.allocated_after_transaction) != (total, allocated):
+                    # po_client/dr_no only name the cached payloads to invalidate
+                    fixed = ItemUpdate(id=row.id, stock_after_transaction=total, allocated_after_transaction=allocated)
+                    fixed.po_client, fixed.dr_no = row.po_client, row.dr_no
+                    snapshots.setdefault(item_id, []).append(fixed)
+            expected[item_id] = (total, allocated)
+
+        drifted = []
+        for item_id, (name, values) in sorted(stored.items()):
+            wanted = expected.get(item_id, (0, 0))
+            if values != wanted or item_id in snapshots:
+                drifted.append((item_id, name, values, wanted, len(snapshots.get(item_id, ()))))
+
+        if fix and drifted:
+            _repair(drifted, [update for item_id, *_ in drifted for update in snapshots.get(item_id, ())])
+
+    return {"items": len(stored), "rows": rows, "snapshots": sum(len(s) for s in snapshots.values()), "drifted": drifted}
+
+
+def _repair(drifted, snapshot_fixes):
+    """Write the replayed totals and snapshots of the drifted items back."""
+    ItemUpdate.objects.bulk_update(snapshot_fixes, ["stock_after_transaction", "allocated_after_transaction"], batch_size=500)
+    fixes = [Item(id=item_id, total_stock=total, allocated_quantity=allocated) for item_id, _, _, (total, allocated), _ in drifted]
+    Item.objects.bulk_update(fixes, ["total_stock", "allocated_quantity"], batch_size=500)
+    # bulk_update sends no post_save: soft-delete emptied items as auto_soft_delete_zero_stock
+    # would, and invalidate the cached payloads
+    Item.objects.filter(id__in=[fix.id for fix in fixes if fix.total_stock <= 0], is_deleted=False).update(is_deleted=True)
+    keys = {key for item_id, *_ in drifted for key in ResourceVersion.ledger_keys(item_id=item_id)}
+    keys.update(key for u in snapshot_fixes for key in ResourceVersion.ledger_keys(po_client=u.po_client, dr_no=u.dr_no))
+    ResourceVersion.bump(*keys)
+
+
+class Command(BaseCommand):
+    help = "Replay the ledger of every item in parallel and report (or --fix) drifted totals and snapshots."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--fix", action="store_true", help="Repair the drifted items with bulk updates.")
+        parser.add_argument("--workers", type=int, default=min(os.cpu_count() or 1, 4), help="Worker processes; 1 checks in this process.")
+        parser.add_argument("--range-size", type=int, default=1000, help="Item ids per worker task.")
+        parser.add_argument("--chunk-size", type=int, default=2000, help="Ledger rows fetched per cursor round trip.")
+        parser.add_argument("--item", type=int, action="append", dest="items", help="Only check these item ids.")
+
+    def handle(self, *args, **options):
+        if options["workers"] < 1 or options["range_size"] < 1:
+            raise CommandError("--workers and --range-size must be at least 1.")
+
+        bounds = Item.objects.aggregate(low=Min("id"), high=Max("id"))
+        if bounds["low"] is None:
+            self.stdout.write("No items to check.")
+            return
+        tasks = [
+            (start, start + options["range_size"], options["items"], options["fix"], options["chunk_size"])
+            for start in range(bounds["low"], bounds["high"] + 1, options["range_size"])
+        ]
+
+        workers = options["workers"]
+        if options["fix"] and connection.vendor == "sqlite":
+            workers = 1  # SQLite takes one writer at a time
+
+        if workers == 1:
+            results = [verify_range(*task) for task in tasks]
+        else:
+            # Workers must not share the parent's database connections
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+                results = list(pool.map(verify_range, *zip(*tasks)))
+
+        drifted = [entry for result in results for entry in result["drifted"]]
+        for item_id, name, (total, allocated), (expected_total, expected_allocated), snapshot_count in drifted:
+            self.stdout.write(
+                f"Item {item_id} ({name}): total_stock {total} -> {expected_total}, "
+                f"allocated_quantity {allocated} -> {expected_allocated}, {snapshot_count} snapshot rows differ"
+            )
+
+        items = sum(result["items"] for result in results)
+        rows = sum(result["rows"] for result in results)
+        snapshots = sum(result["snapshots"] for result in results)
+        summary = f"Checked {items} items and {rows} ledger rows: {len(drifted)} items drifted, {snapshots} snapshot rows differ."
+        if drifted and not options["fix"]:
+            raise CommandError(f"{summary} Rerun with --fix to repair them.")
+        self.stdout.write(self.style.SUCCESS(f"{summary}{' Repaired.' if drifted else ''}"))
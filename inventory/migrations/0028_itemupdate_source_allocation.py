@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory", "0027_resourceversion"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="itemupdate",
+            name="source_allocation",
+            field=models.ForeignKey(
+                blank=True,
+                help_text="ALLOCATED transaction this OUT was converted from",
+                limit_choices_to={"transaction_type": "ALLOCATED"},
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="conversions",
+                to="inventory.itemupdate",
+            ),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:45
+
+import re
+
+from django.db import migrations
+
+CONVERTED_FROM_RE = re.compile(r"ALLOCATED #(\d+)")
+
+
+def link_converted_outs(apps, schema_editor):
+    """Parse the "Converted from ALLOCATED #<id>" remarks of existing OUT rows once."""
+    ItemUpdate = apps.get_model("inventory", "ItemUpdate")
+    outs = ItemUpdate.objects.filter(transaction_type="OUT", remarks__contains="Converted from ALLOCATED", source_allocation__isnull=True)
+
+    pending = []
+    for update in outs.only("id", "item_id", "remarks").iterator(chunk_size=2000):
+        match = CONVERTED_FROM_RE.search(update.remarks)
+        if match:
+            pending.append((update, int(match.group(1))))
+
+    allocations = dict(
+        ItemUpdate.objects.filter(id__in={pk for _, pk in pending}, transaction_type="ALLOCATED").values_list("id", "item_id")
+    )
+    linked = []
+    for update, allocation_id in pending:
+        if allocations.get(allocation_id) == update.item_id:
+            update.source_allocation_id = allocation_id
+            linked.append(update)
+    ItemUpdate.objects.bulk_update(linked, ["source_allocation"], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory", "0028_itemupdate_source_allocation"),
+    ]
+
+    operations = [
+        migrations.RunPython(link_converted_outs, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:46
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory", "0029_backfill_source_allocation"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="itemupdate",
+            index=models.Index(fields=["item", "date"], name="itemupdate_item_date_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="itemupdate",
+            index=models.Index(fields=["date"], name="itemupdate_date_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="transactionhistory",
+            index=models.Index(fields=["item", "timestamp"], name="txhistory_item_ts_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="transactionhistory",
+            index=models.Index(fields=["timestamp"], name="txhistory_ts_idx"),
+        ),
+    ]
@@ -0,0 +1,107 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:49
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory", "0030_ledger_date_indexes"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="itemupdate",
+            name="transaction_type",
+            field=models.CharField(
+                choices=[("IN", "Stock In"), ("OUT", "Stock Out"), ("ALLOCATED", "Allocated"), ("BALANCE", "Balance Carried Forward")],
+                max_length=15,
+            ),
+        ),
+        migrations.CreateModel(
+            name="ArchivedItemUpdate",
+            fields=[
+                ("id", models.BigIntegerField(primary_key=True, serialize=False)),
+                ("date", models.DateTimeField()),
+                (
+                    "transaction_type",
+                    models.CharField(
+                        choices=[
+                            ("IN", "Stock In"),
+                            ("OUT", "Stock Out"),
+                            ("ALLOCATED", "Allocated"),
+                            ("BALANCE", "Balance Carried Forward"),
+                        ],
+                        max_length=15,
+                    ),
+                ),
+                ("quantity", models.PositiveIntegerField(default=0)),
+                ("allocated_quantity", models.PositiveIntegerField(default=0)),
+                ("serial_numbers", models.JSONField(blank=True, null=True)),
+                ("location", models.CharField(blank=True, max_length=200, null=True)),
+                ("po_supplier", models.CharField(blank=True, max_length=100, null=True, verbose_name="P.O From Supplier")),
+                ("po_client", models.CharField(blank=True, max_length=100, null=True, verbose_name="P.O To Client")),
+                ("dr_no", models.CharField(blank=True, max_length=100, null=True, verbose_name="DR No.")),
+                ("updated_by_user", models.CharField(blank=True, max_length=150, null=True)),
+                ("remarks", models.TextField(blank=True, null=True)),
+                ("stock_after_transaction", models.PositiveIntegerField(default=0)),
+                ("allocated_after_transaction", models.IntegerField(default=0)),
+                ("undone", models.BooleanField(default=False)),
+                ("is_converted", models.BooleanField(default=False)),
+                ("source_allocation_id", models.BigIntegerField(blank=True, null=True)),
+                ("archived_at", models.DateTimeField(default=django.utils.timezone.now)),
+                (
+                    "item",
+                    models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name="archived_updates", to="inventory.item"),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name="+", to=settings.AUTH_USER_MODEL
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["-date"],
+                "indexes": [models.Index(fields=["item", "date"], name="archived_update_item_date_idx")],
+            },
+        ),
+        migrations.CreateModel(
+            name="ArchivedTransactionHistory",
+            fields=[
+                ("id", models.BigIntegerField(primary_key=True, serialize=False)),
+                (
+                    "action_type",
+                    models.CharField(
+                        choices=[("in", "Stock In"), ("out", "Stock Out"), ("undo", "Undo Transaction"), ("add", "New Item Added")],
+                        max_length=20,
+                    ),
+                ),
+                ("quantity", models.IntegerField(default=0)),
+                ("previous_stock", models.IntegerField(default=0)),
+                ("new_stock", models.IntegerField(default=0)),
+                ("remarks", models.TextField(blank=True, null=True)),
+                ("timestamp", models.DateTimeField()),
+                ("archived_at", models.DateTimeField(default=django.utils.timezone.now)),
+                (
+                    "item",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, related_name="archived_transactions", to="inventory.item"
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        null=True, on_delete=django.db.models.deletion.SET_NULL, related_name="+", to=settings.AUTH_USER_MODEL
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [models.Index(fields=["item", "timestamp"], name="archived_tx_item_ts_idx")],
+            },
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:10
+
+import json
+
+from django.db import migrations
+
+
+def _normalize(serial_data):
+    """Frozen copy of ``inventory.models.parse_serials`` as of this migration."""
+    if not serial_data:
+        return []
+    if isinstance(serial_data, str):
+        try:
+            data = json.loads(serial_data)
+        except json.JSONDecodeError:
+            data = None
+        serial_data = data if isinstance(data, list) else serial_data.split(",")
+    if not isinstance(serial_data, (list, tuple)):
+        return []
+    return [str(s).strip() for s in serial_data if s is not None and str(s).strip()]
+
+
+def normalize_serial_numbers(apps, schema_editor):
+    """Rewrite legacy JSON-string and comma-separated serial payloads as lists."""
+    for model_name in ("ItemUpdate", "ArchivedItemUpdate"):
+        model = apps.get_model("inventory", model_name)
+        changed = []
+        for row in model.objects.filter(serial_numbers__isnull=False).only("id", "serial_numbers").iterator(chunk_size=2000):
+            serials = _normalize(row.serial_numbers) or None
+            if serials != row.serial_numbers:
+                row.serial_numbers = serials
+                changed.append(row)
+        model.objects.bulk_update(changed, ["serial_numbers"], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory", "0031_ledger_archive"),
+    ]
+
+    operations = [
+        migrations.RunPython(normalize_serial_numbers, migrations.RunPython.noop),
+    ]
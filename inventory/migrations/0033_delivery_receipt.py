@@ -0,0 +1,93 @@
+# Generated by Django 5.2.18 on 2026-10-19 01:05
+
+from collections import defaultdict
+
+import django.db.models.functions.text
+from django.conf import settings
+from django.db import migrations, models
+
+
+def _key(value):
+    """Frozen copy of ``inventory.models.normalize_ref`` as of this migration."""
+    return (value or "").strip().lower()
+
+
+def build_delivery_receipts(apps, schema_editor):
+    """Create one receipt per (P.O., DR) found in the live and archived ledgers."""
+    DeliveryReceipt = apps.get_model("inventory", "DeliveryReceipt")
+    fields = ("po_client", "dr_no", "date", "transaction_type", "undone", "remarks", "location")
+    lines = defaultdict(list)
+    for model_name in ("ItemUpdate", "ArchivedItemUpdate"):
+        rows = apps.get_model("inventory", model_name).objects.exclude(dr_no__isnull=True).exclude(dr_no="").values(*fields)
+        for row in rows.iterator(chunk_size=2000):
+            if _key(row["dr_no"]):
+                lines[(_key(row["po_client"]), _key(row["dr_no"]))].append(row)
+
+    receipts = []
+    for (po_key, dr_key), rows in lines.items():
+        latest = max(rows, key=lambda row: row["date"])
+        receipts.append(
+            DeliveryReceipt(
+                po_key=po_key,
+                dr_key=dr_key,
+                po_no=(latest["po_client"] or "").strip(),
+                dr_no=latest["dr_no"].strip(),
+                line_count=len(rows),
+                active_line_count=sum(1 for row in rows if not row["undone"] and row["transaction_type"] != "ALLOCATED"),
+                first_date=min(row["date"] for row in rows),
+                last_date=latest["date"],
+                remarks=latest["remarks"],
+                location=latest["location"],
+            )
+        )
+    DeliveryReceipt.objects.bulk_create(receipts, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory", "0032_normalize_serial_numbers"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DeliveryReceipt",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("po_key", models.CharField(blank=True, max_length=100)),
+                ("dr_key", models.CharField(max_length=100)),
+                ("po_no", models.CharField(blank=True, max_length=100, verbose_name="P.O To Client")),
+                ("dr_no", models.CharField(max_length=100, verbose_name="DR No.")),
+                ("line_count", models.PositiveIntegerField(default=0)),
+                ("active_line_count", models.PositiveIntegerField(default=0)),
+                ("first_date", models.DateTimeField(blank=True, null=True)),
+                ("last_date", models.DateTimeField(blank=True, null=True)),
+                ("remarks", models.TextField(blank=True, null=True)),
+                ("location", models.CharField(blank=True, max_length=200, null=True)),
+                ("image_count", models.PositiveIntegerField(default=0)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="archiveditemupdate",
+            index=models.Index(django.db.models.functions.text.Lower("dr_no"), name="archived_update_dr_key_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="itemupdate",
+            index=models.Index(django.db.models.functions.text.Lower("dr_no"), name="itemupdate_dr_key_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="deliveryreceipt",
+            index=models.Index(fields=["po_key", "-last_date"], name="receipt_po_last_date_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="deliveryreceipt",
+            index=models.Index(fields=["dr_key"], name="receipt_dr_key_idx"),
+        ),
+        migrations.AddConstraint(
+            model_name="deliveryreceipt",
+            constraint=models.UniqueConstraint(fields=("po_key", "dr_key"), name="unique_delivery_receipt"),
+        ),
+        migrations.RunPython(build_delivery_receipts, migrations.RunPython.noop),
+    ]
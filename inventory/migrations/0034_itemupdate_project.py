@@ -0,0 +1,76 @@
+# Generated by Django 5.2.18 on 2026-10-19 01:08
+
+from collections import defaultdict
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def _key(value):
+    """Frozen copy of ``inventory.models.normalize_ref`` as of this migration."""
+    return (value or "").strip().lower()
+
+
+def link_projects(apps, schema_editor):
+    """Link ledger lines and receipts to the (oldest) project with the same normalized P.O."""
+    projects = {}
+    for pk, po_key in apps.get_model("app_core", "Project").objects.order_by("-id").values_list("id", "po_key"):
+        projects[po_key] = pk  # newest first, so the oldest project wins
+    if not projects:
+        return
+
+    for model_name in ("ItemUpdate", "ArchivedItemUpdate"):
+        model = apps.get_model("inventory", model_name)
+        ids_by_project = defaultdict(list)
+        for pk, po_client in model.objects.exclude(po_client__isnull=True).exclude(po_client="").values_list("id", "po_client").iterator():
+            if project_id := projects.get(_key(po_client)):
+                ids_by_project[project_id].append(pk)
+        for project_id, ids in ids_by_project.items():
+            for start in range(0, len(ids), 1000):
+                model.objects.filter(id__in=ids[start : start + 1000]).update(project_id=project_id)
+
+    DeliveryReceipt = apps.get_model("inventory", "DeliveryReceipt")
+    for po_key, project_id in projects.items():
+        DeliveryReceipt.objects.filter(po_key=po_key).update(project_id=project_id)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("app_core", "0018_project_po_key"),
+        ("inventory", "0033_delivery_receipt"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="archiveditemupdate",
+            name="project",
+            field=models.ForeignKey(
+                blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name="+", to="app_core.project"
+            ),
+        ),
+        migrations.AddField(
+            model_name="deliveryreceipt",
+            name="project",
+            field=models.ForeignKey(
+                blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name="receipts", to="app_core.project"
+            ),
+        ),
+        migrations.AddField(
+            model_name="itemupdate",
+            name="project",
+            field=models.ForeignKey(
+                blank=True,
+                help_text="Project whose P.O. matches the client P.O.",
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="ledger_lines",
+                to="app_core.project",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="deliveryreceipt",
+            index=models.Index(fields=["project", "-last_date"], name="receipt_project_last_date_idx"),
+        ),
+        migrations.RunPython(link_projects, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,75 @@
+# Generated by Django 5.2.18 on 2026-10-19 01:10
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Q, Sum
+
+
+def build_project_item_rollups(apps, schema_editor):
+    """Compute every (project, item) rollup from the live and archived ledgers."""
+    ProjectItemRollup = apps.get_model("inventory", "ProjectItemRollup")
+    rollups = {}
+    for model_name in ("ItemUpdate", "ArchivedItemUpdate"):
+        lines = apps.get_model("inventory", model_name).objects.filter(project__isnull=False)
+        totals = lines.values("project", "item").annotate(
+            shipped=Sum("quantity", filter=Q(transaction_type="OUT", undone=False)),
+            allocated=Sum("allocated_quantity", filter=Q(transaction_type="ALLOCATED", undone=False, is_converted=False)),
+        )
+        for row in totals.order_by():
+            rollup = rollups.setdefault((row["project"], row["item"]), ProjectItemRollup(project_id=row["project"], item_id=row["item"]))
+            rollup.shipped_quantity += row["shipped"] or 0
+            rollup.allocated_quantity += row["allocated"] or 0
+
+        with_dr = lines.filter(undone=False).exclude(dr_no__isnull=True).exclude(dr_no="").values_list("project", "item", "dr_no", "date")
+        for project_id, item_id, dr_no, date in with_dr.iterator(chunk_size=2000):
+            rollup = rollups[(project_id, item_id)]
+            if dr_no.strip() and (rollup.last_dr_date is None or date > rollup.last_dr_date):
+                rollup.last_dr_no, rollup.last_dr_date = dr_no.strip(), date
+    ProjectItemRollup.objects.bulk_create(rollups.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("app_core", "0018_project_po_key"),
+        ("inventory", "0034_itemupdate_project"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ProjectItemRollup",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("shipped_quantity", models.PositiveIntegerField(default=0)),
+                ("allocated_quantity", models.PositiveIntegerField(default=0)),
+                ("last_dr_no", models.CharField(blank=True, max_length=100, null=True, verbose_name="Last DR No.")),
+                ("last_dr_date", models.DateTimeField(blank=True, null=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="archiveditemupdate",
+            index=models.Index(fields=["project", "item"], name="archived_project_item_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="itemupdate",
+            index=models.Index(fields=["project", "item"], name="itemupdate_project_item_idx"),
+        ),
+        migrations.AddField(
+            model_name="projectitemrollup",
+            name="item",
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name="project_rollups", to="inventory.item"),
+        ),
+        migrations.AddField(
+            model_name="projectitemrollup",
+            name="project",
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name="item_rollups", to="app_core.project"),
+        ),
+        migrations.AddConstraint(
+            model_name="projectitemrollup",
+            constraint=models.UniqueConstraint(fields=("project", "item"), name="unique_project_item_rollup"),
+        ),
+        migrations.RunPython(build_project_item_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,142 @@
+# Generated by Django 5.2.18 on 2026-10-19 01:21
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Q, Sum
+
+
+def _key(name):
+    return " ".join((name or "").split()).lower()
+
+
+def link_locations(apps, schema_editor):
+    """Create a Location per distinct location text and point the ledger lines at it."""
+    Location = apps.get_model("inventory", "Location")
+    ledgers = [apps.get_model("inventory", name) for name in ("ArchivedItemUpdate", "ItemUpdate")]
+
+    names = {}
+    for model in ledgers:
+        for name in (
+            model.objects.exclude(location__isnull=True).order_by("date").values_list("location", flat=True).iterator(chunk_size=2000)
+        ):
+            names.setdefault(_key(name), " ".join(name.split()))
+    names.pop("", None)
+    Location.objects.bulk_create([Location(key=key, name=name) for key, name in names.items()], batch_size=1000)
+    site_ids = dict(Location.objects.values_list("key", "id"))
+
+    for model in ledgers:
+        rows = model.objects.exclude(location__isnull=True).order_by("id").values_list("id", "location")
+        batch = []
+        for row in rows.iterator(chunk_size=2000):
+            batch.append(row)
+            if len(batch) == 2000:
+                _set_sites(model, batch, site_ids)
+                batch = []
+        _set_sites(model, batch, site_ids)
+
+
+def _set_sites(model, rows, site_ids):
+    by_site = {}
+    for pk, name in rows:
+        site_id = site_ids.get(_key(name))
+        if site_id:
+            by_site.setdefault(site_id, []).append(pk)
+    for site_id, ids in by_site.items():
+        model.objects.filter(id__in=ids).update(site_id=site_id)
+
+
+def build_location_balances(apps, schema_editor):
+    """Compute every (item, location) balance from the live and archived ledgers."""
+    ItemLocationBalance = apps.get_model("inventory", "ItemLocationBalance")
+    balances = {}
+    for model_name in ("ItemUpdate", "ArchivedItemUpdate"):
+        totals = (
+            apps.get_model("inventory", model_name)
+            .objects.filter(site__isnull=False)
+            .values("site", "item")
+            .annotate(
+                received=Sum("quantity", filter=Q(transaction_type="IN", undone=False)),
+                sent=Sum("quantity", filter=Q(transaction_type="OUT", undone=False)),
+                allocated=Sum("allocated_quantity", filter=Q(transaction_type="ALLOCATED", undone=False, is_converted=False)),
+            )
+        )
+        for row in totals.order_by():
+            balance = balances.setdefault((row["site"], row["item"]), ItemLocationBalance(location_id=row["site"], item_id=row["item"]))
+            balance.quantity += (row["received"] or 0) - (row["sent"] or 0)
+            balance.allocated_quantity += row["allocated"] or 0
+    ItemLocationBalance.objects.bulk_create(balances.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("app_core", "0018_project_po_key"),
+        ("inventory", "0035_project_item_rollup"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Location",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("name", models.CharField(max_length=200)),
+                ("key", models.CharField(max_length=200, unique=True)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                "ordering": ["name"],
+            },
+        ),
+        migrations.CreateModel(
+            name="ItemLocationBalance",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("quantity", models.IntegerField(default=0)),
+                ("allocated_quantity", models.PositiveIntegerField(default=0)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "item",
+                    models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name="location_balances", to="inventory.item"),
+                ),
+                (
+                    "location",
+                    models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name="item_balances", to="inventory.location"),
+                ),
+            ],
+        ),
+        migrations.AddField(
+            model_name="archiveditemupdate",
+            name="site",
+            field=models.ForeignKey(
+                blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name="+", to="inventory.location"
+            ),
+        ),
+        migrations.AddField(
+            model_name="itemupdate",
+            name="site",
+            field=models.ForeignKey(
+                blank=True,
+                help_text="Location named by the location text",
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="ledger_lines",
+                to="inventory.location",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="archiveditemupdate",
+            index=models.Index(fields=["site", "item"], name="archived_site_item_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="itemupdate",
+            index=models.Index(fields=["site", "item"], name="itemupdate_site_item_idx"),
+        ),
+        migrations.AddConstraint(
+            model_name="itemlocationbalance",
+            constraint=models.UniqueConstraint(fields=("item", "location"), name="unique_item_location_balance"),
+        ),
+        migrations.RunPython(link_locations, migrations.RunPython.noop),
+        migrations.RunPython(build_location_balances, migrations.RunPython.noop),
+    ]
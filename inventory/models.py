@@ -1,11 +1,40 @@
+import json
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
 from django.db import models
-from django.db.models.signals import post_save
+from django.db.models import F, Max, Q, Sum
+from django.db.models.functions import Greatest, Lower, Trim
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 from django.utils import timezone
 
 from accounts.models import CustomUser
 
 
+def parse_serials(serial_data):
+    """
+    Return serial numbers as a clean list of non-empty strings.
+
+    Accepts the shapes older rows were written in: a list, a JSON-encoded
+    list, or a comma-separated string.
+    """
+    if not serial_data:
+        return []
+
+    if isinstance(serial_data, str):
+        try:
+            data = json.loads(serial_data)
+        except json.JSONDecodeError:
+            data = None
+        serial_data = data if isinstance(data, list) else serial_data.split(",")
+
+    if not isinstance(serial_data, (list, tuple)):
+        return []
+    return [str(s).strip() for s in serial_data if s is not None and str(s).strip()]
+
+
 class Item(models.Model):
     """
     Represents an inventory item in the system.
@@ -36,9 +65,28 @@ class Item(models.Model):
     is_deleted = models.BooleanField(default=False)
     created = models.DateTimeField(auto_now_add=True)
 
+    #: Item columns copied into the cached PO/DR/project payloads
+    PAYLOAD_FIELDS = ("item_name", "description", "unit_of_quantity")
+
     def __str__(self):
         return f"{self.item_name} ({self.id})"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remembered so a save can tell whether the cached payloads went stale; deferred fields are not loaded for it
+        instance._loaded_payload = {name: value for name, value in zip(field_names, values) if name in cls.PAYLOAD_FIELDS}
+        return instance
+
+    def payload_changed(self):
+        """Whether a payload field differs from the value last loaded or saved (True if neither happened)."""
+        loaded = getattr(self, "_loaded_payload", None)
+        if loaded is None:
+            return True
+        # Fields still deferred were neither loaded nor assigned
+        current = {name: self.__dict__[name] for name in self.PAYLOAD_FIELDS if name in self.__dict__}
+        return any(name not in loaded or loaded[name] != value for name, value in current.items())
+
     @property
     def available_serials(self):
         """
@@ -87,6 +135,58 @@ class ItemSerial(models.Model):
         unique_together = ("item", "serial_no")
 
 
+class Location(models.Model):
+    """
+    A place stock is received at or sent to.
+
+    Ledger lines keep the location as typed in ``ItemUpdate.location`` and
+    point at the Location it names through ``ItemUpdate.site``; names that
+    differ only in case or spacing share one Location.
+
+    Attributes:
+        name (str): The name as first typed.
+        key (str): The first ``name`` lower-cased with runs of whitespace
+            collapsed; ledger ``location`` strings are matched against it.
+        created_at (datetime): When the location was first used.
+    """
+
+    name = models.CharField(max_length=200)
+    key = models.CharField(max_length=200, unique=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["name"]
+
+    def __str__(self):
+        return self.name
+
+    def save(self, *args, **kwargs):
+        self.name = " ".join(self.name.split())
+        # Renaming only changes the display name; lines typed with the old name still match
+        if not self.key:
+            self.key = self.key_for(self.name)
+        super().save(*args, **kwargs)
+
+    @staticmethod
+    def key_for(name):
+        """Return the matching key of a location name ("" for empty names)."""
+        return " ".join((name or "").split()).lower()
+
+    @classmethod
+    def for_name(cls, name):
+        """
+        Return the Location a typed location name refers to, creating it on first use.
+
+        Returns:
+            Location | None: The location, or None for an empty name.
+        """
+        key = cls.key_for(name)
+        if not key:
+            return None
+        location, _ = cls.objects.get_or_create(key=key, defaults={"name": " ".join(name.split())})
+        return location
+
+
 class ItemUpdate(models.Model):
     """
     Logs each inventory transaction for an item (stock in, out, or allocation).
@@ -97,20 +197,26 @@ class ItemUpdate(models.Model):
     Attributes:
         item (Item): The item being updated.
         date (datetime): Timestamp of the transaction.
-        transaction_type (str): Type of transaction ("IN", "OUT", or "ALLOCATED").
+        transaction_type (str): Type of transaction ("IN", "OUT", "ALLOCATED", or
+            "BALANCE" for the stock carried forward from archived rows).
         quantity (int): Quantity affected by the transaction.
         serial_numbers (JSONField): List of serial numbers affected.
         location (str): Location related to the transaction.
+        site (Location): The Location ``location`` names, set on save.
         user (CustomUser): User who made the transaction.
         remarks (str): Optional additional notes.
         stock_after_transaction (int): Resulting stock level after transaction.
         undone (bool): Whether this transaction has been undone.
+        source_allocation (ItemUpdate): For OUTs converted from an allocation,
+            the ALLOCATED transaction they came from.
+        project (Project): The project whose P.O. matches ``po_client``, set on save.
     """
 
     TRANSACTION_TYPE = [
         ("IN", "Stock In"),
         ("OUT", "Stock Out"),
         ("ALLOCATED", "Allocated"),
+        ("BALANCE", "Balance Carried Forward"),
     ]
 
     item = models.ForeignKey(Item, on_delete=models.CASCADE, related_name="updates")
@@ -120,6 +226,14 @@ class ItemUpdate(models.Model):
     allocated_quantity = models.PositiveIntegerField(default=0)  # for ALLOCATED transactions
     serial_numbers = models.JSONField(blank=True, null=True, help_text="List of serial numbers affected")
     location = models.CharField(max_length=200, blank=True, null=True)
+    site = models.ForeignKey(
+        Location,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="ledger_lines",
+        help_text="Location named by the location text",
+    )
     po_supplier = models.CharField("P.O From Supplier", max_length=100, blank=True, null=True)
     po_client = models.CharField("P.O To Client", max_length=100, blank=True, null=True)
     dr_no = models.CharField("DR No.", max_length=100, blank=True, null=True)
@@ -136,9 +250,36 @@ class ItemUpdate(models.Model):
     allocated_after_transaction = models.IntegerField(default=0)  # track allocated
     undone = models.BooleanField(default=False)
     is_converted = models.BooleanField(default=False)
+    source_allocation = models.ForeignKey(
+        "self",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="conversions",
+        limit_choices_to={"transaction_type": "ALLOCATED"},
+        help_text="ALLOCATED transaction this OUT was converted from",
+    )
+    project = models.ForeignKey(
+        "app_core.Project",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="ledger_lines",
+        help_text="Project whose P.O. matches the client P.O.",
+    )
+
+    #: Live rows can be undone or converted; see ArchivedItemUpdate
+    is_archived = False
 
     class Meta:
         ordering = ["-date"]
+        indexes = [
+            models.Index(fields=["item", "date"], name="itemupdate_item_date_idx"),
+            models.Index(fields=["date"], name="itemupdate_date_idx"),
+            models.Index(Lower("dr_no"), name="itemupdate_dr_key_idx"),
+            models.Index(fields=["project", "item"], name="itemupdate_project_item_idx"),
+            models.Index(fields=["site", "item"], name="itemupdate_site_item_idx"),
+        ]
 
     def __str__(self):
         direction = "➕" if self.transaction_type == "IN" else "➖"
@@ -157,9 +298,23 @@ class ItemUpdate(models.Model):
             - Decreases total stock and increases allocated quantity.
 
         Ensures stock changes are only applied to the latest transaction.
+        ``serial_numbers`` is normalized to a list of strings, ``project``
+        is resolved from ``po_client`` and ``site`` from ``location`` before
+        saving.
         """
         is_new = self._state.adding
+        # Stored as a list (or NULL when empty) so readers never re-parse it
+        self.serial_numbers = parse_serials(self.serial_numbers) or None
+        if self.po_client and self.project_id is None:
+            self.project = self.project_for(self.po_client)
+        moved_from = None
+        if Location.key_for(self.location) != (self.site.key if self.site_id else ""):
+            moved_from = self.site_id
+            self.site = Location.for_name(self.location)
         super().save(*args, **kwargs)
+        if moved_from:
+            # The receiver refreshes the new location; the old one loses this line
+            ItemLocationBalance.refresh([(moved_from, self.item_id)])
 
         if not is_new:
             return
@@ -192,6 +347,19 @@ class ItemUpdate(models.Model):
         self.stock_after_transaction = self.item.total_stock
         super().save(update_fields=["stock_after_transaction"])
 
+    @classmethod
+    def project_for(cls, po_client):
+        """
+        Return the project a client P.O. belongs to, matched on the normalized P.O.
+
+        When several projects share a P.O. the oldest one is used.
+
+        Returns:
+            Project | None: The project, or None if no project has this P.O.
+        """
+        project_model = cls._meta.get_field("project").related_model
+        return project_model.objects.filter(po_key=normalize_ref(po_client)).order_by("id").first()
+
 
 class TransactionHistory(models.Model):
     """
@@ -226,10 +394,84 @@ class TransactionHistory(models.Model):
     remarks = models.TextField(blank=True, null=True)
     timestamp = models.DateTimeField(default=timezone.now)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["item", "timestamp"], name="txhistory_item_ts_idx"),
+            models.Index(fields=["timestamp"], name="txhistory_ts_idx"),
+        ]
+
     def __str__(self):
         return f"{self.item.item_name} - {self.action_type} ({self.quantity}) by {self.user}"
 
 
+class ArchivedItemUpdate(models.Model):
+    """
+    An ItemUpdate moved out of the live ledger by the ``archive_ledger`` command.
+
+    Keeps the original id and every column. The live ledger holds a BALANCE
+    row per item carrying the archived stock forward, so archived rows are
+    never needed for recomputation; they are read only by history pages.
+    """
+
+    id = models.BigIntegerField(primary_key=True)
+    item = models.ForeignKey(Item, on_delete=models.CASCADE, related_name="archived_updates")
+    date = models.DateTimeField()
+    transaction_type = models.CharField(max_length=15, choices=ItemUpdate.TRANSACTION_TYPE)
+    quantity = models.PositiveIntegerField(default=0)
+    allocated_quantity = models.PositiveIntegerField(default=0)
+    serial_numbers = models.JSONField(blank=True, null=True)
+    location = models.CharField(max_length=200, blank=True, null=True)
+    po_supplier = models.CharField("P.O From Supplier", max_length=100, blank=True, null=True)
+    po_client = models.CharField("P.O To Client", max_length=100, blank=True, null=True)
+    dr_no = models.CharField("DR No.", max_length=100, blank=True, null=True)
+    user = models.ForeignKey(CustomUser, on_delete=models.SET_NULL, null=True, blank=True, related_name="+")
+    updated_by_user = models.CharField(max_length=150, blank=True, null=True)
+    remarks = models.TextField(blank=True, null=True)
+    stock_after_transaction = models.PositiveIntegerField(default=0)
+    allocated_after_transaction = models.IntegerField(default=0)
+    undone = models.BooleanField(default=False)
+    is_converted = models.BooleanField(default=False)
+    source_allocation_id = models.BigIntegerField(blank=True, null=True)
+    project = models.ForeignKey("app_core.Project", on_delete=models.SET_NULL, null=True, blank=True, related_name="+")
+    site = models.ForeignKey(Location, on_delete=models.SET_NULL, null=True, blank=True, related_name="+")
+    archived_at = models.DateTimeField(default=timezone.now)
+
+    is_archived = True
+
+    class Meta:
+        ordering = ["-date"]
+        indexes = [
+            models.Index(fields=["item", "date"], name="archived_update_item_date_idx"),
+            models.Index(Lower("dr_no"), name="archived_update_dr_key_idx"),
+            models.Index(fields=["project", "item"], name="archived_project_item_idx"),
+            models.Index(fields=["site", "item"], name="archived_site_item_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.item.item_name} {self.transaction_type} ({self.quantity}) [archived]"
+
+
+class ArchivedTransactionHistory(models.Model):
+    """A TransactionHistory row moved out of the live table by ``archive_ledger``."""
+
+    id = models.BigIntegerField(primary_key=True)
+    item = models.ForeignKey(Item, on_delete=models.CASCADE, related_name="archived_transactions")
+    user = models.ForeignKey(CustomUser, on_delete=models.SET_NULL, null=True, related_name="+")
+    action_type = models.CharField(max_length=20, choices=TransactionHistory.ACTION_CHOICES)
+    quantity = models.IntegerField(default=0)
+    previous_stock = models.IntegerField(default=0)
+    new_stock = models.IntegerField(default=0)
+    remarks = models.TextField(blank=True, null=True)
+    timestamp = models.DateTimeField()
+    archived_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [models.Index(fields=["item", "timestamp"], name="archived_tx_item_ts_idx")]
+
+    def __str__(self):
+        return f"{self.item.item_name} - {self.action_type} ({self.quantity}) [archived]"
+
+
 @receiver(post_save, sender=Item)
 def auto_soft_delete_zero_stock(sender, instance, created, **kwargs):
     """
@@ -244,3 +486,695 @@ def auto_soft_delete_zero_stock(sender, instance, created, **kwargs):
 
     if instance.total_stock <= 0 and not instance.is_deleted:
         Item.objects.filter(pk=instance.pk, is_deleted=False).update(is_deleted=True)
+
+
+def normalize_ref(value):
+    """
+    Normalize a PO or DR reference for case- and whitespace-insensitive matching.
+
+    Args:
+        value (str | None): The reference as typed by the user.
+
+    Returns:
+        str: The stripped, lower-cased reference ("" for empty values).
+    """
+    return (value or "").strip().lower()
+
+
+class ResourceVersion(models.Model):
+    """
+    Generation counter for a cacheable resource (a PO, DR, item or list).
+
+    Writers bump the counters of every resource they touch; read-only JSON
+    endpoints derive their ETag/Last-Modified from these rows so an unchanged
+    resource can be answered with 304 without running its real queries.
+
+    Attributes:
+        key (str): Resource key such as ``"po:po-123"`` or ``"projects"``.
+        version (int): Incremented on every change to the resource.
+        updated_at (datetime): Time of the last change.
+    """
+
+    key = models.CharField(max_length=255, primary_key=True)
+    version = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.key} v{self.version}"
+
+    @staticmethod
+    def ledger_keys(item_id=None, po_client=None, dr_no=None):
+        """Return the version keys affected by a ledger row with these references."""
+        keys = []
+        if item_id:
+            keys.append(f"item:{item_id}")
+        if po := normalize_ref(po_client):
+            keys.append(f"po:{po}")
+        if dr := normalize_ref(dr_no):
+            keys.append(f"dr:{dr}")
+        return keys
+
+    @classmethod
+    def bump(cls, *keys):
+        """
+        Increment the version of every given key, creating missing rows.
+
+        Args:
+            *keys (str): Resource keys to invalidate. Empty values are ignored.
+        """
+        keys = sorted({key for key in keys if key})
+        if not keys:
+            return
+
+        now = timezone.now()
+        updated = cls.objects.filter(key__in=keys).update(version=F("version") + 1, updated_at=now)
+        if updated < len(keys):
+            cls.objects.bulk_create([cls(key=key, updated_at=now) for key in keys], ignore_conflicts=True)
+            cls.objects.filter(key__in=keys).update(version=F("version") + 1, updated_at=now)
+
+    @classmethod
+    def stamp(cls, keys):
+        """
+        Return the combined version stamp of a set of keys.
+
+        Args:
+            keys (Iterable[str]): Resource keys the response depends on.
+
+        Returns:
+            tuple[str, datetime | None]: A digest of all ``(key, version)`` pairs
+            and the most recent ``updated_at`` among them.
+        """
+        rows = sorted(cls.objects.filter(key__in=set(keys)).values_list("key", "version", "updated_at"))
+        return cls._combine(rows)
+
+    @classmethod
+    async def astamp(cls, keys):
+        """Async version of ``stamp`` for async views."""
+        rows = sorted([row async for row in cls.objects.filter(key__in=set(keys)).values_list("key", "version", "updated_at")])
+        return cls._combine(rows)
+
+    @staticmethod
+    def _combine(rows):
+        digest = ";".join(f"{key}={version}" for key, version, _ in rows)
+        last_modified = max((updated_at for _, _, updated_at in rows), default=None)
+        return digest, last_modified
+
+
+class DeliveryReceipt(models.Model):
+    """
+    Index row for one delivery receipt: a DR number under a client P.O.
+
+    Keyed by the normalized references (see ``normalize_ref``), so a DR
+    written "DR-001" in the ledger and uploaded as "dr-001" is one receipt.
+    The ledger columns are recomputed by ``refresh`` whenever transactions on
+    the DR are written; app_core links the scanned images (``images``) and
+    keeps ``image_count``. Project and DR screens read this table instead of
+    grouping the ledger.
+
+    Attributes:
+        po_key (str): Normalized client P.O. ("" for DRs without one).
+        dr_key (str): Normalized DR number.
+        project (Project): Project of the latest ledger line.
+        po_no (str): The P.O. as written on the latest ledger line (or upload).
+        dr_no (str): The DR number as written on the latest ledger line (or upload).
+        line_count (int): Ledger lines on the DR, live and archived, undone included.
+        active_line_count (int): Lines that are neither undone nor allocations.
+        first_date (datetime): Date of the earliest line.
+        last_date (datetime): Date of the latest line.
+        remarks (str): Remarks of the latest line.
+        location (str): Location of the latest line.
+        image_count (int): Scanned images uploaded for the DR.
+        updated_at (datetime): Time of the last refresh.
+    """
+
+    #: ItemUpdate columns the receipt is computed from
+    LEDGER_FIELDS = ("po_client", "dr_no", "date", "transaction_type", "undone", "remarks", "location", "project")
+
+    po_key = models.CharField(max_length=100, blank=True)
+    dr_key = models.CharField(max_length=100)
+    project = models.ForeignKey("app_core.Project", on_delete=models.SET_NULL, null=True, blank=True, related_name="receipts")
+    po_no = models.CharField("P.O To Client", max_length=100, blank=True)
+    dr_no = models.CharField("DR No.", max_length=100)
+    line_count = models.PositiveIntegerField(default=0)
+    active_line_count = models.PositiveIntegerField(default=0)
+    first_date = models.DateTimeField(null=True, blank=True)
+    last_date = models.DateTimeField(null=True, blank=True)
+    remarks = models.TextField(blank=True, null=True)
+    location = models.CharField(max_length=200, blank=True, null=True)
+    image_count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=["po_key", "dr_key"], name="unique_delivery_receipt")]
+        indexes = [
+            models.Index(fields=["po_key", "-last_date"], name="receipt_po_last_date_idx"),
+            models.Index(fields=["project", "-last_date"], name="receipt_project_last_date_idx"),
+            models.Index(fields=["dr_key"], name="receipt_dr_key_idx"),
+        ]
+
+    def __str__(self):
+        return f"DR {self.dr_no} | PO {self.po_no}"
+
+    @classmethod
+    def for_refs(cls, po_no, dr_no):
+        """Return the receipt for a P.O. and DR as typed, creating an empty one if needed."""
+        receipt, _ = cls.objects.get_or_create(
+            po_key=normalize_ref(po_no),
+            dr_key=normalize_ref(dr_no),
+            defaults={"po_no": (po_no or "").strip(), "dr_no": (dr_no or "").strip()},
+        )
+        return receipt
+
+    @classmethod
+    def refresh(cls, refs):
+        """
+        Recompute the ledger columns of the receipts behind ``refs``.
+
+        Lines are read from the live and archived ledgers through their
+        ``lower(dr_no)`` indexes. A receipt left without lines is deleted
+        unless it still has images.
+
+        Args:
+            refs (Iterable[tuple[str | None, str | None]]): ``(po_client, dr_no)``
+                pairs as written on ledger rows; pairs without a DR are ignored.
+        """
+        refs = {(po, dr) for po, dr in refs if normalize_ref(dr)}
+        pairs = {(normalize_ref(po), normalize_ref(dr)) for po, dr in refs}
+        if not pairs:
+            return
+        dr_keys = {dr for _, dr in pairs}
+
+        # lower(dr_no) keeps surrounding whitespace, so also look up the spellings we were given
+        lines = defaultdict(list)
+        for model in (ItemUpdate, ArchivedItemUpdate):
+            rows = model.objects.alias(dr_lower=Lower("dr_no")).filter(dr_lower__in=dr_keys | {dr.lower() for _, dr in refs})
+            for row in rows.values(*cls.LEDGER_FIELDS):
+                key = (normalize_ref(row["po_client"]), normalize_ref(row["dr_no"]))
+                if key in pairs:
+                    lines[key].append(row)
+
+        receipts = {(r.po_key, r.dr_key): r for r in cls.objects.filter(dr_key__in=dr_keys)}
+        for po_key, dr_key in pairs:
+            receipt = receipts.get((po_key, dr_key))
+            rows = lines.get((po_key, dr_key), [])
+            if not rows:
+                if receipt is not None and not receipt.image_count:
+                    receipt.delete()
+                    continue
+                if receipt is None:
+                    continue
+            elif receipt is None:
+                receipt, _ = cls.objects.get_or_create(po_key=po_key, dr_key=dr_key)
+            receipt._set_lines(rows)
+            receipt.save()
+
+    def _set_lines(self, rows):
+        """Fill the ledger columns from ``LEDGER_FIELDS`` dicts of the DR's lines."""
+        latest = max(rows, key=lambda row: row["date"], default=None)
+        self.line_count = len(rows)
+        self.active_line_count = sum(1 for row in rows if not row["undone"] and row["transaction_type"] != "ALLOCATED")
+        self.first_date = min((row["date"] for row in rows), default=None)
+        self.last_date = latest["date"] if latest else None
+        self.remarks = latest["remarks"] if latest else None
+        self.location = latest["location"] if latest else None
+        self.project_id = latest["project"] if latest else None
+        if latest:
+            self.po_no = (latest["po_client"] or "").strip()
+            self.dr_no = latest["dr_no"].strip()
+
+
+def pair_filter(pairs, first, second="item_id"):
+    """
+    Return a Q matching rows whose ``(first, second)`` columns equal one of ``pairs``.
+
+    Lets the derived tables below read exactly the pairs they were asked for
+    through their composite indexes, not every combination of the two id lists.
+    """
+    condition = Q(pk__in=[])
+    for a, b in pairs:
+        condition |= Q(**{first: a, second: b})
+    return condition
+
+
+class ProjectItemRollup(models.Model):
+    """
+    Per-project totals of one item, maintained from the ledger.
+
+    Ledger writes, undos, conversions and deletes move the totals by per-line
+    deltas through ``adjust``; ``refresh`` recomputes (project, item) pairs
+    in SQL from their live and archived ledger lines after other edits, and
+    ``rebuild_project_rollups`` recomputes them all.
+
+    Attributes:
+        project (Project): The project the lines belong to.
+        item (Item): The item.
+        shipped_quantity (int): Quantity of the active OUT lines.
+        allocated_quantity (int): Quantity of allocations not yet converted to OUT.
+        last_dr_no (str): DR number of the latest active line that has one.
+        last_dr_date (datetime): Date of that line.
+        updated_at (datetime): Time of the last refresh.
+    """
+
+    #: ItemUpdate columns the rollup is computed from
+    LEDGER_FIELDS = ("project", "item", "transaction_type", "quantity", "allocated_quantity", "undone", "is_converted", "dr_no", "date")
+
+    project = models.ForeignKey("app_core.Project", on_delete=models.CASCADE, related_name="item_rollups")
+    item = models.ForeignKey(Item, on_delete=models.CASCADE, related_name="project_rollups")
+    shipped_quantity = models.PositiveIntegerField(default=0)
+    allocated_quantity = models.PositiveIntegerField(default=0)
+    last_dr_no = models.CharField("Last DR No.", max_length=100, blank=True, null=True)
+    last_dr_date = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=["project", "item"], name="unique_project_item_rollup")]
+
+    def __str__(self):
+        return f"{self.project_id}: {self.item_id} shipped {self.shipped_quantity}"
+
+    @staticmethod
+    def contribution(line):
+        """Return the ``(shipped, allocated)`` quantities one ledger line adds to its pair."""
+        if line.undone:
+            return 0, 0
+        if line.transaction_type == "OUT":
+            return line.quantity or 0, 0
+        if line.transaction_type == "ALLOCATED" and not line.is_converted:
+            return 0, line.allocated_quantity or 0
+        return 0, 0
+
+    @staticmethod
+    def dr_of(line):
+        """Return ``(date, dr_no)`` if the line can be its pair's last DR, else None."""
+        dr_no = (line.dr_no or "").strip()
+        return (line.date, dr_no) if dr_no and not line.undone else None
+
+    @classmethod
+    def adjust(cls, removed=(), added=()):
+        """
+        Move the rollups from the ``removed`` to the ``added`` state of ledger lines.
+
+        Call after the lines are written. Totals move by F() deltas, so
+        concurrent writers on one pair add up instead of overwriting each
+        other. ``last_dr_*`` moves forward for a newer DR line and is looked
+        up again only when the line it names loses its DR. Pairs without a
+        rollup row are refreshed; pairs that only lost lines are deleted once
+        no line is left.
+
+        Args:
+            removed (Iterable[ItemUpdate]): Deleted lines, or lines as they
+                were before an undo or conversion.
+            added (Iterable[ItemUpdate]): New lines, or those lines as they are now.
+        """
+        deltas = defaultdict(lambda: [0, 0])
+        newest = {}
+        gained = set()
+        kept_drs = set()
+        for line in added:
+            pair = (line.project_id, line.item_id)
+            if not pair[0]:
+                continue
+            gained.add(pair)
+            shipped, allocated = cls.contribution(line)
+            deltas[pair][0] += shipped
+            deltas[pair][1] += allocated
+            if dr := cls.dr_of(line):
+                kept_drs.add((line.pk, dr))
+                newest[pair] = max(newest.get(pair, dr), dr)
+        lost_drs = defaultdict(set)
+        for line in removed:
+            pair = (line.project_id, line.item_id)
+            if not pair[0]:
+                continue
+            shipped, allocated = cls.contribution(line)
+            deltas[pair][0] -= shipped
+            deltas[pair][1] -= allocated
+            if (dr := cls.dr_of(line)) and (line.pk, dr) not in kept_drs:
+                lost_drs[pair].add(dr)
+        if not deltas:
+            return
+
+        rollups = {(r.project_id, r.item_id): r for r in cls.objects.filter(pair_filter(deltas, "project_id"))}
+        missing = [pair for pair in deltas if pair not in rollups]
+        if missing:
+            cls.refresh(missing)
+
+        orphaned = [rollups[pair] for pair in deltas.keys() - gained if pair in rollups]
+        emptied = {rollup.pk for rollup in orphaned if not cls._has_lines((rollup.project_id, rollup.item_id))}
+        if emptied:
+            cls.objects.filter(pk__in=emptied).delete()
+
+        now = timezone.now()
+        relink = [pair for pair, rollup in rollups.items() if (rollup.last_dr_date, rollup.last_dr_no) in lost_drs.get(pair, ())]
+        last_drs = cls._last_drs(relink) if relink else {}
+        for pair, rollup in rollups.items():
+            if rollup.pk in emptied:
+                continue
+            shipped, allocated = deltas[pair]
+            rows = cls.objects.filter(pk=rollup.pk)
+            if shipped or allocated:
+                rows.update(
+                    shipped_quantity=Greatest(F("shipped_quantity") + shipped, 0),
+                    allocated_quantity=Greatest(F("allocated_quantity") + allocated, 0),
+                    updated_at=now,
+                )
+            if pair in relink:
+                date, dr_no = last_drs.get(pair, (None, None))
+                rows.update(last_dr_no=dr_no, last_dr_date=date, updated_at=now)
+            elif pair in newest:
+                date, dr_no = newest[pair]
+                rows.filter(Q(last_dr_date__isnull=True) | Q(last_dr_date__lt=date)).update(
+                    last_dr_no=dr_no, last_dr_date=date, updated_at=now
+                )
+
+    @classmethod
+    def refresh(cls, pairs):
+        """
+        Recompute the rollups of the given ``(project_id, item_id)`` pairs.
+
+        The totals are summed in SQL over exactly these pairs, through the
+        ``(project, item)`` indexes of the live and archived ledgers. Pairs
+        left without lines lose their rollup.
+
+        Args:
+            pairs (Iterable[tuple[int | None, int | None]]): Pairs to refresh;
+                pairs without a project are ignored.
+        """
+        pairs = {(project_id, item_id) for project_id, item_id in pairs if project_id and item_id}
+        if not pairs:
+            return
+
+        totals = {}
+        for model in (ItemUpdate, ArchivedItemUpdate):
+            rows = (
+                model.objects.filter(pair_filter(pairs, "project_id"))
+                .values("project_id", "item_id")
+                .annotate(
+                    shipped=Sum("quantity", filter=Q(undone=False, transaction_type="OUT"), default=0),
+                    allocated=Sum(
+                        "allocated_quantity", filter=Q(undone=False, transaction_type="ALLOCATED", is_converted=False), default=0
+                    ),
+                )
+                .order_by()
+            )
+            for row in rows:
+                shipped, allocated = totals.get((row["project_id"], row["item_id"]), (0, 0))
+                totals[(row["project_id"], row["item_id"])] = (shipped + row["shipped"], allocated + row["allocated"])
+        last_drs = cls._last_drs(totals) if totals else {}
+
+        rollups = {(r.project_id, r.item_id): r for r in cls.objects.filter(pair_filter(pairs, "project_id"))}
+        stale = [rollups[key].pk for key in pairs if key in rollups and key not in totals]
+        if stale:
+            cls.objects.filter(pk__in=stale).delete()
+        for (project_id, item_id), (shipped, allocated) in totals.items():
+            rollup = rollups.get((project_id, item_id))
+            if rollup is None:
+                rollup, _ = cls.objects.get_or_create(project_id=project_id, item_id=item_id)
+            rollup.shipped_quantity = shipped
+            rollup.allocated_quantity = allocated
+            rollup.last_dr_date, rollup.last_dr_no = last_drs.get((project_id, item_id), (None, None))
+            rollup.save()
+
+    @classmethod
+    def _last_drs(cls, pairs):
+        """Return ``{pair: (date, dr_no)}`` of each pair's latest active line with a DR number."""
+        with_dr = Q(undone=False, dr_trimmed__gt="")
+        latest = {}
+        for model in (ItemUpdate, ArchivedItemUpdate):
+            lines = model.objects.alias(dr_trimmed=Trim("dr_no")).filter(pair_filter(pairs, "project_id"), with_dr)
+            for row in lines.values("project_id", "item_id").annotate(last=Max("date")).order_by():
+                pair = (row["project_id"], row["item_id"])
+                latest[pair] = max(latest.get(pair, row["last"]), row["last"])
+        if not latest:
+            return {}
+
+        on_date = Q(pk__in=[])
+        for (project_id, item_id), date in latest.items():
+            on_date |= Q(project_id=project_id, item_id=item_id, date=date)
+        last_drs = {}
+        for model in (ItemUpdate, ArchivedItemUpdate):
+            lines = model.objects.alias(dr_trimmed=Trim("dr_no")).filter(on_date, with_dr).order_by("id")
+            for project_id, item_id, date, dr_no in lines.values_list("project_id", "item_id", "date", "dr_no"):
+                last_drs[(project_id, item_id)] = (date, dr_no.strip())
+        return last_drs
+
+    @staticmethod
+    def _has_lines(pair):
+        """Whether any live or archived line still belongs to the ``(project_id, item_id)`` pair."""
+        project_id, item_id = pair
+        return any(model.objects.filter(project_id=project_id, item_id=item_id).exists() for model in (ItemUpdate, ArchivedItemUpdate))
+
+
+class ItemLocationBalance(models.Model):
+    """
+    Stock of one item at one location, maintained from the ledger.
+
+    Ledger writes, undos, conversions and deletes move the balance by
+    per-line deltas through ``adjust``; ``refresh`` recomputes (item,
+    location) pairs in SQL from their live and archived ledger lines after
+    other edits, and ``rebuild_location_balances`` recomputes them all. The
+    ``(item, location)`` key answers "how many of X are at Y" with one
+    unique-index lookup.
+
+    Attributes:
+        item (Item): The item.
+        location (Location): The location.
+        quantity (int): Active IN quantity minus active OUT quantity recorded
+            at the location; negative when more left than was received there.
+        allocated_quantity (int): Quantity of allocations at the location not
+            yet converted to OUT.
+        updated_at (datetime): Time of the last refresh.
+    """
+
+    #: ItemUpdate columns the balance is computed from
+    LEDGER_FIELDS = ("site", "item", "transaction_type", "quantity", "allocated_quantity", "undone", "is_converted")
+
+    item = models.ForeignKey(Item, on_delete=models.CASCADE, related_name="location_balances")
+    location = models.ForeignKey(Location, on_delete=models.CASCADE, related_name="item_balances")
+    quantity = models.IntegerField(default=0)
+    allocated_quantity = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=["item", "location"], name="unique_item_location_balance")]
+
+    def __str__(self):
+        return f"{self.item_id} at {self.location_id}: {self.quantity}"
+
+    @staticmethod
+    def contribution(line):
+        """Return the ``(quantity, allocated)`` one ledger line adds to its location's balance."""
+        if line.undone:
+            return 0, 0
+        if line.transaction_type == "IN":
+            return line.quantity or 0, 0
+        if line.transaction_type == "OUT":
+            return -(line.quantity or 0), 0
+        if line.transaction_type == "ALLOCATED" and not line.is_converted:
+            return 0, line.allocated_quantity or 0
+        return 0, 0
+
+    @classmethod
+    def adjust(cls, removed=(), added=()):
+        """
+        Move the balances from the ``removed`` to the ``added`` state of ledger lines.
+
+        Call after the lines are written. Balances move by F() deltas, so
+        concurrent writers at one location add up instead of overwriting each
+        other. Pairs without a balance row are refreshed; pairs that only lost
+        lines are deleted once no line is left.
+
+        Args:
+            removed (Iterable[ItemUpdate]): Deleted lines, or lines as they
+                were before an undo or conversion.
+            added (Iterable[ItemUpdate]): New lines, or those lines as they are now.
+        """
+        deltas = defaultdict(lambda: [0, 0])
+        gained = set()
+        for sign, lines in ((-1, removed), (1, added)):
+            for line in lines:
+                pair = (line.site_id, line.item_id)
+                if not pair[0]:
+                    continue
+                if sign > 0:
+                    gained.add(pair)
+                quantity, allocated = cls.contribution(line)
+                deltas[pair][0] += sign * quantity
+                deltas[pair][1] += sign * allocated
+        if not deltas:
+            return
+
+        balances = {(b.location_id, b.item_id): b for b in cls.objects.filter(pair_filter(deltas, "location_id"))}
+        missing = [pair for pair in deltas if pair not in balances]
+        if missing:
+            cls.refresh(missing)
+
+        orphaned = [balances[pair] for pair in deltas.keys() - gained if pair in balances]
+        emptied = {balance.pk for balance in orphaned if not cls._has_lines((balance.location_id, balance.item_id))}
+        if emptied:
+            cls.objects.filter(pk__in=emptied).delete()
+
+        now = timezone.now()
+        for pair, balance in balances.items():
+            quantity, allocated = deltas[pair]
+            if balance.pk not in emptied and (quantity or allocated):
+                cls.objects.filter(pk=balance.pk).update(
+                    quantity=F("quantity") + quantity,
+                    allocated_quantity=Greatest(F("allocated_quantity") + allocated, 0),
+                    updated_at=now,
+                )
+
+    @classmethod
+    def refresh(cls, pairs):
+        """
+        Recompute the balances of the given ``(location_id, item_id)`` pairs.
+
+        The totals are summed in SQL over exactly these pairs, through the
+        ``(site, item)`` indexes of the live and archived ledgers. BALANCE
+        rows carry no location and are skipped. Pairs left without lines lose
+        their balance.
+
+        Args:
+            pairs (Iterable[tuple[int | None, int | None]]): Pairs to refresh;
+                pairs without a location are ignored.
+        """
+        pairs = {(location_id, item_id) for location_id, item_id in pairs if location_id and item_id}
+        if not pairs:
+            return
+
+        totals = {}
+        for model in (ItemUpdate, ArchivedItemUpdate):
+            rows = (
+                model.objects.filter(pair_filter(pairs, "site_id"))
+                .values("site_id", "item_id")
+                .annotate(
+                    received=Sum("quantity", filter=Q(undone=False, transaction_type="IN"), default=0),
+                    sent=Sum("quantity", filter=Q(undone=False, transaction_type="OUT"), default=0),
+                    allocated=Sum(
+                        "allocated_quantity", filter=Q(undone=False, transaction_type="ALLOCATED", is_converted=False), default=0
+                    ),
+                )
+                .order_by()
+            )
+            for row in rows:
+                quantity, allocated = totals.get((row["site_id"], row["item_id"]), (0, 0))
+                totals[(row["site_id"], row["item_id"])] = (quantity + row["received"] - row["sent"], allocated + row["allocated"])
+
+        balances = {(b.location_id, b.item_id): b for b in cls.objects.filter(pair_filter(pairs, "location_id"))}
+        stale = [balances[key].pk for key in pairs if key in balances and key not in totals]
+        if stale:
+            cls.objects.filter(pk__in=stale).delete()
+        for (location_id, item_id), (quantity, allocated) in totals.items():
+            balance = balances.get((location_id, item_id))
+            if balance is None:
+                balance, _ = cls.objects.get_or_create(location_id=location_id, item_id=item_id)
+            balance.quantity = quantity
+            balance.allocated_quantity = allocated
+            balance.save()
+
+    @staticmethod
+    def _has_lines(pair):
+        """Whether any live or archived line is still recorded at the ``(location_id, item_id)`` pair."""
+        location_id, item_id = pair
+        return any(model.objects.filter(site_id=location_id, item_id=item_id).exists() for model in (ItemUpdate, ArchivedItemUpdate))
+
+
+@receiver(post_save, sender=Item)
+def bump_item_payload_versions(sender, instance, created, update_fields=None, **kwargs):
+    """Invalidate the PO and DR payloads that show an item whose name, description or unit changed."""
+    if update_fields and not set(update_fields) & set(Item.PAYLOAD_FIELDS):
+        return
+    changed = not created and instance.payload_changed()
+    # What is stored now, so later saves of this instance (e.g. by every ledger line) compare against it
+    instance._loaded_payload = {name: instance.__dict__[name] for name in Item.PAYLOAD_FIELDS if name in instance.__dict__}
+    if not changed:
+        return
+    refs = set()
+    for model in (ItemUpdate, ArchivedItemUpdate):
+        refs.update(model.objects.filter(item=instance).order_by().values_list("po_client", "dr_no").distinct())
+    ResourceVersion.bump(
+        *ResourceVersion.ledger_keys(item_id=instance.pk),
+        *(key for po, dr in refs for key in ResourceVersion.ledger_keys(po_client=po, dr_no=dr)),
+    )
+
+
+#: Set while bulk jobs write the ledger and refresh the derived tables themselves
+_ledger_receivers_paused = ContextVar("ledger_receivers_paused", default=False)
+
+
+@contextmanager
+def paused_ledger_receivers():
+    """
+    Skip the ItemUpdate receivers below for writes made inside the block.
+
+    For bulk jobs such as ``archive_ledger`` that would otherwise refresh the
+    same receipt, rollup and balance once per row: the caller must refresh
+    them and bump the versions itself once the batch is written.
+    """
+    token = _ledger_receivers_paused.set(True)
+    try:
+        yield
+    finally:
+        _ledger_receivers_paused.reset(token)
+
+
+@receiver([post_save, post_delete], sender=ItemUpdate)
+def bump_ledger_versions(sender, instance, **kwargs):
+    """Invalidate the item, PO and DR versions touched by a saved or deleted transaction."""
+    if _ledger_receivers_paused.get():
+        return
+    ResourceVersion.bump(*ResourceVersion.ledger_keys(instance.item_id, instance.po_client, instance.dr_no))
+
+
+@receiver([post_save, post_delete], sender=ItemUpdate)
+def refresh_delivery_receipt(sender, instance, update_fields=None, **kwargs):
+    """Keep the DR index in step with a saved or deleted transaction."""
+    if _ledger_receivers_paused.get():
+        return
+    if update_fields and not set(update_fields) & set(DeliveryReceipt.LEDGER_FIELDS):
+        return  # e.g. the stock snapshot written after the first save
+    DeliveryReceipt.refresh([(instance.po_client, instance.dr_no)])
+
+
+@receiver(post_save, sender=ItemUpdate)
+def refresh_project_rollup(sender, instance, created=False, update_fields=None, **kwargs):
+    """Keep the project's totals for the item in step with a saved transaction."""
+    if _ledger_receivers_paused.get():
+        return
+    if update_fields and not set(update_fields) & set(ProjectItemRollup.LEDGER_FIELDS):
+        return
+    if created:
+        ProjectItemRollup.adjust(added=[instance])
+    else:
+        # The line's previous values are gone: recompute its pair
+        ProjectItemRollup.refresh([(instance.project_id, instance.item_id)])
+
+
+@receiver(post_delete, sender=ItemUpdate)
+def shrink_project_rollup(sender, instance, **kwargs):
+    """Take a deleted transaction out of its project's totals for the item."""
+    if _ledger_receivers_paused.get():
+        return
+    ProjectItemRollup.adjust(removed=[instance])
+
+
+@receiver(post_save, sender=ItemUpdate)
+def refresh_location_balance(sender, instance, created=False, update_fields=None, **kwargs):
+    """Keep the item's balance at the line's location in step with a saved transaction."""
+    if _ledger_receivers_paused.get():
+        return
+    if update_fields and not set(update_fields) & set(ItemLocationBalance.LEDGER_FIELDS):
+        return
+    if created:
+        ItemLocationBalance.adjust(added=[instance])
+    else:
+        # The line's previous values are gone: recompute its pair
+        ItemLocationBalance.refresh([(instance.site_id, instance.item_id)])
+
+
+@receiver(post_delete, sender=ItemUpdate)
+def shrink_location_balance(sender, instance, **kwargs):
+    """Take a deleted transaction out of the item's balance at its location."""
+    if _ledger_receivers_paused.get():
+        return
+    ItemLocationBalance.adjust(removed=[instance])
@@ -0,0 +1,228 @@
+"""
+Keyset (cursor) pagination.
+
+Offset pagination makes the database walk and discard every row before the
+requested page, so deep pages of large tables get slower and slower. Keyset
+pagination remembers the sort key of the last row served and asks for the
+rows after it, which an index on the same columns answers directly however
+deep the page is.
+
+Cursors are opaque URL-safe tokens holding the last row's sort values.
+
+Where a total is still wanted, ``EstimatedCountPaginator`` replaces the
+COUNT(*) of large listings with the planner's row estimate.
+"""
+
+import base64
+import datetime
+import json
+from functools import reduce
+from operator import or_
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models import Q, QuerySet
+from django.utils.functional import cached_property
+
+
+class InvalidCursor(ValueError):
+    """Raised when a cursor token cannot be decoded for the requested ordering."""
+
+
+class _CursorEncoder(DjangoJSONEncoder):
+    def default(self, o):
+        # DjangoJSONEncoder rounds to milliseconds, which would skip rows sharing one
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def encode_cursor(values):
+    """Encode a row's sort values as an opaque URL-safe token."""
+    raw = json.dumps(list(values), cls=_CursorEncoder, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token, fields):
+    """
+    Decode a token produced by ``encode_cursor``.
+
+    Args:
+        token (str): The cursor token.
+        fields (list[Field]): Model fields of the ordering, used to convert
+            each value back to its Python type.
+
+    Returns:
+        list: The sort values.
+
+    Raises:
+        InvalidCursor: If the token is malformed, has the wrong number of
+            values or holds a value its field cannot take.
+    """
+    try:
+        values = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+    except (ValueError, TypeError) as exc:
+        raise InvalidCursor("Malformed cursor.") from exc
+    if not isinstance(values, list) or len(values) != len(fields):
+        raise InvalidCursor("Cursor does not match this listing.")
+    try:
+        values = [field.to_python(value) for field, value in zip(fields, values)]
+    except (ValidationError, ValueError, TypeError) as exc:
+        raise InvalidCursor("Cursor does not match this listing.") from exc
+    if any(value is None for value in values):
+        raise InvalidCursor("Cursor does not match this listing.")
+    return values
+
+
+def _ordering_field(model, field):
+    """Return the model field a (possibly ``__``-spanning) ordering entry sorts by."""
+    *path, name = field.lstrip("-").split("__")
+    for part in path:
+        model = model._meta.get_field(part).related_model
+    return model._meta.get_field(name)
+
+
+def _row_value(row, field):
+    for part in field.split("__"):
+        row = getattr(row, part)
+    return row
+
+
+def _after(ordering, values):
+    """Build the Q selecting rows that sort strictly after ``values`` under ``ordering``."""
+    clauses = []
+    for i, field in enumerate(ordering):
+        name = field.lstrip("-")
+        lookup = "lt" if field.startswith("-") else "gt"
+        equal = {f.lstrip("-"): value for f, value in zip(ordering[:i], values)}
+        clauses.append(Q(**equal, **{f"{name}__{lookup}": values[i]}))
+    return reduce(or_, clauses)
+
+
+def keyset_page(queryset, ordering, cursor=None, limit=50):
+    """
+    Return one page of ``queryset`` sorted by ``ordering``, starting after ``cursor``.
+
+    ``ordering`` must end in a unique column (normally ``id``) and its
+    columns must be non-null, so every row has exactly one position. For the
+    page to be an index range scan, the queryset's filters plus ``ordering``
+    should match an index.
+
+    Args:
+        queryset (QuerySet): Rows to page through, already filtered.
+        ordering (list[str]): Sort fields, ``-`` prefixed for descending.
+        cursor (str | None): Token from a previous page, or None for the first page.
+        limit (int): Rows per page.
+
+    Returns:
+        tuple[list, str | None]: The page's rows and the cursor of the next
+        page, or None on the last page.
+
+    Raises:
+        InvalidCursor: If ``cursor`` cannot be decoded.
+    """
+    if cursor:
+        fields = [_ordering_field(queryset.model, field) for field in ordering]
+        queryset = queryset.filter(_after(ordering, decode_cursor(cursor, fields)))
+    rows = list(queryset.order_by(*ordering)[: limit + 1])
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(_row_value(rows[-1], field.lstrip("-")) for field in ordering)
+
+
+def estimated_row_count(model, using=DEFAULT_DB_ALIAS):
+    """
+    Return PostgreSQL's planner estimate of the rows in ``model``'s table.
+
+    Reads ``pg_class.reltuples``, which autovacuum/ANALYZE keep roughly
+    current, instead of running COUNT(*). A partitioned table's estimate is
+    the sum over its partitions.
+
+    Returns:
+        int | None: The estimate, or None on other databases or for tables
+        that have never been analyzed.
+    """
+    connection = connections[using]
+    if connection.vendor != "postgresql":
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT CASE WHEN c.relkind = 'p' THEN (
+                       SELECT SUM(p.reltuples) FROM pg_inherits i JOIN pg_class p ON p.oid = i.inhrelid
+                       WHERE i.inhparent = c.oid AND p.reltuples >= 0
+                   ) ELSE NULLIF(c.reltuples, -1) END
+            FROM pg_class c WHERE c.oid = to_regclass(%s)
+            """,
+            [model._meta.db_table],
+        )
+        row = cursor.fetchone()
+    if not row or row[0] is None:
+        return None
+    return int(row[0])
+
+
+def estimated_count(queryset):
+    """
+    Return the planner's estimate of how many rows ``queryset`` matches.
+
+    Unfiltered querysets use ``estimated_row_count``; filtered ones use the
+    row estimate of their EXPLAIN plan, which only needs planning, not
+    execution.
+
+    Returns:
+        int | None: The estimate, or None when the database cannot provide one.
+    """
+    if not queryset.query.where:
+        return estimated_row_count(queryset.model, queryset.db)
+    if connections[queryset.db].vendor != "postgresql":
+        return None
+    plan = json.loads(queryset.order_by().explain(format="json"))
+    if isinstance(plan, list):
+        plan = plan[0]
+    return int(plan["Plan"]["Plan Rows"])
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that trusts the planner's row estimate for large listings.
+
+    Unfiltered querysets are estimated with ``estimated_row_count``. With
+    ``estimate_filtered=True`` (for a view's base listing, before any user
+    search narrows it) filtered querysets are estimated from their EXPLAIN
+    plan too. Objects other than querysets can offer an
+    ``estimated_count()`` method. Estimates below ``estimate_threshold``,
+    other filtered listings and databases without an estimate get the exact
+    count. ``is_estimated`` tells templates which one they got, so they can
+    say "about N".
+    """
+
+    estimate_threshold = 10_000
+    is_estimated = False
+
+    def __init__(self, object_list, per_page, orphans=0, allow_empty_first_page=True, estimate_filtered=False, **kwargs):
+        super().__init__(object_list, per_page, orphans, allow_empty_first_page, **kwargs)
+        self.estimate_filtered = estimate_filtered
+
+    def planner_estimate(self, queryset):
+        return estimated_count(queryset)
+
+    def estimate(self, object_list):
+        if not isinstance(object_list, QuerySet):
+            return object_list.estimated_count() if hasattr(object_list, "estimated_count") else None
+        if object_list.query.is_sliced or object_list.query.distinct:
+            return None
+        if object_list.query.where and not self.estimate_filtered:
+            return None
+        return self.planner_estimate(object_list)
+
+    @cached_property
+    def count(self):
+        estimate = self.estimate(self.object_list)
+        if estimate is not None and estimate >= self.estimate_threshold:
+            self.is_estimated = True
+            return estimate
+        return super().count
@@ -0,0 +1,167 @@
+"""
+Read-replica routing for read-heavy views.
+
+Views decorated with ``use_replica`` run their reads on the ``replica``
+database alias; everything else, and every write, uses the primary.
+Sessions are always read from the primary so a fresh login is never lost.
+
+A user who has just written would not see their own change on a lagging
+replica, so ``ReplicaPinMiddleware`` answers every unsafe request (POST,
+PUT, ...) with a short-lived cookie that keeps that browser's reads on the
+primary for ``REPLICA_PIN_SECONDS``.
+
+Without a ``replica`` entry in ``DATABASES`` all reads go to the primary
+and no cookie is set.
+"""
+
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+REPLICA_ALIAS = "replica"
+PIN_COOKIE = "read_primary"
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+#: Apps whose rows must always be read from the primary
+PRIMARY_ONLY_APPS = frozenset({"sessions"})
+
+_read_alias = ContextVar("read_alias", default=None)
+
+
+def replica_configured():
+    """
+    Return whether a replica is configured and is a database of its own.
+
+    Test runs point the replica alias at the primary's test database
+    (``TEST["MIRROR"]``); a second connection would not see the test's
+    uncommitted rows there, so a replica pointing at the primary's database
+    is not used.
+    """
+    if REPLICA_ALIAS not in settings.DATABASES:
+        return False
+    replica = settings.DATABASES[REPLICA_ALIAS]
+    primary = settings.DATABASES[DEFAULT_DB_ALIAS]
+    return any(replica.get(key) != primary.get(key) for key in ("ENGINE", "NAME", "HOST", "PORT"))
+
+
+def replica_alias(request):
+    """
+    Return the alias a replica-enabled view should read from for ``request``.
+
+    Returns:
+        str | None: ``"replica"``, or None (the primary) for unsafe methods,
+        pinned browsers or when no replica is configured.
+    """
+    if not replica_configured() or request.method not in SAFE_METHODS or PIN_COOKIE in request.COOKIES:
+        return None
+    return REPLICA_ALIAS
+
+
+class ReplicaRouter:
+    """Send reads inside ``use_replica`` views to the replica and all writes to the primary."""
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label in PRIMARY_ONLY_APPS:
+            return None
+        return _read_alias.get()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same data
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica is a copy of the primary and is never migrated itself
+        return db != REPLICA_ALIAS
+
+
+def _read_on(alias, chunks):
+    """Iterate a streaming response body with reads still routed to ``alias``."""
+    chunks = iter(chunks)
+    while True:
+        token = _read_alias.set(alias)
+        try:
+            chunk = next(chunks)
+        except StopIteration:
+            return
+        finally:
+            _read_alias.reset(token)
+        yield chunk
+
+
+def _finish(response, alias):
+    # Streaming exports query the database while the body is sent, after the view returned
+    if alias and response.streaming and not response.is_async:
+        response.streaming_content = _read_on(alias, response.streaming_content)
+    return response
+
+
+def use_replica(view):
+    """
+    Run a read-only view's queries on the replica (see ``replica_alias``).
+
+    Put it outermost, above ``login_required`` and ``versioned_response``, so
+    the version stamps are read from the same database as the payload.
+    """
+    if iscoroutinefunction(view):
+
+        @wraps(view)
+        async def ainner(request, *args, **kwargs):
+            alias = replica_alias(request)
+            token = _read_alias.set(alias)
+            try:
+                return _finish(await view(request, *args, **kwargs), alias)
+            finally:
+                _read_alias.reset(token)
+
+        return ainner
+
+    @wraps(view)
+    def inner(request, *args, **kwargs):
+        alias = replica_alias(request)
+        token = _read_alias.set(alias)
+        try:
+            return _finish(view(request, *args, **kwargs), alias)
+        finally:
+            _read_alias.reset(token)
+
+    return inner
+
+
+class ReplicaPinMiddleware:
+    """
+    Pin a browser's reads to the primary for a few seconds after it writes.
+
+    Supports both WSGI and ASGI, like ``ForcePasswordChangeMiddleware``.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        response = self.get_response(request)
+        if request.method not in SAFE_METHODS and replica_configured():
+            self._pin(response)
+        return response
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        if request.method not in SAFE_METHODS and replica_configured():
+            self._pin(response)
+        return response
+
+    def _pin(self, response):
+        response.set_cookie(PIN_COOKIE, "1", max_age=settings.REPLICA_PIN_SECONDS, httponly=True, samesite="Lax")
@@ -48,6 +48,7 @@ MIDDLEWARE = [
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
     "accounts.middleware.ForcePasswordChangeMiddleware",
+    "inventory.replicas.ReplicaPinMiddleware",
 ]
 
 ROOT_URLCONF = "inventory.urls"
@@ -87,6 +88,21 @@ DATABASES = {
     }
 }
 
+# Optional streaming replica for the read-heavy views marked with
+# inventory.replicas.use_replica. Tests mirror it onto the default database,
+# so two local databases (or one, pointed at twice) are enough to try it.
+if os.getenv("POSTGRES_REPLICA_HOST"):
+    DATABASES["replica"] = {
+        **DATABASES["default"],
+        "NAME": os.getenv("POSTGRES_REPLICA_DB", DATABASES["default"]["NAME"]),
+        "HOST": os.getenv("POSTGRES_REPLICA_HOST"),
+        "PORT": os.getenv("POSTGRES_REPLICA_PORT", DATABASES["default"]["PORT"]),
+        "TEST": {"MIRROR": "default"},
+    }
+DATABASE_ROUTERS = ["inventory.replicas.ReplicaRouter"]
+# Seconds a browser keeps reading from the primary after it writes
+REPLICA_PIN_SECONDS = int(os.getenv("REPLICA_PIN_SECONDS", "5"))
+
 # ---------------------------------------------------------
 # AUTH & REDIRECTS
 # ---------------------------------------------------------
@@ -95,6 +111,24 @@ LOGIN_URL = "/accounts/login/"
 LOGIN_REDIRECT_URL = "/dashboard/"
 LOGOUT_REDIRECT_URL = "/accounts/login/"
 
+# Session users are cached for a short time instead of being loaded on every
+# request; saving or deleting a user drops its entry immediately.
+AUTHENTICATION_BACKENDS = ["accounts.backends.CachedModelBackend"]
+AUTH_USER_CACHE_TTL = int(os.getenv("AUTH_USER_CACHE_TTL", "60"))  # seconds
+
+# ---------------------------------------------------------
+# CACHE & SESSIONS
+# ---------------------------------------------------------
+# Point CACHE_BACKEND/CACHE_LOCATION at a shared cache (e.g. Redis) when running
+# several worker processes so invalidations reach every worker.
+CACHES = {
+    "default": {
+        "BACKEND": os.getenv("CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"),
+        "LOCATION": os.getenv("CACHE_LOCATION", ""),
+    }
+}
+SESSION_ENGINE = os.getenv("SESSION_ENGINE", "django.contrib.sessions.backends.cached_db")
+
 # ---------------------------------------------------------
 # PASSWORD VALIDATION
 # ---------------------------------------------------------
@@ -129,6 +163,13 @@ STATIC_URL = "/static/"
 STATICFILES_DIRS = [BASE_DIR / "src" / "assets"]  # correct local static directory
 STATIC_ROOT = BASE_DIR / "staticfiles"  # where collectstatic stores files
 
+# collectstatic writes content-hashed copies plus .gz/.br siblings; in DEBUG the
+# unhashed source files are still served directly from STATICFILES_DIRS.
+STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {"BACKEND": "inventory.staticfiles.PrecompressedManifestStaticFilesStorage"},
+}
+
 # ---------------------------------------------------------
 # DEFAULTS
 # ---------------------------------------------------------
@@ -136,3 +177,17 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 MEDIA_URL = "/media/"
 MEDIA_ROOT = os.path.join(BASE_DIR, "media")
+
+# ---------------------------------------------------------
+# DR IMAGE UPLOADS
+# ---------------------------------------------------------
+DR_UPLOAD_MAX_IMAGES = int(os.getenv("DR_UPLOAD_MAX_IMAGES", "30"))
+DR_UPLOAD_MAX_IMAGE_SIZE = int(os.getenv("DR_UPLOAD_MAX_IMAGE_SIZE", str(10 * 1024 * 1024)))  # bytes per image
+DR_UPLOAD_WORKERS = int(os.getenv("DR_UPLOAD_WORKERS", "4"))  # thread pool size for validation/thumbnails
+DR_THUMBNAIL_SIZE = (320, 320)
+
+# ---------------------------------------------------------
+# LEDGER ARCHIVAL (manage.py archive_ledger)
+# ---------------------------------------------------------
+LEDGER_ARCHIVE_AFTER_DAYS = int(os.getenv("LEDGER_ARCHIVE_AFTER_DAYS", "730"))  # ledger rows older than this
+LEDGER_ARCHIVE_UNDONE_AFTER_DAYS = int(os.getenv("LEDGER_ARCHIVE_UNDONE_AFTER_DAYS", "30"))  # undone rows older than this
@@ -0,0 +1,151 @@
+"""
+Fingerprinted, precompressed static files and a cache-friendly view to serve them.
+
+``collectstatic`` writes content-hashed copies of every asset (so templates using
+``{% static %}`` reference names that change whenever the file does) together with
+``.gz`` and, when the optional ``brotli`` package is installed, ``.br`` siblings.
+``serve_static`` then hands out the smallest variant the browser accepts and marks
+hashed files as immutable so they are never revalidated.
+"""
+
+import gzip
+import mimetypes
+import posixpath
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import (
+    ManifestStaticFilesStorage,
+    staticfiles_storage,
+)
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404
+from django.utils._os import safe_join
+from django.utils.cache import (
+    get_conditional_response,
+    patch_cache_control,
+    patch_vary_headers,
+)
+from django.utils.http import http_date
+from django.views.decorators.http import require_safe
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip copies are always written
+    brotli = None
+
+COMPRESSIBLE_EXTENSIONS = (".css", ".js", ".svg", ".json", ".txt", ".map", ".ico", ".html")
+MIN_COMPRESS_SIZE = 256  # bytes; smaller files are not worth a second request path
+IMMUTABLE_MAX_AGE = 60 * 60 * 24 * 365  # one year
+
+
+class PrecompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    Manifest storage that also writes gzip/brotli copies of the hashed files.
+
+    References to files that do not exist fall back to their unhashed name
+    instead of raising, so a stale template reference cannot break a page.
+    """
+
+    manifest_strict = False
+
+    def post_process(self, paths, dry_run=False, **options):
+        """Hash the collected files, then precompress every hashed text asset."""
+        yield from super().post_process(paths, dry_run=dry_run, **options)
+
+        if dry_run:
+            return
+
+        for name in set(self.hashed_files.values()):
+            self.compress(name)
+        self.__dict__.pop("_immutable_names", None)
+
+    def compress(self, name):
+        """
+        Write ``.gz`` and ``.br`` siblings for a stored file when they are smaller.
+
+        Args:
+            name (str): Storage name of the (hashed) file.
+        """
+        if not name.endswith(COMPRESSIBLE_EXTENSIONS):
+            return
+
+        path = Path(self.path(name))
+        data = path.read_bytes()
+        if len(data) < MIN_COMPRESS_SIZE:
+            return
+
+        variants = {".gz": gzip.compress(data, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            variants[".br"] = brotli.compress(data)
+
+        for suffix, compressed in variants.items():
+            if len(compressed) < len(data):
+                path.with_name(path.name + suffix).write_bytes(compressed)
+
+    def stored_name(self, name):
+        """Return the hashed name for ``name``, or ``name`` itself if the file is missing."""
+        try:
+            return super().stored_name(name)
+        except ValueError:
+            return name
+
+    def is_immutable(self, name):
+        """Whether ``name`` is a content-hashed file listed in the manifest."""
+        if not hasattr(self, "_immutable_names"):
+            self._immutable_names = frozenset(self.hashed_files.values())
+        return name in self._immutable_names
+
+
+def _accepted_encodings(request):
+    header = request.headers.get("Accept-Encoding", "")
+    return {part.split(";")[0].strip().lower() for part in header.split(",")}
+
+
+@require_safe
+def serve_static(request, path):
+    """
+    Serve a collected static file from ``STATIC_ROOT``.
+
+    Prefers a precompressed ``.br``/``.gz`` variant when the client accepts it.
+    Hashed files get a one-year ``immutable`` Cache-Control; anything else must
+    be revalidated on every use, which the ``ETag``/``Last-Modified`` validators
+    answer with a 304 while the file is unchanged.
+    """
+    name = posixpath.normpath(path).lstrip("/")
+    try:
+        fullpath = Path(safe_join(settings.STATIC_ROOT, name))
+    except SuspiciousFileOperation:
+        raise Http404("Invalid static path.")
+
+    if not fullpath.is_file():
+        raise Http404("Static file not found.")
+
+    content_type, _ = mimetypes.guess_type(fullpath.name)
+    served, content_encoding = fullpath, None
+    accepted = _accepted_encodings(request)
+    for encoding, suffix in (("br", ".br"), ("gzip", ".gz")):
+        candidate = fullpath.with_name(fullpath.name + suffix)
+        if encoding in accepted and candidate.is_file():
+            served, content_encoding = candidate, encoding
+            break
+
+    # Validators come from the served variant, so gzip and brotli bodies get distinct ETags
+    stat = served.stat()
+    etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+    last_modified = int(stat.st_mtime)
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = FileResponse(served.open("rb"), content_type=content_type or "application/octet-stream", filename=fullpath.name)
+        if content_encoding:
+            response.headers["Content-Encoding"] = content_encoding
+    response.headers["ETag"] = etag
+    response.headers["Last-Modified"] = http_date(last_modified)
+    patch_vary_headers(response, ["Accept-Encoding"])
+
+    is_immutable = getattr(staticfiles_storage, "is_immutable", None)
+    if is_immutable and is_immutable(name):
+        patch_cache_control(response, public=True, max_age=IMMUTABLE_MAX_AGE, immutable=True)
+    else:
+        patch_cache_control(response, public=True, no_cache=True)
+    return response
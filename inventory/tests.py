@@ -1,13 +1,48 @@
 # inventory/tests.py
 
-from datetime import timedelta
-
+import asyncio
+import csv
+import io
+import json
+import shutil
+import tempfile
+from datetime import date, timedelta
+from importlib import import_module
+from unittest import mock, skipIf, skipUnless
+
+from django.apps import apps
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.contrib.sessions.models import Session
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.management import CommandError, call_command
+from django.db import connection, connections, router
+from django.http import JsonResponse
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.utils import timezone
 
-from .models import Item, ItemSerial, ItemUpdate
+from .ledger import (
+    ItemHistory,
+    convert_allocations,
+    recalculate_item_stock,
+    undo_updates,
+)
+from .management.commands import partition_ledger
+from .models import (
+    ArchivedItemUpdate,
+    ArchivedTransactionHistory,
+    DeliveryReceipt,
+    Item,
+    ItemLocationBalance,
+    ItemSerial,
+    ItemUpdate,
+    Location,
+    TransactionHistory,
+)
+from .pagination import EstimatedCountPaginator, estimated_row_count
+from .replicas import PIN_COOKIE, REPLICA_ALIAS, replica_alias, use_replica
 
 User = get_user_model()
 
@@ -293,6 +328,24 @@ class InventoryViewsTests(TestCase):
         self.assertEqual(updates[0].stock_after_transaction, 3)  # backdated one first
         self.assertEqual(updates[1].stock_after_transaction, 5)  # today's one after
 
+    def test_stale_snapshots_are_repaired_not_copied_forward(self):
+        """Test a wrong snapshot on an older row does not leak into the recomputed totals"""
+        item = self.create_item_via_view("Stale", "desc")
+        today = timezone.localdate()
+        self.post_update(item.id, in_value=10, date=today - timedelta(days=2))
+        old_in = ItemUpdate.objects.get(item=item, transaction_type="IN", quantity=10)
+        ItemUpdate.objects.filter(pk=old_in.pk).update(stock_after_transaction=100)
+
+        self.post_update(item.id, out_value=3, date=today - timedelta(days=1))
+        item.refresh_from_db()
+        old_in.refresh_from_db()
+        self.assertEqual((item.total_stock, old_in.stock_after_transaction), (7, 10))
+
+        ItemUpdate.objects.filter(pk=old_in.pk).update(stock_after_transaction=100)
+        undo_updates([ItemUpdate.objects.get(item=item, transaction_type="OUT")], self.user)
+        item.refresh_from_db()
+        self.assertEqual(item.total_stock, 10)
+
     def test_serial_reuse_after_undo_out(self):
         """Test that undoing an OUT makes serials available for a new OUT"""
         item = self.create_item_via_view("SerialReuse", "desc")
@@ -419,3 +472,865 @@ class InventoryViewsTests(TestCase):
         # The allocate update should now be marked as not converted
         allocate_update.refresh_from_db()
         self.assertFalse(allocate_update.is_converted)
+
+    def test_undo_IN_marks_transaction_undone(self):
+        """Test an undone IN is excluded from later recomputes and cannot be undone twice"""
+        item = self.create_item_via_view("UndoOnce", "desc")
+        self.post_update(item.id, in_value=2, serials=["UO1", "UO2"])
+        self.post_update(item.id, in_value=1, serials=["UO3"])
+        first_in = ItemUpdate.objects.filter(item=item).order_by("date", "id").first()
+
+        url = reverse("undo_transaction", args=[first_in.id])
+        self.client.post(url, follow=True)
+        resp = self.client.post(url, follow=True)
+
+        self.assertContains(resp, "already been reverted")
+        first_in.refresh_from_db()
+        self.assertTrue(first_in.undone)
+        item.refresh_from_db()
+        self.assertEqual(item.total_stock, 1)
+        self.assertEqual(TransactionHistory.objects.filter(item=item, action_type="undo").count(), 1)
+
+    def test_batch_undo_by_dr_number(self):
+        """Test undoing every line of a DR restores stock and serials across items"""
+        cable = self.create_item_via_view("DR Cable", "desc")
+        panel = self.create_item_via_view("DR Panel", "desc")
+        self.post_update(cable.id, in_value=3, serials=["DC1", "DC2", "DC3"])
+        self.post_update(panel.id, in_value=2, serials=["DP1", "DP2"])
+        self.post_update(cable.id, out_value=2, serials=["DC1", "DC2"], dr_no="DR-BAD", po_client="PO-1")
+        self.post_update(cable.id, out_value=1, serials=["DC3"], dr_no="DR-BAD", po_client="PO-1")
+        self.post_update(panel.id, out_value=1, serials=["DP1"], dr_no="DR-BAD", po_client="PO-1")
+
+        resp = self.client.post(reverse("undo_transactions"), json.dumps({"dr_no": "DR-BAD"}), content_type="application/json")
+
+        self.assertEqual(resp.status_code, 200)
+        data = resp.json()
+        self.assertEqual(len(data["undone"]), 3)
+        self.assertEqual(data["items"], sorted([cable.id, panel.id]))
+        cable.refresh_from_db()
+        panel.refresh_from_db()
+        self.assertEqual((cable.total_stock, panel.total_stock), (3, 2))
+        self.assertFalse(ItemSerial.objects.filter(serial_no__in=["DC1", "DC2", "DC3", "DP1"], is_available=False).exists())
+        self.assertFalse(ItemUpdate.objects.filter(dr_no="DR-BAD", undone=False).exists())
+        self.assertEqual(TransactionHistory.objects.filter(action_type="undo").count(), 3)
+        latest = ItemUpdate.objects.filter(item=cable, undone=False).order_by("-date", "-id").first()
+        self.assertEqual(latest.stock_after_transaction, 3)
+
+    def test_batch_undo_of_allocation_and_its_converted_out_releases_serials(self):
+        """Test undoing a DR holding an allocation and its converted OUT frees the serials"""
+        item = self.create_item_via_view("DR Both", "desc")
+        self.post_update(item.id, in_value=2, serials=["A1", "A2"])
+        self.post_update(item.id, allocated=2, serials=["A1", "A2"], dr_no="DR-BOTH")
+        allocation = ItemUpdate.objects.get(item=item, transaction_type="ALLOCATED")
+        self.client.post(reverse("convert_allocate_to_out", args=[allocation.id]))
+
+        resp = self.client.post(reverse("undo_transactions"), json.dumps({"dr_no": "DR-BOTH"}), content_type="application/json")
+
+        self.assertEqual(len(resp.json()["undone"]), 2)
+        item.refresh_from_db()
+        self.assertEqual((item.total_stock, item.allocated_quantity), (2, 0))
+        self.assertEqual(ItemSerial.objects.filter(item=item, serial_no__in=["A1", "A2"], is_available=True).count(), 2)
+
+    def test_batch_undo_and_convert_match_refs_as_typed_differently(self):
+        """Test DR and P.O. filters ignore case and surrounding spaces"""
+        item = self.create_item_via_view("Typed Refs", "desc")
+        self.post_update(item.id, in_value=3, serials=["TR1", "TR2", "TR3"])
+        self.post_update(item.id, allocated=1, serials=["TR1"], dr_no="DR-Case", po_client="PO-Case")
+        self.post_update(item.id, out_value=1, serials=["TR2"], dr_no="DR-Undo", po_client="PO-Case")
+
+        convert = self.client.post(reverse("convert_allocations_to_out"), {"dr_no": " dr-case", "po_client": "po-case "})
+        undo = self.client.post(
+            reverse("undo_transactions"), json.dumps({"dr_no": "dr-undo", "po_client": "PO-CASE"}), content_type="application/json"
+        )
+
+        self.assertEqual((convert.status_code, len(convert.json()["converted"])), (200, 1))
+        self.assertEqual((undo.status_code, len(undo.json()["undone"])), (200, 1))
+
+    def test_batch_undo_by_ids_skips_already_undone(self):
+        """Test ids that were already reverted are ignored"""
+        item = self.create_item_via_view("BatchIds", "desc")
+        self.post_update(item.id, in_value=3, serials=["BI1", "BI2", "BI3"])
+        self.post_update(item.id, out_value=1, serials=["BI1"])
+        self.post_update(item.id, out_value=1, serials=["BI2"])
+        first_out, second_out = ItemUpdate.objects.filter(item=item, transaction_type="OUT").order_by("date", "id")
+        self.client.post(reverse("undo_transaction", args=[first_out.id]))
+
+        resp = self.client.post(reverse("undo_transactions"), {"ids": [first_out.id, second_out.id]})
+
+        self.assertEqual(resp.json()["undone"], [second_out.id])
+        item.refresh_from_db()
+        self.assertEqual(item.total_stock, 3)
+
+    def test_batch_undo_rejects_bad_requests(self):
+        """Test the batch endpoint validates its input"""
+        url = reverse("undo_transactions")
+        self.assertEqual(self.client.get(url).status_code, 405)
+        self.assertEqual(self.client.post(url, {}).status_code, 400)
+        self.assertEqual(self.client.post(url, {"ids": ["x"]}).status_code, 400)
+        self.assertEqual(self.client.post(url, {"ids": [1], "dr_no": "DR-1"}).status_code, 400)
+        self.assertEqual(self.client.post(url, {"dr_no": "DR-NONE"}).status_code, 404)
+
+    def test_bulk_convert_allocations_by_client_po(self):
+        """Test converting a project's allocations creates OUT rows and recomputes each item once"""
+        cable = self.create_item_via_view("Ship Cable", "desc")
+        panel = self.create_item_via_view("Ship Panel", "desc")
+        self.post_update(cable.id, in_value=4, serials=["SC1", "SC2", "SC3", "SC4"])
+        self.post_update(panel.id, in_value=2, serials=["SP1", "SP2"])
+        self.post_update(cable.id, allocated=2, serials=["SC1", "SC2"], po_client="PO-SHIP")
+        self.post_update(cable.id, allocated=1, serials=["SC3"], po_client="PO-SHIP")
+        self.post_update(panel.id, allocated=1, serials=["SP1"], po_client="PO-SHIP")
+        self.post_update(panel.id, allocated=1, serials=["SP2"], po_client="PO-OTHER")
+
+        resp = self.client.post(reverse("convert_allocations_to_out"), {"po_client": "PO-SHIP"})
+
+        self.assertEqual(resp.status_code, 200)
+        data = resp.json()
+        self.assertEqual(len(data["converted"]), 3)
+        self.assertEqual(ItemUpdate.objects.filter(id__in=data["out"], transaction_type="OUT", po_client="PO-SHIP").count(), 3)
+        self.assertEqual(ItemUpdate.objects.filter(id__in=data["converted"], is_converted=True).count(), 3)
+        cable.refresh_from_db()
+        panel.refresh_from_db()
+        self.assertEqual((cable.total_stock, cable.allocated_quantity), (1, 0))
+        self.assertEqual((panel.total_stock, panel.allocated_quantity), (1, 1))
+        self.assertFalse(ItemSerial.objects.get(item=cable, serial_no="SC3").is_available)
+
+        # Converted OUTs can still be undone individually and restore their allocation
+        out = ItemUpdate.objects.filter(item=cable, transaction_type="OUT", quantity=1).get()
+        self.client.post(reverse("undo_transaction", args=[out.id]))
+        cable.refresh_from_db()
+        self.assertEqual((cable.total_stock, cable.allocated_quantity), (2, 1))
+
+    def test_bulk_convert_skips_converted_and_validates_input(self):
+        """Test already converted allocations are not converted twice"""
+        item = self.create_item_via_view("ConvertTwice", "desc")
+        self.post_update(item.id, in_value=2, serials=["CT1", "CT2"])
+        self.post_update(item.id, allocated=2, serials=["CT1", "CT2"], dr_no="DR-CT")
+        url = reverse("convert_allocations_to_out")
+
+        self.assertEqual(self.client.post(url, {}).status_code, 400)
+        self.assertEqual(self.client.post(url, {"dr_no": "DR-CT"}).status_code, 200)
+        self.assertEqual(self.client.post(url, {"dr_no": "DR-CT"}).status_code, 404)
+        self.assertEqual(ItemUpdate.objects.filter(item=item, transaction_type="OUT").count(), 1)
+
+    def test_undo_converted_out_uses_source_allocation_link(self):
+        """Test undo restores the source allocation even after the remarks were edited"""
+        item = self.create_item_via_view("LinkedConvert", "desc")
+        self.post_update(item.id, in_value=2, serials=["LC1", "LC2"])
+        self.post_update(item.id, allocated=2, serials=["LC1", "LC2"])
+        allocation = ItemUpdate.objects.get(item=item, transaction_type="ALLOCATED")
+        self.client.post(reverse("convert_allocate_to_out", args=[allocation.id]))
+
+        out = ItemUpdate.objects.get(item=item, transaction_type="OUT")
+        self.assertEqual(out.source_allocation_id, allocation.id)
+        out.remarks = "Shipped to site"
+        out.save(update_fields=["remarks"])
+        self.client.post(reverse("undo_transaction", args=[out.id]))
+
+        allocation.refresh_from_db()
+        self.assertFalse(allocation.is_converted)
+        item.refresh_from_db()
+        self.assertEqual((item.total_stock, item.allocated_quantity), (2, 2))
+
+    def test_backfill_links_legacy_converted_outs(self):
+        """Test the data migration parses legacy remarks into source_allocation"""
+        backfill = import_module("inventory.migrations.0029_backfill_source_allocation")
+        item = Item.objects.create(item_name="Legacy", total_stock=5, user=self.user)
+        other = Item.objects.create(item_name="Other", total_stock=5, user=self.user)
+        allocation = ItemUpdate.objects.create(item=item, transaction_type="ALLOCATED", allocated_quantity=1, user=self.user)
+        legacy = ItemUpdate.objects.create(
+            item=item, transaction_type="OUT", quantity=1, remarks=f"Converted from ALLOCATED #{allocation.id}", user=self.user
+        )
+        mismatched = ItemUpdate.objects.create(
+            item=other, transaction_type="OUT", quantity=1, remarks=f"Converted from ALLOCATED #{allocation.id}", user=self.user
+        )
+
+        backfill.link_converted_outs(apps, None)
+
+        legacy.refresh_from_db()
+        mismatched.refresh_from_db()
+        self.assertEqual(legacy.source_allocation_id, allocation.id)
+        self.assertIsNone(mismatched.source_allocation_id)
+
+    def test_backdated_recompute_only_replays_from_transaction_date(self):
+        """Test a backdated entry is replayed from the previous snapshot onwards"""
+        item = self.create_item_via_view("Incremental", "desc")
+        today = timezone.localdate()
+        self.post_update(item.id, in_value=2, serials=["IN1", "IN2"], date=today - timedelta(days=4))
+        self.post_update(item.id, in_value=1, serials=["IN3"], date=today)
+
+        self.post_update(item.id, out_value=1, serials=["IN1"], date=today - timedelta(days=2))
+
+        snapshots = list(ItemUpdate.objects.filter(item=item).order_by("date").values_list("stock_after_transaction", flat=True))
+        self.assertEqual(snapshots, [2, 1, 2])
+        item.refresh_from_db()
+        self.assertEqual(item.total_stock, 2)
+
+    def test_serial_numbers_normalized_on_save(self):
+        """Test JSON-string and comma-separated serial payloads are stored as lists"""
+        item = Item.objects.create(item_name="Payloads", user=self.user)
+        as_json = ItemUpdate.objects.create(item=item, transaction_type="ALLOCATED", serial_numbers='["A1", " A2 "]')
+        as_csv = ItemUpdate.objects.create(item=item, transaction_type="ALLOCATED", serial_numbers="B1, ,B2")
+        blank = ItemUpdate.objects.create(item=item, transaction_type="ALLOCATED", serial_numbers="  ")
+
+        for update in (as_json, as_csv, blank):
+            update.refresh_from_db()
+        self.assertEqual(as_json.serial_numbers, ["A1", "A2"])
+        self.assertEqual(as_csv.serial_numbers, ["B1", "B2"])
+        self.assertIsNone(blank.serial_numbers)
+
+    def test_normalize_migration_rewrites_legacy_serials(self):
+        """Test the data migration rewrites payloads saved before normalization"""
+        normalize = import_module("inventory.migrations.0032_normalize_serial_numbers")
+        item = Item.objects.create(item_name="Legacy Serials", user=self.user)
+        update = ItemUpdate.objects.create(item=item, transaction_type="ALLOCATED")
+        ItemUpdate.objects.filter(pk=update.pk).update(serial_numbers="L1,L2")  # bypasses save()
+
+        normalize.normalize_serial_numbers(apps, None)
+
+        update.refresh_from_db()
+        self.assertEqual(update.serial_numbers, ["L1", "L2"])
+
+    def test_item_history_query_count_does_not_grow_with_rows(self):
+        """Test the history page costs the same number of queries for 1 or 10 rows"""
+        item = Item.objects.create(item_name="Busy", user=self.user)
+        ItemUpdate.objects.create(item=item, transaction_type="IN", quantity=1, serial_numbers=["S0"], user=self.user)
+        url = reverse("item_history", args=[item.id])
+        self.client.get(url)  # warm the session/user caches
+
+        with CaptureQueriesContext(connection) as single:
+            self.client.get(url)
+        for i in range(1, 10):
+            ItemUpdate.objects.create(item=item, transaction_type="IN", quantity=1, serial_numbers=[f"S{i}"], user=self.user)
+        with self.assertNumQueries(len(single.captured_queries)):
+            response = self.client.get(url)
+        self.assertContains(response, "View Serials (1)", count=10)
+
+
+class LedgerExportTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="exporter", password="testpass123", role="accounting", first_login=False)
+        self.client.force_login(self.user)
+        self.item = Item.objects.create(item_name="Export Item", description="desc", user=self.user)
+        self.other = Item.objects.create(item_name="Other Item", description="desc", user=self.user)
+
+    def add(self, item, transaction_type, quantity, days_ago=0, **extra):
+        return ItemUpdate.objects.create(
+            item=item,
+            transaction_type=transaction_type,
+            quantity=quantity,
+            date=timezone.now() - timedelta(days=days_ago),
+            user=self.user,
+            **extra,
+        )
+
+    def read_csv(self, resp):
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(resp.streaming)
+        text = b"".join(resp.streaming_content).decode("utf-8-sig")
+        return list(csv.DictReader(io.StringIO(text)))
+
+    def test_item_history_export_streams_csv_oldest_first(self):
+        self.add(self.item, "IN", 5, days_ago=2, serial_numbers=["E1", "E2"], po_supplier="SUP-1")
+        self.add(self.item, "OUT", 2, days_ago=1, dr_no="DR-9")
+        self.add(self.other, "IN", 7)
+
+        resp = self.client.get(reverse("export_item_history", args=[self.item.id]))
+        self.assertIn("item-%d-history.csv" % self.item.id, resp["Content-Disposition"])
+
+        rows = self.read_csv(resp)
+        self.assertEqual([r["Type"] for r in rows], ["IN", "OUT"])
+        self.assertEqual(rows[0]["Serial Numbers"], "E1, E2")
+        self.assertEqual(rows[0]["Transaction By"], "exporter")
+        self.assertEqual(rows[1]["DR No."], "DR-9")
+
+    def test_item_history_export_includes_archived_rows(self):
+        self.add(self.item, "IN", 5, days_ago=900)
+        self.add(self.item, "OUT", 1, days_ago=850, dr_no="DR-OLD")
+        self.add(self.item, "IN", 3, days_ago=1)
+        call_command("archive_ledger", stdout=io.StringIO())
+
+        rows = self.read_csv(self.client.get(reverse("export_item_history", args=[self.item.id])))
+
+        self.assertEqual([(r["Type"], r["Quantity"]) for r in rows], [("IN", "5"), ("OUT", "1"), ("BALANCE", "4"), ("IN", "3")])
+        self.assertEqual(rows[1]["DR No."], "DR-OLD")
+
+    def test_ledger_export_filters_by_date_type_and_po(self):
+        self.add(self.item, "IN", 5, days_ago=10, po_client="PO-A")
+        self.add(self.item, "OUT", 1, days_ago=1, po_client="PO-A")
+        self.add(self.other, "OUT", 3, days_ago=1, po_client="PO-B")
+        self.add(self.other, "IN", 4, days_ago=1, po_supplier="po-a")
+
+        start = (timezone.localdate() - timedelta(days=3)).strftime("%Y-%m-%d")
+        rows = self.read_csv(self.client.get(reverse("export_ledger"), {"start": start, "po": "po-a"}))
+        self.assertEqual(sorted(r["Type"] for r in rows), ["IN", "OUT"])
+
+        rows = self.read_csv(self.client.get(reverse("export_ledger"), {"start": start, "type": "out"}))
+        self.assertEqual(sorted(r["P.O To Client"] for r in rows), ["PO-A", "PO-B"])
+
+    def test_ledger_export_includes_archived_rows_in_range(self):
+        self.add(self.item, "IN", 5, days_ago=900, po_client="PO-ARC")
+        self.add(self.other, "OUT", 1, days_ago=850, po_client="PO-ARC")
+        self.add(self.item, "OUT", 2, days_ago=1, po_client="PO-ARC")
+        call_command("archive_ledger", stdout=io.StringIO())
+
+        start = (timezone.localdate() - timedelta(days=880)).strftime("%Y-%m-%d")
+        end = (timezone.localdate() - timedelta(days=10)).strftime("%Y-%m-%d")
+        rows = self.read_csv(self.client.get(reverse("export_ledger"), {"start": start, "end": end, "po": "po-arc"}))
+
+        self.assertEqual([(r["Item"], r["Type"], r["Quantity"]) for r in rows], [("Other Item", "OUT", "1")])
+
+    def test_xlsx_export_over_the_sheet_limit_points_to_csv(self):
+        self.add(self.item, "IN", 5)
+        self.add(self.item, "OUT", 1)
+
+        with mock.patch("inventory.exports.Workbook") as workbook, mock.patch("inventory.exports.XLSX_MAX_ROWS", 2):
+            resp = self.client.get(reverse("export_ledger"), {"format": "xlsx"})
+
+        self.assertEqual(resp.status_code, 400)
+        self.assertIn("format=csv", resp.content.decode())
+        workbook.assert_not_called()
+
+    def test_ledger_export_rejects_bad_parameters(self):
+        self.assertEqual(self.client.get(reverse("export_ledger"), {"start": "yesterday"}).status_code, 400)
+        self.assertEqual(self.client.get(reverse("export_ledger"), {"type": "LOST"}).status_code, 400)
+        self.assertEqual(self.client.get(reverse("export_ledger"), {"format": "pdf"}).status_code, 400)
+
+    def test_export_requires_login(self):
+        self.client.logout()
+        self.assertEqual(self.client.get(reverse("export_ledger")).status_code, 302)
+
+
+class InventorySnapshotExportTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="erp", password="testpass123", role="accounting", first_login=False)
+        self.client.force_login(self.user)
+        self.cable = Item.objects.create(item_name="Cable", total_stock=3, allocated_quantity=1, part_no="C-1", user=self.user)
+        self.glue = Item.objects.create(item_name="Glue", total_stock=4, unit_of_quantity="cans", user=self.user)
+        self.gone = Item.objects.create(item_name="Gone", total_stock=1, is_deleted=True, user=self.user)
+        for sn, available in (("C2", True), ("C1", True), ("C3", False)):
+            ItemSerial.objects.create(item=self.cable, serial_no=sn, is_available=available)
+        ItemSerial.objects.create(item=self.gone, serial_no="G1")
+
+    def export(self, **params):
+        resp = self.client.get(reverse("export_inventory"), params)
+        self.assertEqual(resp.status_code, 200)
+        return b"".join(resp.streaming_content).decode("utf-8-sig")
+
+    def test_csv_snapshot_lists_live_items_with_available_serials(self):
+        rows = list(csv.DictReader(io.StringIO(self.export())))
+        self.assertEqual([r["Item"] for r in rows], ["Cable", "Glue"])
+        self.assertEqual(rows[0]["Available Serials"], "C1, C2")
+        self.assertEqual(rows[0]["Allocated"], "1")
+        self.assertEqual(rows[1]["Unit"], "cans")
+        self.assertEqual(rows[1]["Available Serials"], "")
+
+    def test_jsonl_snapshot_flattened_one_line_per_serial(self):
+        records = [json.loads(line) for line in self.export(format="jsonl", flatten="1").splitlines()]
+        self.assertEqual([(r["item_name"], r["serial_no"]) for r in records], [("Cable", "C1"), ("Cable", "C2"), ("Glue", None)])
+        self.assertEqual(records[0]["part_no"], "C-1")
+
+    def test_jsonl_snapshot_nests_serials(self):
+        records = [json.loads(line) for line in self.export(format="jsonl").splitlines()]
+        self.assertEqual(records[0]["available_serials"], ["C1", "C2"])
+
+    def test_unknown_snapshot_format_rejected(self):
+        self.assertEqual(self.client.get(reverse("export_inventory"), {"format": "xml"}).status_code, 400)
+
+
+class StaticAssetPipelineTests(TestCase):
+    def setUp(self):
+        self.static_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.static_root, ignore_errors=True)
+        settings_override = override_settings(STATIC_ROOT=self.static_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        call_command("collectstatic", interactive=False, verbosity=0)
+
+    def test_collectstatic_writes_hashed_and_compressed_copies(self):
+        hashed = staticfiles_storage.stored_name("css/inventory.css")
+        self.assertRegex(hashed, r"^css/inventory\.[0-9a-f]{12}\.css$")
+        self.assertTrue(staticfiles_storage.exists(hashed))
+        self.assertTrue(staticfiles_storage.exists(hashed + ".gz"))
+
+    def test_static_tag_uses_hashed_name_and_tolerates_missing_files(self):
+        self.assertIn(staticfiles_storage.stored_name("js/inventory.js"), staticfiles_storage.url("js/inventory.js"))
+        self.assertEqual(staticfiles_storage.url("css/does-not-exist.css"), "/static/css/does-not-exist.css")
+
+    def test_hashed_file_served_precompressed_and_immutable(self):
+        hashed = staticfiles_storage.stored_name("css/inventory.css")
+        resp = self.client.get(f"/static/{hashed}", HTTP_ACCEPT_ENCODING="gzip, deflate")
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp["Content-Encoding"], "gzip")
+        self.assertEqual(resp["Content-Type"], "text/css")
+        self.assertIn("immutable", resp["Cache-Control"])
+        self.assertIn("Accept-Encoding", resp["Vary"])
+
+    def test_unhashed_file_must_revalidate(self):
+        resp = self.client.get("/static/css/inventory.css")
+        self.assertEqual(resp.status_code, 200)
+        self.assertNotIn("Content-Encoding", resp)
+        self.assertIn("no-cache", resp["Cache-Control"])
+
+    def test_unhashed_file_revalidates_with_304(self):
+        first = self.client.get("/static/css/inventory.css")
+        self.assertIn("ETag", first)
+        self.assertIn("Last-Modified", first)
+
+        by_etag = self.client.get("/static/css/inventory.css", HTTP_IF_NONE_MATCH=first["ETag"])
+        by_date = self.client.get("/static/css/inventory.css", HTTP_IF_MODIFIED_SINCE=first["Last-Modified"])
+
+        self.assertEqual((by_etag.status_code, by_date.status_code), (304, 304))
+        self.assertEqual(by_etag.content, b"")
+        self.assertIn("no-cache", by_etag["Cache-Control"])
+
+    def test_path_traversal_is_rejected(self):
+        resp = self.client.get("/static/../manage.py")
+        self.assertEqual(resp.status_code, 404)
+
+
+class LedgerArchiveTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="archivist", password="testpass123", role="superadmin", first_login=False)
+        self.client.force_login(self.user)
+        self.item = Item.objects.create(item_name="Archive Item", description="desc", user=self.user)
+
+    def add(self, transaction_type, quantity, days_ago, **extra):
+        field = "allocated_quantity" if transaction_type == "ALLOCATED" else "quantity"
+        update = ItemUpdate.objects.create(item=self.item, transaction_type=transaction_type, user=self.user, **{field: quantity}, **extra)
+        ItemUpdate.objects.filter(pk=update.pk).update(date=timezone.now() - timedelta(days=days_ago))
+        return update
+
+    def test_archive_carries_balance_forward(self):
+        """Test old rows move to the archive and a BALANCE row keeps totals unchanged"""
+        self.add("IN", 10, days_ago=900)
+        self.add("OUT", 4, days_ago=850)
+        undone = self.add("OUT", 1, days_ago=800, undone=True)
+        open_allocation = self.add("ALLOCATED", 2, days_ago=800)
+        converted = self.add("ALLOCATED", 1, days_ago=790, is_converted=True)
+        self.add("OUT", 1, days_ago=5, source_allocation=converted)
+        self.add("IN", 3, days_ago=2)
+        TransactionHistory.objects.create(item=self.item, user=self.user, action_type="in", quantity=10)
+        TransactionHistory.objects.filter(item=self.item).update(timestamp=timezone.now() - timedelta(days=900))
+        before = recalculate_item_stock(self.item)
+
+        call_command("archive_ledger", stdout=io.StringIO())
+
+        self.item.refresh_from_db()
+        self.assertEqual((self.item.total_stock, self.item.allocated_quantity), before)
+        self.assertEqual(ArchivedItemUpdate.objects.filter(item=self.item).count(), 3)
+        self.assertTrue(ArchivedItemUpdate.objects.filter(pk=undone.pk, undone=True).exists())
+        balance = ItemUpdate.objects.get(item=self.item, transaction_type="BALANCE")
+        self.assertEqual(balance.quantity, 6)
+        # Rows the live ledger still needs are kept
+        self.assertTrue(ItemUpdate.objects.filter(pk__in=[open_allocation.pk, converted.pk]).count() == 2)
+        self.assertEqual(ArchivedTransactionHistory.objects.filter(item=self.item).count(), 1)
+        self.assertFalse(TransactionHistory.objects.filter(item=self.item).exists())
+
+        # A second run has nothing new to archive and keeps the balance row
+        call_command("archive_ledger", stdout=io.StringIO())
+        self.assertEqual(ItemUpdate.objects.filter(item=self.item, transaction_type="BALANCE").get().pk, balance.pk)
+
+    def test_archive_refreshes_derived_tables_once_per_item(self):
+        """Test the archive delete skips the per-row receivers and refreshes each table once"""
+        for days_ago in (900, 899, 898):
+            self.add("IN", 2, days_ago=days_ago, po_client="PO-ARC", dr_no="DR-ARC", location="Cebu")
+        before = (DeliveryReceipt.objects.get().line_count, ItemLocationBalance.objects.get().quantity)
+
+        with (
+            mock.patch.object(DeliveryReceipt, "refresh", wraps=DeliveryReceipt.refresh) as refresh_receipts,
+            mock.patch.object(ItemLocationBalance, "refresh", wraps=ItemLocationBalance.refresh) as refresh_balances,
+        ):
+            call_command("archive_ledger", stdout=io.StringIO())
+
+        self.assertEqual(ArchivedItemUpdate.objects.filter(item=self.item).count(), 3)
+        self.assertEqual((refresh_receipts.call_count, refresh_balances.call_count), (1, 1))
+        self.assertEqual((DeliveryReceipt.objects.get().line_count, ItemLocationBalance.objects.get().quantity), before)
+
+    def test_item_history_pages_into_archive(self):
+        """Test history pages continue with archived rows after the live window"""
+        for days_ago in range(900, 895, -1):
+            self.add("IN", 1, days_ago=days_ago)
+        for days_ago in range(9, 0, -1):
+            self.add("IN", 1, days_ago=days_ago)
+        call_command("archive_ledger", stdout=io.StringIO())
+
+        first = self.client.get(reverse("item_history", args=[self.item.id]))
+        second = self.client.get(reverse("item_history", args=[self.item.id]), {"page": 2})
+
+        # 9 live rows + BALANCE, then the 5 archived rows
+        self.assertEqual(first.context["page_obj"].paginator.count, 15)
+        self.assertFalse(any(u.is_archived for u in first.context["page_obj"]))
+        self.assertEqual(first.context["page_obj"][-1].transaction_type, "BALANCE")
+        self.assertTrue(all(u.is_archived for u in second.context["page_obj"]))
+        self.assertEqual(len(second.context["page_obj"]), 5)
+
+    def test_balance_rows_cannot_be_undone(self):
+        self.add("IN", 5, days_ago=900)
+        call_command("archive_ledger", stdout=io.StringIO())
+        balance = ItemUpdate.objects.get(item=self.item, transaction_type="BALANCE")
+
+        response = self.client.post(reverse("undo_transaction", args=[balance.pk]), follow=True)
+
+        self.assertContains(response, "cannot be undone")
+        balance.refresh_from_db()
+        self.assertFalse(balance.undone)
+
+
+class DeliveryReceiptTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="receiver", password="testpass123", role="superadmin", first_login=False)
+        self.item = Item.objects.create(item_name="DR Item", description="desc", total_stock=20, user=self.user)
+
+    def add(self, transaction_type="OUT", po_client="PO-RCPT", dr_no="DR-001", **extra):
+        return ItemUpdate.objects.create(
+            item=self.item, transaction_type=transaction_type, quantity=1, po_client=po_client, dr_no=dr_no, user=self.user, **extra
+        )
+
+    def test_lines_with_differently_cased_refs_share_one_receipt(self):
+        first = self.add(date=timezone.now() - timedelta(days=2))
+        latest = self.add(po_client="po-rcpt ", dr_no="dr-001", remarks="second trip", location="Cebu")
+        self.add("ALLOCATED", date=timezone.now() - timedelta(days=1))
+
+        receipt = DeliveryReceipt.objects.get()
+        self.assertEqual((receipt.po_key, receipt.dr_key), ("po-rcpt", "dr-001"))
+        self.assertEqual((receipt.line_count, receipt.active_line_count), (3, 2))
+        self.assertEqual((receipt.first_date, receipt.last_date), (first.date, latest.date))
+        self.assertEqual((receipt.po_no, receipt.dr_no, receipt.remarks, receipt.location), ("po-rcpt", "dr-001", "second trip", "Cebu"))
+
+    def test_undo_and_delete_refresh_the_receipt(self):
+        update = self.add()
+        undo_updates([update], self.user)
+        self.assertEqual(DeliveryReceipt.objects.get().active_line_count, 0)
+
+        ItemUpdate.objects.filter(pk=update.pk).delete()
+        self.assertFalse(DeliveryReceipt.objects.exists())
+
+    def test_archived_lines_still_count(self):
+        update = self.add()
+        ItemUpdate.objects.filter(pk=update.pk).update(date=timezone.now() - timedelta(days=900))
+        self.add(dr_no="DR-002")
+
+        call_command("archive_ledger", stdout=io.StringIO())
+
+        self.assertTrue(ArchivedItemUpdate.objects.filter(pk=update.pk).exists())
+        self.assertEqual(DeliveryReceipt.objects.get(dr_key="dr-001").line_count, 1)
+
+    def test_lines_without_dr_have_no_receipt(self):
+        with self.assertNumQueries(0):
+            DeliveryReceipt.refresh([("PO-RCPT", ""), ("PO-RCPT", None)])
+        self.add(dr_no="")
+        self.assertFalse(DeliveryReceipt.objects.exists())
+
+
+class VerifyLedgerTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="auditor", password="testpass123", role="superadmin", first_login=False)
+        self.item = Item.objects.create(item_name="Audited Item", description="desc", user=self.user)
+        self.other = Item.objects.create(item_name="Clean Item", description="desc", user=self.user)
+
+    def add(self, item, transaction_type, quantity):
+        return ItemUpdate.objects.create(item=item, transaction_type=transaction_type, quantity=quantity, user=self.user)
+
+    def verify(self, *args):
+        out = io.StringIO()
+        call_command("verify_ledger", "--workers", "1", "--range-size", "1", *args, stdout=out)
+        return out.getvalue()
+
+    def test_reports_then_repairs_drifted_counters_and_snapshots(self):
+        self.add(self.item, "IN", 10)
+        out_row = self.add(self.item, "OUT", 3)  # save() also counts the OUT as allocated
+        ItemUpdate.objects.filter(pk=out_row.pk).update(stock_after_transaction=9)
+        self.add(self.other, "IN", 2)
+        recalculate_item_stock(self.other)
+
+        with self.assertRaisesMessage(CommandError, "1 items drifted, 1 snapshot rows differ"):
+            self.verify()
+
+        output = self.verify("--fix")
+
+        self.assertIn(
+            "Item %d (Audited Item): total_stock 7 -> 7, allocated_quantity 3 -> 0, 1 snapshot rows differ" % self.item.id, output
+        )
+        self.assertIn("Repaired.", output)
+        self.item.refresh_from_db()
+        out_row.refresh_from_db()
+        self.assertEqual((self.item.total_stock, self.item.allocated_quantity, out_row.stock_after_transaction), (7, 0, 7))
+        self.assertIn("Checked 2 items and 3 ledger rows: 0 items drifted", self.verify())
+
+    def test_item_filter_limits_the_check(self):
+        self.add(self.item, "OUT", 1)
+
+        self.assertIn("Checked 1 items and 0 ledger rows: 0 items drifted", self.verify("--item", str(self.other.id)))
+
+
+class ItemLocationBalanceTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="keeper", password="testpass123", role="superadmin", first_login=False)
+        self.item = Item.objects.create(item_name="Sited Item", description="desc", total_stock=50, user=self.user)
+
+    def add(self, transaction_type, quantity, location, **extra):
+        field = "allocated_quantity" if transaction_type == "ALLOCATED" else "quantity"
+        return ItemUpdate.objects.create(
+            item=self.item, transaction_type=transaction_type, location=location, user=self.user, **{field: quantity}, **extra
+        )
+
+    def balance(self, name):
+        return ItemLocationBalance.objects.get(item=self.item, location__key=Location.key_for(name))
+
+    def test_names_differing_in_case_and_spacing_share_a_location(self):
+        self.add("IN", 10, "Cebu  Warehouse")
+        self.add("OUT", 3, " cebu warehouse")
+        self.add("IN", 1, "")
+
+        location = Location.objects.get()
+        self.assertEqual((location.name, location.key), ("Cebu Warehouse", "cebu warehouse"))
+        self.assertEqual(self.balance("Cebu Warehouse").quantity, 7)
+        self.assertEqual(ItemUpdate.objects.filter(site__isnull=True).count(), 1)
+
+    def test_write_undo_and_convert_keep_balances_current(self):
+        self.add("IN", 10, "Davao")
+        out = self.add("OUT", 4, "Davao")
+        allocation = self.add("ALLOCATED", 2, "Davao")
+        self.assertEqual((self.balance("Davao").quantity, self.balance("Davao").allocated_quantity), (6, 2))
+
+        undo_updates([out], self.user)
+        self.assertEqual(self.balance("Davao").quantity, 10)
+
+        convert_allocations([allocation], self.user)
+        self.assertEqual((self.balance("Davao").quantity, self.balance("Davao").allocated_quantity), (8, 0))
+
+    def test_writes_and_deletes_apply_deltas_without_recomputing_the_pair(self):
+        self.add("IN", 10, "Davao")
+        ItemLocationBalance.objects.update(quantity=100)  # a recompute would undo this
+
+        with mock.patch.object(ItemLocationBalance, "refresh") as refresh:
+            out = self.add("OUT", 4, "Davao")
+            allocation = self.add("ALLOCATED", 2, "Davao")
+            undo_updates([out], self.user)
+            convert_allocations([allocation], self.user)
+            out.delete()
+
+        refresh.assert_not_called()
+        self.assertEqual((self.balance("Davao").quantity, self.balance("Davao").allocated_quantity), (98, 0))
+
+    def test_deleting_the_last_line_drops_the_balance(self):
+        update = self.add("IN", 5, "Manila")
+
+        update.delete()
+
+        self.assertFalse(ItemLocationBalance.objects.exists())
+
+    def test_editing_the_location_moves_the_line(self):
+        update = self.add("IN", 5, "Manila")
+        update.location = "Iloilo"
+        update.save()
+
+        self.assertEqual(self.balance("Iloilo").quantity, 5)
+        self.assertFalse(ItemLocationBalance.objects.filter(location__key="manila").exists())
+
+    def test_rebuild_matches_incremental_balances(self):
+        self.add("IN", 5, "Manila")
+        self.add("OUT", 2, "Manila")
+        self.add("ALLOCATED", 1, "Cebu")
+        expected = list(ItemLocationBalance.objects.order_by("id").values("location", "item", "quantity", "allocated_quantity"))
+        ItemLocationBalance.objects.update(quantity=0, allocated_quantity=0)
+        ItemLocationBalance.objects.create(item=self.item, location=Location.for_name("Nowhere"))
+
+        out = io.StringIO()
+        call_command("rebuild_location_balances", stdout=out)
+
+        self.assertEqual(
+            list(ItemLocationBalance.objects.order_by("id").values("location", "item", "quantity", "allocated_quantity")), expected
+        )
+        self.assertIn("removed 1 stale", out.getvalue())
+
+    def test_item_history_lists_stock_per_location(self):
+        self.add("IN", 5, "Manila")
+        self.client.force_login(self.user)
+
+        response = self.client.get(reverse("item_history", args=[self.item.id]))
+
+        self.assertEqual([(b.location.name, b.quantity) for b in response.context["location_balances"]], [("Manila", 5)])
+
+
+class LedgerPartitionTests(TestCase):
+    def test_month_ranges_cover_year_boundary(self):
+        ranges = list(partition_ledger.month_ranges(date(2025, 11, 15), date(2026, 1, 1)))
+        self.assertEqual(
+            ranges,
+            [
+                (date(2025, 11, 1), date(2025, 12, 1)),
+                (date(2025, 12, 1), date(2026, 1, 1)),
+                (date(2026, 1, 1), date(2026, 2, 1)),
+            ],
+        )
+
+    @skipUnless(connection.vendor == "postgresql", "partitioning needs PostgreSQL")
+    def test_rows_stranded_in_the_default_partition_move_to_their_month(self):
+        user = User.objects.create_user(username="partitioner", password="testpass123")
+        item = Item.objects.create(item_name="Partitioned", user=user)
+        call_command("partition_ledger", "--convert", "--months-ahead", "1", stdout=io.StringIO())
+        later = timezone.now() + timedelta(days=150)
+        row = TransactionHistory.objects.create(item=item, user=user, action_type="in", quantity=1)
+        TransactionHistory.objects.filter(pk=row.pk).update(timestamp=later)
+
+        call_command("partition_ledger", "--months-ahead", "6", stdout=io.StringIO())
+
+        table = TransactionHistory._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT tableoid::regclass::text FROM {table} WHERE id = %s", [row.pk])
+            self.assertEqual(cursor.fetchone()[0], f"{table}_p{later:%Y%m}")
+
+    @skipIf(connection.vendor == "postgresql", "partitioning is only refused on other databases")
+    def test_command_refuses_non_postgres_databases(self):
+        with self.assertRaisesMessage(CommandError, "requires PostgreSQL"):
+            call_command("partition_ledger", "--convert")
+
+
+class LargeTableAdminTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser(username="root", password="testpass123", role="superadmin", first_login=False)
+        self.client.force_login(self.admin)
+        self.item = Item.objects.create(item_name="Cable", user=self.admin)
+
+    def add_updates(self, n):
+        for i in range(n):
+            item = Item.objects.create(item_name=f"Item {i}", user=self.admin)
+            ItemUpdate.objects.create(item=item, transaction_type="IN", quantity=1, user=self.admin)
+
+    def test_itemupdate_changelist_query_count_does_not_grow_with_rows(self):
+        url = reverse("admin:inventory_itemupdate_changelist")
+        self.add_updates(1)
+        self.client.get(url)  # warm the session/user caches
+
+        with CaptureQueriesContext(connection) as baseline:
+            self.client.get(url)
+        self.add_updates(5)
+        with self.assertNumQueries(len(baseline.captured_queries)):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+
+    def test_itemupdate_date_drilldown_and_autocomplete(self):
+        ItemUpdate.objects.create(item=self.item, transaction_type="IN", quantity=1, user=self.admin)
+        today = timezone.localdate()
+        url = reverse("admin:inventory_itemupdate_changelist")
+
+        response = self.client.get(url, {"date__year": today.year, "date__month": today.month})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["cl"].result_count, 1)
+
+        response = self.client.get(reverse("admin:inventory_itemupdate_add"))
+        self.assertContains(response, "admin-autocomplete")
+
+    def test_estimated_paginator_only_estimates_large_unfiltered_listings(self):
+        class PlannerSays50k(EstimatedCountPaginator):
+            def planner_estimate(self, queryset):
+                return 50_000
+
+        unfiltered = PlannerSays50k(Item.objects.all(), 10)
+        self.assertEqual((unfiltered.count, unfiltered.is_estimated), (50_000, True))
+
+        filtered = PlannerSays50k(Item.objects.filter(item_name="Cable"), 10)
+        self.assertEqual((filtered.count, filtered.is_estimated), (1, False))
+
+        base_listing = PlannerSays50k(Item.objects.filter(is_deleted=False), 10, estimate_filtered=True)
+        self.assertEqual((base_listing.count, base_listing.is_estimated, base_listing.num_pages), (50_000, True, 5_000))
+
+        exact = EstimatedCountPaginator(Item.objects.all(), 10)
+        if connection.vendor != "postgresql":
+            self.assertIsNone(estimated_row_count(Item))
+            self.assertEqual((exact.count, exact.is_estimated), (1, False))
+
+    def test_item_history_pages_inside_live_rows_skip_the_count(self):
+        for _ in range(3):
+            ItemUpdate.objects.create(item=self.item, transaction_type="IN", quantity=1, user=self.admin)
+        history = ItemHistory(self.item.updates.order_by("-date"), self.item.archived_updates.order_by("-date"))
+
+        with self.assertNumQueries(1):
+            self.assertEqual(len(history[0:2]), 2)
+        with self.assertNumQueries(2):  # short live page, then the archive
+            self.assertEqual(len(history[2:4]), 1)
+        # One item's history is a filtered result: never a planner estimate
+        paginator = EstimatedCountPaginator(history, 1)
+        self.assertEqual((paginator.count, paginator.is_estimated), (3, False))
+
+
+def unmirror_replica(testcase):
+    """Route to the replica's test mirror like to a real replica for the rest of ``testcase``."""
+    testcase.enterContext(mock.patch("inventory.replicas.replica_configured", return_value=True))
+
+
+WITH_REPLICA = {"DATABASES": {**settings.DATABASES, REPLICA_ALIAS: {**settings.DATABASES["default"], "HOST": "replica.internal"}}}
+
+
+class ReadReplicaTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="reader", password="testpass123", role="superadmin", first_login=False)
+        self.factory = RequestFactory()
+
+    @override_settings(**WITH_REPLICA)
+    def test_replica_is_skipped_for_writes_and_pinned_browsers(self):
+        self.assertEqual(replica_alias(self.factory.get("/")), REPLICA_ALIAS)
+        self.assertIsNone(replica_alias(self.factory.post("/")))
+        pinned = self.factory.get("/")
+        pinned.COOKIES[PIN_COOKIE] = "1"
+        self.assertIsNone(replica_alias(pinned))
+
+    @override_settings(DATABASES={"default": settings.DATABASES["default"]})
+    def test_primary_is_used_without_a_replica(self):
+        self.assertIsNone(replica_alias(self.factory.get("/")))
+
+    @override_settings(**WITH_REPLICA)
+    def test_router_sends_only_decorated_reads_to_replica(self):
+        def aliases():
+            return JsonResponse([router.db_for_read(Item), router.db_for_read(Session), router.db_for_write(Item)], safe=False)
+
+        @use_replica
+        def view(request):
+            return aliases()
+
+        @use_replica
+        async def aview(request):
+            return aliases()
+
+        expected = [REPLICA_ALIAS, "default", "default"]
+        self.assertEqual(json.loads(view(self.factory.get("/")).content), expected)
+        self.assertEqual(json.loads(asyncio.run(aview(self.factory.get("/"))).content), expected)
+        self.assertEqual(router.db_for_read(Item), "default")
+
+    @override_settings(**WITH_REPLICA, REPLICA_PIN_SECONDS=7)
+    def test_writes_pin_the_browser_to_primary(self):
+        self.client.force_login(self.user)
+
+        self.assertNotIn(PIN_COOKIE, self.client.get(reverse("search_by_po")).cookies)
+        response = self.client.post(reverse("add_item"), {"item": "Pinned", "description": "desc", "unit_of_quantity": "pcs"})
+
+        self.assertEqual(response.cookies[PIN_COOKIE]["max-age"], 7)
+
+
+@skipUnless(REPLICA_ALIAS in settings.DATABASES, "needs a replica database alias (e.g. POSTGRES_REPLICA_HOST)")
+class ReplicaRoutingTests(TransactionTestCase):
+    """Runs against a real second alias; the test replica mirrors the default database."""
+
+    databases = {"default", REPLICA_ALIAS} if REPLICA_ALIAS in settings.DATABASES else {"default"}
+
+    def setUp(self):
+        unmirror_replica(self)
+        self.user = User.objects.create_user(username="reader", password="testpass123", role="superadmin", first_login=False)
+
+    def test_listing_and_export_read_from_replica(self):
+        Item.objects.create(item_name="Replicated", description="desc", user=self.user)
+        self.client.force_login(self.user)
+        self.client.get(reverse("inventory"))  # warm up the session and user cache
+
+        with CaptureQueriesContext(connections[REPLICA_ALIAS]) as replica, CaptureQueriesContext(connection) as primary:
+            self.client.get(reverse("inventory"))
+            b"".join(self.client.get(reverse("export_ledger")).streaming_content)
+        self.assertTrue(any("inventory_item" in q["sql"] for q in replica.captured_queries))
+        self.assertTrue(any("inventory_itemupdate" in q["sql"] for q in replica.captured_queries))
+        self.assertFalse(any("inventory_item" in q["sql"] for q in primary.captured_queries))
+
+        self.client.cookies[PIN_COOKIE] = "1"
+        with CaptureQueriesContext(connections[REPLICA_ALIAS]) as replica:
+            self.client.get(reverse("inventory"))
+        self.assertEqual(replica.captured_queries, [])
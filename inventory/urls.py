@@ -19,9 +19,10 @@ from django.conf import settings
 from django.conf.urls.static import static
 from django.contrib import admin
 from django.shortcuts import redirect
-from django.urls import include, path
+from django.urls import include, path, re_path
 
 from . import views as inventory_views  # inventory app views
+from .staticfiles import serve_static
 
 urlpatterns = [
     # Inventory-related
@@ -40,11 +41,16 @@ urlpatterns = [
         inventory_views.undo_transaction,
         name="undo_transaction",
     ),
+    path("transactions/undo/", inventory_views.undo_transactions, name="undo_transactions"),
     path(
         "convert_allocate_to_out/<int:update_id>/",
         inventory_views.convert_allocate_to_out,
         name="convert_allocate_to_out",
     ),
+    path("allocations/convert/", inventory_views.convert_allocations_to_out, name="convert_allocations_to_out"),
+    path("item/<int:item_id>/history/export/", inventory_views.export_item_history, name="export_item_history"),
+    path("ledger/export/", inventory_views.export_ledger, name="export_ledger"),
+    path("inventory/export/", inventory_views.export_inventory, name="export_inventory"),
     path("search-by-po/", inventory_views.search_by_po, name="search_by_po"),
     path("ajax/search-po/", inventory_views.ajax_search_po, name="ajax_search_po"),
     # Core app (dashboard, admin page)
@@ -53,6 +59,8 @@ urlpatterns = [
     path("accounts/", include("accounts.urls")),
     # Django admin
     path("admin/", admin.site.urls),
+    # Hashed static files with long-lived cache headers (runserver serves sources itself in DEBUG)
+    re_path(r"^%s(?P<path>.*)$" % settings.STATIC_URL.lstrip("/"), serve_static, name="static"),
     # Redirect root to login
     path("", lambda request: redirect("login")),
 ]
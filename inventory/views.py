@@ -1,5 +1,4 @@
 import json
-import re
 import traceback
 from datetime import datetime, timedelta
 
@@ -9,14 +8,33 @@ from django.contrib.auth.decorators import login_required, user_passes_test
 from django.core.paginator import Paginator
 from django.db import transaction
 from django.db.models import Prefetch, Q
-from django.http import JsonResponse
+from django.db.models.functions import Lower, Trim
+from django.http import HttpResponse, JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django.template.loader import render_to_string
 from django.utils import timezone
-
-from .models import Item, ItemSerial, ItemUpdate, TransactionHistory
-
-
+from django.views.decorators.http import require_POST
+
+from .exports import inventory_snapshot_response, ledger_export_response
+from .ledger import (
+    ItemHistory,
+    convert_allocations,
+    recalculate_item_stock,
+    undo_updates,
+)
+from .models import (
+    ArchivedItemUpdate,
+    Item,
+    ItemSerial,
+    ItemUpdate,
+    TransactionHistory,
+    normalize_ref,
+)
+from .pagination import EstimatedCountPaginator
+from .replicas import use_replica
+
+
+@use_replica
 @login_required
 def inventory_view(request):
     """
@@ -58,8 +76,8 @@ def inventory_view(request):
             | Q(user__last_name__icontains=search_query)  # Search by user last name
         ).distinct()  # Use distinct() to avoid duplicate results
 
-    # Paginate results (10 items per page)
-    paginator = Paginator(items, 10)
+    # Paginate results (10 items per page); the unsearched listing may use the planner's estimate
+    paginator = EstimatedCountPaginator(items, 10, estimate_filtered=not search_query)
     page_number = request.GET.get("page", 1)
     page_obj = paginator.get_page(page_number)
 
@@ -69,51 +87,46 @@ def inventory_view(request):
         {
             "page_obj": page_obj,
             "search_query": search_query,  # Pass search query to template
-            "total_items": items.count(),  # Total count for reference
+            "total_items": paginator.count,  # Total count for reference (estimated for large listings)
         },
     )
 
 
+@use_replica
 @login_required
 def item_history(request, item_id):
     """
     Display the transaction history for a specific item.
 
     This view lists all ItemUpdate records associated with the
-    specified item, ordered by most recent date.
+    specified item, ordered by most recent date. Once the live rows run
+    out, pages continue into the item's archived rows. The item's stock per
+    location is shown above them.
     """
 
     # Get the item by its ID, or return a 404 if not found
     item = get_object_or_404(Item, id=item_id)
 
     # Get the updates related to the item, ordered by most recent
-    updates = item.updates.all().order_by("-date")
+    # serial_numbers is stored as a list, so rows render as-is; the user join
+    # keeps the page at a fixed number of queries
+    updates = ItemHistory(
+        item.updates.select_related("user").order_by("-date"),
+        item.archived_updates.select_related("user").order_by("-date"),
+    )
 
-    # Pagination (10 updates per page)
+    # Pagination (10 updates per page), always with the exact count
     paginator = Paginator(updates, 10)
     page_number = request.GET.get("page")
     page_obj = paginator.get_page(page_number)
 
-    # Ensure serial_numbers are always a list (safe for template rendering)
-    for update in page_obj.object_list:  # iterate over the paginated updates
-        if isinstance(update.serial_numbers, str):
-            try:
-                import json
-
-                update.serial_numbers = json.loads(update.serial_numbers)
-            except json.JSONDecodeError:
-                update.serial_numbers = [s.strip() for s in update.serial_numbers.split(",") if s.strip()]
-        elif update.serial_numbers is None:
-            update.serial_numbers = []
-        elif not isinstance(update.serial_numbers, list):
-            update.serial_numbers = list(update.serial_numbers)
-
     return render(
         request,
         "inventory/item_history.html",
         {
             "item": item,
             "page_obj": page_obj,  # paginated updates
+            "location_balances": item.location_balances.select_related("location").order_by("location__name"),
         },
     )
 
@@ -196,32 +209,6 @@ def updateitem_view(request, item_id):
         list(item.serial_numbers.filter(is_available=True).values_list("serial_no", flat=True)) if hasattr(item, "serial_numbers") else []
     )
 
-    # Helper: recompute running stock
-    def recalculate_item_stock(item):
-        total = 0
-        allocated = 0
-        updates = item.updates.filter(undone=False).order_by("date")  # only active transactions
-        for update in updates:
-            if update.transaction_type == "IN":
-                total += update.quantity
-            elif update.transaction_type == "OUT":
-                total -= update.quantity
-            elif update.transaction_type == "ALLOCATED":
-                # Only count allocations that have NOT been converted to OUT
-                if not getattr(update, "is_converted", False):
-                    allocated += update.allocated_quantity
-
-            total = max(total, 0)
-            allocated = max(allocated, 0)
-            update.stock_after_transaction = total
-            update.allocated_after_transaction = allocated
-            update.save(update_fields=["stock_after_transaction", "allocated_after_transaction"])
-
-        item.total_stock = total
-        item.allocated_quantity = allocated
-        item.save(update_fields=["total_stock", "allocated_quantity"])
-        return total, allocated
-
     if request.method == "POST":
         try:
             in_value = int(request.POST.get("in", 0) or 0)
@@ -400,30 +387,6 @@ def delete_item(request, item_id):
     return redirect("inventory")
 
 
-def parse_serials(serial_data):
-    """Ensure serial_numbers from ItemUpdate are returned as a clean Python list."""
-    if not serial_data:
-        return []
-
-    if isinstance(serial_data, list):
-        return serial_data
-
-    if isinstance(serial_data, str):
-        try:
-            import json
-
-            data = json.loads(serial_data)
-            if isinstance(data, list):
-                return [s.strip() for s in data if s.strip()]
-            else:
-                # fallback if comma-separated string
-                return [s.strip() for s in serial_data.split(",") if s.strip()]
-        except json.JSONDecodeError:
-            return [s.strip() for s in serial_data.split(",") if s.strip()]
-
-    return []
-
-
 @login_required
 @transaction.atomic
 def undo_transaction(request, update_id):
@@ -433,76 +396,19 @@ def undo_transaction(request, update_id):
     Reverses the stock or allocation change caused by a previous ItemUpdate.
     A new ItemUpdate is logged to record the reversal.
     """
-    update = get_object_or_404(ItemUpdate, id=update_id)
+    update = get_object_or_404(ItemUpdate.objects.select_for_update(), id=update_id)
     item = update.item
 
-    try:
-        #  Revert IN transaction
-        if update.transaction_type == "IN":
-            item.total_stock = max(item.total_stock - update.quantity, 0)
-            item.save(update_fields=["total_stock"])
-
-            # Remove serials added by this transaction
-            if update.serial_numbers:
-                serials = parse_serials(update.serial_numbers)
-                ItemSerial.objects.filter(item=item, serial_no__in=serials).delete()
-
-        #  Revert OUT transaction
-        elif update.transaction_type == "OUT":
-            item.total_stock += update.quantity
-            item.save(update_fields=["total_stock"])
-
-            # Mark this OUT as undone
-            update.undone = True
-            update.save(update_fields=["undone"])
-
-            # Make serials available again
-            if update.serial_numbers:
-                serials = parse_serials(update.serial_numbers)
-                ItemSerial.objects.filter(item=item, serial_no__in=serials).update(is_available=True)
-
-            #  If this OUT was converted from an ALLOCATED, restore it
-            if update.remarks and "Converted from ALLOCATED" in update.remarks:
-                match = re.search(r"ALLOCATED #(\d+)", update.remarks)
-                if match:
-                    allocate_id = match.group(1)
-                    try:
-                        allocate_txn = ItemUpdate.objects.get(id=allocate_id, transaction_type="ALLOCATED")
-                        allocate_txn.is_converted = False  # restore flag
-                        allocate_txn.save(update_fields=["is_converted"])
-                    except ItemUpdate.DoesNotExist:
-                        pass  # silently skip if not found
-
-                # Return quantity to allocated pool
-                item.allocated_quantity += update.quantity
-                item.save(update_fields=["allocated_quantity"])
-
-        #  Revert ALLOCATED transaction
-        elif update.transaction_type == "ALLOCATED":
-            item.allocated_quantity = max(item.allocated_quantity - update.allocated_quantity, 0)
-            item.save(update_fields=["allocated_quantity"])
-
-        #  Serial availability correction
-        if update.serial_numbers:
-            serials = parse_serials(update.serial_numbers)
-            if update.remarks and "Converted from ALLOCATED" in update.remarks:
-                # If this was a converted OUT, serials revert to allocated (unavailable)
-                ItemSerial.objects.filter(item=item, serial_no__in=serials).update(is_available=False)
-            else:
-                # Normal OUT undo — make serials available
-                ItemSerial.objects.filter(item=item, serial_no__in=serials).update(is_available=True)
-
-        #  Log in transaction history
-        TransactionHistory.objects.create(
-            item=item,
-            user=request.user,
-            action_type="undo",
-            quantity=update.quantity or update.allocated_quantity,
-            previous_stock=item.total_stock,
-            new_stock=item.total_stock,
-            remarks=f"Reverted {update.transaction_type} transaction (ID: {update_id})",
-        )
+    if update.undone:
+        messages.warning(request, "This transaction has already been reverted.")
+        return redirect("item_history", item_id=item.id)
+
+    if update.transaction_type == "BALANCE":
+        messages.warning(request, "A carried-forward balance cannot be undone.")
+        return redirect("item_history", item_id=item.id)
 
+    try:
+        undo_updates([update], request.user)
         messages.success(request, f"{update.transaction_type} transaction successfully reverted.")
         return redirect("item_history", item_id=item.id)
 
@@ -514,6 +420,93 @@ def undo_transaction(request, update_id):
         return redirect("item_history", item_id=item.id)
 
 
+def _batch_request_data(request):
+    """
+    Read ``ids``, ``dr_no`` and ``po_client`` from a JSON or form request body.
+
+    Returns:
+        tuple[dict | None, JsonResponse | None]: The parsed values, or a 400
+        response describing the problem.
+    """
+    if request.content_type == "application/json":
+        try:
+            data = json.loads(request.body or b"{}")
+        except json.JSONDecodeError:
+            data = None
+        if not isinstance(data, dict):
+            return None, JsonResponse({"success": False, "error": "Invalid JSON body."}, status=400)
+        ids = data.get("ids") or []
+        dr_no = str(data.get("dr_no") or "").strip()
+        po_client = str(data.get("po_client") or "").strip()
+    else:
+        ids = request.POST.getlist("ids")
+        dr_no = request.POST.get("dr_no", "").strip()
+        po_client = request.POST.get("po_client", "").strip()
+
+    try:
+        ids = [int(pk) for pk in ids]
+    except (TypeError, ValueError):
+        return None, JsonResponse({"success": False, "error": "Transaction ids must be integers."}, status=400)
+
+    return {"ids": ids, "dr_no": dr_no, "po_client": po_client}, None
+
+
+def _on_refs(updates, dr_no=None, po_client=None):
+    """
+    Narrow ``updates`` to the lines of a DR and/or client P.O., matched like ``normalize_ref``.
+
+    The DR goes through the ``lower(dr_no)`` index; as there, the spelling
+    given is looked up too, since ``lower()`` keeps surrounding whitespace.
+    """
+    if dr_no:
+        updates = updates.alias(dr_lower=Lower("dr_no")).filter(dr_lower__in={normalize_ref(dr_no), dr_no.lower()})
+    if po_client:
+        updates = updates.alias(po_normalized=Trim(Lower("po_client"))).filter(po_normalized=normalize_ref(po_client))
+    return updates
+
+
+@login_required
+@require_POST
+@transaction.atomic
+def undo_transactions(request):
+    """
+    Undo many transactions at once (e.g. every line of a mistyped DR).
+
+    Accepts a JSON or form body with either ``ids`` (a list of ItemUpdate ids)
+    or ``dr_no`` (optionally narrowed by ``po_client``). Serial availability is
+    fixed with set-based updates and each affected item is recomputed once.
+
+    Returns:
+        JsonResponse: The reverted ids and the affected item ids, or an error.
+    """
+    data, error = _batch_request_data(request)
+    if error:
+        return error
+    ids, dr_no, po_client = data["ids"], data["dr_no"], data["po_client"]
+
+    if bool(ids) == bool(dr_no):
+        return JsonResponse({"success": False, "error": "Provide either transaction ids or a DR number."}, status=400)
+
+    updates = ItemUpdate.objects.select_for_update().filter(undone=False)
+    if ids:
+        updates = updates.filter(id__in=ids)
+    else:
+        updates = _on_refs(updates, dr_no, po_client)
+
+    updates = list(updates.order_by("date", "id"))
+    if not updates:
+        return JsonResponse({"success": False, "error": "No matching transactions to undo."}, status=404)
+
+    reverted = undo_updates(updates, request.user)
+    return JsonResponse(
+        {
+            "success": True,
+            "undone": [u.id for u in reverted],
+            "items": sorted({u.item_id for u in reverted}),
+        }
+    )
+
+
 @login_required
 def transaction_history_view(request, item_id):
     """
@@ -556,85 +549,7 @@ def convert_allocate_to_out(request, update_id):
         return redirect("item_history", item_id=item.id)
 
     try:
-        # Extract allocation details
-        quantity = allocate_update.allocated_quantity or 0
-        serials = []
-        if allocate_update.serial_numbers:
-            if isinstance(allocate_update.serial_numbers, str):
-                try:
-                    serials = json.loads(allocate_update.serial_numbers)
-                except json.JSONDecodeError:
-                    serials = [s.strip() for s in allocate_update.serial_numbers.split(",") if s.strip()]
-            elif isinstance(allocate_update.serial_numbers, list):
-                serials = allocate_update.serial_numbers
-
-        # Create OUT transaction (do NOT manually touch item totals here)
-        ItemUpdate.objects.create(
-            item=item,
-            transaction_type="OUT",
-            quantity=quantity,
-            allocated_quantity=0,
-            serial_numbers=serials or None,
-            date=timezone.now(),
-            location=allocate_update.location,
-            remarks=f"Converted from ALLOCATED #{allocate_update.id}",
-            dr_no=allocate_update.dr_no,
-            po_supplier=allocate_update.po_supplier,
-            po_client=allocate_update.po_client,
-            user=request.user,
-            updated_by_user=request.user.username,
-        )
-
-        # Mark the allocate as converted
-        allocate_update.is_converted = True
-        allocate_update.save(update_fields=["is_converted"])
-
-        # Mark serials unavailable if any
-        if serials:
-            ItemSerial.objects.filter(item=item, serial_no__in=serials).update(is_available=False)
-
-        #  Canonical recalculation of item totals
-        # Walk all non-undone updates in chronological order and recompute
-        total = 0
-        allocated = 0
-        updates_qs = item.updates.filter(undone=False).order_by("date")
-
-        for u in updates_qs:
-            if u.transaction_type == "IN":
-                total += u.quantity or 0
-            elif u.transaction_type == "OUT":
-                total -= u.quantity or 0
-            elif u.transaction_type == "ALLOCATED":
-                # Only count allocations that are NOT converted to OUT
-                if not getattr(u, "is_converted", False):
-                    allocated += u.allocated_quantity or 0
-
-            # keep non-negative running totals
-            total = max(total, 0)
-            allocated = max(allocated, 0)
-
-            # update snapshot fields per-update (helpful for auditing)
-            u.stock_after_transaction = total
-            u.allocated_after_transaction = allocated
-            u.save(update_fields=["stock_after_transaction", "allocated_after_transaction"])
-
-        # Persist canonical totals on Item
-        item.total_stock = total
-        item.allocated_quantity = allocated
-        item.date_last_modified = timezone.now()
-        item.save(update_fields=["total_stock", "allocated_quantity", "date_last_modified"])
-
-        # Log conversion in TransactionHistory (previous vs new stock)
-        TransactionHistory.objects.create(
-            item=item,
-            user=request.user,
-            action_type="out",
-            quantity=quantity,
-            previous_stock=total + quantity,  # before deduction (approx)
-            new_stock=total,
-            remarks=f"Converted from ALLOCATED (ID: {allocate_update.id})",
-        )
-
+        convert_allocations([allocate_update], request.user)
         messages.success(request, "ALLOCATED transaction converted to OUT successfully!")
         return redirect("item_history", item_id=item.id)
 
@@ -644,6 +559,47 @@ def convert_allocate_to_out(request, update_id):
         return redirect("item_history", item_id=item.id)
 
 
+@login_required
+@require_POST
+@transaction.atomic
+def convert_allocations_to_out(request):
+    """
+    Convert many ALLOCATED transactions to OUT at once (e.g. when a project ships).
+
+    Accepts a JSON or form body with ``ids`` (a list of ItemUpdate ids) and/or
+    ``dr_no`` and ``po_client`` filters. Only open allocations are converted;
+    each affected item is recomputed once.
+
+    Returns:
+        JsonResponse: The converted allocation ids, the new OUT ids and the
+        affected item ids, or an error.
+    """
+    data, error = _batch_request_data(request)
+    if error:
+        return error
+
+    allocations = ItemUpdate.objects.select_for_update().filter(transaction_type="ALLOCATED", is_converted=False, undone=False)
+    if data["ids"]:
+        allocations = allocations.filter(id__in=data["ids"])
+    allocations = _on_refs(allocations, data["dr_no"], data["po_client"])
+    if not (data["ids"] or data["dr_no"] or data["po_client"]):
+        return JsonResponse({"success": False, "error": "Provide transaction ids, a DR number or a client P.O."}, status=400)
+
+    allocations = list(allocations.order_by("date", "id"))
+    if not allocations:
+        return JsonResponse({"success": False, "error": "No open allocations match."}, status=404)
+
+    outs = convert_allocations(allocations, request.user)
+    return JsonResponse(
+        {
+            "success": True,
+            "converted": [a.id for a in allocations],
+            "out": [u.id for u in outs],
+            "items": sorted({a.item_id for a in allocations}),
+        }
+    )
+
+
 def search_by_po(request):
     """
     Search inventory transactions by Purchase Order (PO) number.
@@ -653,23 +609,101 @@ def search_by_po(request):
     return render(request, "inventory/search_po.html")
 
 
-def ajax_search_po(request):
+@use_replica
+async def ajax_search_po(request):
     """
     Handle AJAX requests for searching Purchase Orders.
 
     Returns a partial HTML snippet (`po_table_rows.html`) containing
-    filtered ItemUpdate results for dynamic frontend updates.
+    filtered ItemUpdate results for dynamic frontend updates. Rows are
+    fetched with the async ORM before rendering, so the template never
+    touches the database.
     """
     query = request.GET.get("q", "").strip()
     updates = []
 
     if query:
-        updates = (
+        matches = (
             ItemUpdate.objects.filter(Q(po_supplier__icontains=query) | Q(po_client__icontains=query) | Q(dr_no__icontains=query))
             .filter(Q(po_supplier__gt="") | Q(po_client__gt=""))
             .select_related("item", "user")
             .order_by("-date")
         )
+        updates = [update async for update in matches]
 
     html = render_to_string("inventory/po_table_rows.html", {"updates": updates, "query": query})
     return JsonResponse({"html": html})
+
+
+@use_replica
+@login_required
+def export_item_history(request, item_id):
+    """
+    Download the full transaction history of one item as CSV or XLSX.
+
+    Rows are exported oldest first and streamed straight from the database:
+    the archived rows, then the live ledger, as on the history page.
+    """
+    item = get_object_or_404(Item, id=item_id)
+    updates = item.updates.order_by("date", "id")
+    archived = item.archived_updates.order_by("date", "id")
+    return ledger_export_response(request, updates, f"item-{item.id}-history", archived=archived)
+
+
+@use_replica
+@login_required
+def export_inventory(request):
+    """
+    Download the current inventory with each item's available serials.
+
+    Supports ``?format=csv`` (default) or ``?format=jsonl`` and ``?flatten=1``
+    for one line per serial, as used by the ERP import.
+    """
+    return inventory_snapshot_response(request)
+
+
+@use_replica
+@login_required
+def export_ledger(request):
+    """
+    Download the global transaction ledger as CSV or XLSX.
+
+    Optional query parameters:
+        start, end: Inclusive local dates (YYYY-MM-DD) bounding the transaction date.
+        type: Transaction type (IN, OUT or ALLOCATED).
+        po: Supplier or client P.O. number (case-insensitive exact match).
+
+    Archived rows matching the same filters are exported ahead of the live ones.
+    """
+    filters = Q()
+    tz = timezone.get_current_timezone()
+
+    try:
+        start = request.GET.get("start", "").strip()
+        if start:
+            start_date = datetime.strptime(start, "%Y-%m-%d")
+            filters &= Q(date__gte=timezone.make_aware(start_date, tz))
+
+        end = request.GET.get("end", "").strip()
+        if end:
+            end_date = datetime.strptime(end, "%Y-%m-%d") + timedelta(days=1)
+            filters &= Q(date__lt=timezone.make_aware(end_date, tz))
+    except ValueError:
+        return HttpResponse("Invalid date (expected YYYY-MM-DD).", status=400)
+
+    transaction_type = request.GET.get("type", "").strip().upper()
+    if transaction_type:
+        if transaction_type not in dict(ItemUpdate.TRANSACTION_TYPE):
+            return HttpResponse(f"Unknown transaction type '{transaction_type}'.", status=400)
+        filters &= Q(transaction_type=transaction_type)
+
+    po = request.GET.get("po", "").strip()
+    if po:
+        filters &= Q(po_client__iexact=po) | Q(po_supplier__iexact=po)
+
+    return ledger_export_response(
+        request,
+        ItemUpdate.objects.filter(filters).order_by("date", "id"),
+        f"ledger-{timezone.localdate():%Y%m%d}",
+        archived=ArchivedItemUpdate.objects.filter(filters).order_by("date", "id"),
+    )
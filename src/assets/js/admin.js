@@ -12,45 +12,36 @@ document.addEventListener('DOMContentLoaded', function () {
     let currentUserId = null;
 
     // ===========================
-    // SEARCH FUNCTIONALITY
+    // SEARCH FUNCTIONALITY (server-side, debounced)
     // ===========================
-    function searchUser() {
-        const filter = searchInput.value.toLowerCase().trim();
-        const rows = userTableBody.getElementsByTagName('tr');
-        let visibleCount = 0;
-
-        for (let row of rows) {
-            if (row.querySelector('.no-data') || row.classList.contains('no-results-row')) continue;
-            const cells = row.getElementsByTagName('td');
-            const searchableIndices = [1,2,3,4,5,6];
-            let found = false;
+    let searchTimeout;
 
-            for (let index of searchableIndices) {
-                if (cells[index] && cells[index].textContent.toLowerCase().includes(filter)) {
-                    found = true;
-                    break;
-                }
-            }
+    function searchUser() {
+        const value = searchInput.value.trim();
+        const url = new URL(window.location.href);
 
-            row.style.display = (found || filter === '') ? '' : 'none';
-            if (found) visibleCount++;
+        if (value) {
+            url.searchParams.set('search', value);
+        } else {
+            url.searchParams.delete('search');
         }
-
-        const noResultsRow = userTableBody.querySelector('.no-results-row');
-        if (visibleCount === 0 && filter !== '') {
-            if (!noResultsRow) {
-                const newRow = document.createElement('tr');
-                newRow.className = 'no-results-row';
-                newRow.innerHTML = '<td colspan="8" class="no-data">No matching users found.</td>';
-                userTableBody.appendChild(newRow);
-            }
-        } else if (noResultsRow) noResultsRow.remove();
+        url.searchParams.delete('page');
+        window.location.href = url.toString();
     }
 
     if (searchInput) {
-        searchInput.addEventListener('keyup', searchUser);
-        searchInput.addEventListener('input', searchUser);
-        searchInput.addEventListener('search', searchUser);
+        searchInput.addEventListener('keyup', (e) => {
+            if (e.key === 'Enter') return;
+            clearTimeout(searchTimeout);
+            searchTimeout = setTimeout(searchUser, 800);
+        });
+        searchInput.addEventListener('keypress', (e) => {
+            if (e.key === 'Enter') {
+                e.preventDefault();
+                clearTimeout(searchTimeout);
+                searchUser();
+            }
+        });
     }
 
     // ===========================
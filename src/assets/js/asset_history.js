@@ -0,0 +1,58 @@
+document.addEventListener("DOMContentLoaded", () => {
+    // Infinite scroll: fetch the next page of history as JSON and append it
+    const button = document.getElementById("loadMoreHistory");
+    const body = document.getElementById("assetHistoryBody");
+    if (!button || !body) return;
+
+    let loading = false;
+
+    function cell(text, fallback) {
+        const td = document.createElement("td");
+        td.textContent = text || fallback;
+        return td;
+    }
+
+    async function loadMore() {
+        if (loading || !button.dataset.cursor) return;
+        loading = true;
+        button.disabled = true;
+
+        try {
+            const params = new URLSearchParams({ format: "json", cursor: button.dataset.cursor });
+            const response = await fetch(`${button.dataset.url}?${params}`, { headers: { Accept: "application/json" } });
+            if (!response.ok) throw new Error(`HTTP ${response.status}`);
+            const data = await response.json();
+
+            data.results.forEach(update => {
+                const row = document.createElement("tr");
+                row.append(
+                    cell(update.transaction_date, "—"),
+                    cell(update.previous_user, "—"),
+                    cell(update.assigned_to, "—"),
+                    cell(update.remarks, "No remarks"),
+                    cell(update.updated_by, "System"),
+                );
+                body.appendChild(row);
+            });
+
+            if (data.next) {
+                button.dataset.cursor = data.next;
+                button.disabled = false;
+            } else {
+                button.remove();
+                observer.disconnect();
+            }
+        } catch (error) {
+            console.error("Failed to load asset history:", error);
+            button.disabled = false;
+        } finally {
+            loading = false;
+        }
+    }
+
+    const observer = new IntersectionObserver(entries => {
+        if (entries.some(entry => entry.isIntersecting)) loadMore();
+    });
+    observer.observe(button);
+    button.addEventListener("click", loadMore);
+});
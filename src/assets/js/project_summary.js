@@ -162,6 +162,8 @@ async function displayProjectDetails(projectId) {
     location.textContent = data.location || 'N/A';
     date.textContent = data.date || 'N/A';
 
+    renderProjectItems(data.items || []);
+
     // Clear any previous DRs
     list.innerHTML = '';
 
@@ -180,15 +182,19 @@ async function displayProjectDetails(projectId) {
             ? dr.images
             : (typeof dr.images === 'string' && dr.images.trim() !== '' ? [dr.images] : []);
 
+          const thumbnailList = Array.isArray(dr.thumbnails) ? dr.thumbnails : [];
+
           if (imageList.length > 0) {
             imagesHtml = '<div class="dr-images-gallery">';
-            imageList.forEach(imgUrl => {
+            imageList.forEach((imgUrl, index) => {
               const fullUrl = imgUrl.startsWith('http')
                 ? imgUrl
                 : `${window.location.origin}${imgUrl}`;
+              const thumbUrl = thumbnailList[index] || fullUrl;
               imagesHtml += `
                 <img 
-                  src="${fullUrl}" 
+                  src="${thumbUrl}" 
+                  data-full="${fullUrl}"
                   alt="DR ${dr.dr_no}" 
                   class="dr-image-preview"
                   onerror="this.style.display='none';"
@@ -214,7 +220,7 @@ async function displayProjectDetails(projectId) {
         `;
 
         // Add click event to open DR details
-        card.addEventListener('click', () => showDrDetails(dr.dr_no));
+        card.addEventListener('click', () => showDrDetails(dr.dr_no, data.id));
 
         // Append card to the list
         list.appendChild(card);
@@ -234,6 +240,39 @@ async function displayProjectDetails(projectId) {
 }
   
 
+// ===============================
+// Per-item Totals
+// ===============================
+
+function renderProjectItems(items) {
+  const body = document.getElementById('projectItemsBody');
+  if (!body) return;
+
+  body.innerHTML = '';
+  if (items.length === 0) {
+    body.innerHTML = '<tr><td colspan="4">No items for this project yet.</td></tr>';
+    return;
+  }
+
+  items.forEach(item => {
+    const row = document.createElement('tr');
+    const lastDr = item.last_dr_no ? `${item.last_dr_no}${item.last_dr_date ? ` (${item.last_dr_date})` : ''}` : 'N/A';
+    [
+      ['Item Name', item.item_name],
+      ['Shipped', `${item.shipped} ${item.unit_of_quantity}`],
+      ['Allocated (not yet out)', `${item.allocated} ${item.unit_of_quantity}`],
+      ['Last DR', lastDr],
+    ].forEach(([label, value]) => {
+      const cell = document.createElement('td');
+      cell.dataset.label = label;
+      cell.textContent = value;
+      row.appendChild(cell);
+    });
+    body.appendChild(row);
+  });
+}
+
+
 // ===============================
 // DR Details Modal Functionality
 // ===============================
@@ -249,11 +288,11 @@ if (closeDrModal) {
   });
 }
 
-async function showDrDetails(drNo) {
+async function showDrDetails(drNo, projectId) {
   try {
     const poClient = document.getElementById('projectPo').textContent.trim();
     const response = await fetch(
-      `/get_dr_details/${encodeURIComponent(drNo)}/?po_client=${encodeURIComponent(poClient)}`
+      `/get_dr_details/${encodeURIComponent(drNo)}/?project_id=${encodeURIComponent(projectId)}`
     );
 
     if (!response.ok) throw new Error(`HTTP ${response.status}`);
@@ -420,7 +459,7 @@ if (uploadDrForm) {
       }
 
       } else {
-        showNotification("Upload failed: ", "error");
+        showNotification(`Upload failed: ${data.error || ''}`, "error");
       }
     } catch (err) {
       console.error("Upload DR error:", err);
@@ -441,7 +480,7 @@ const closeImagePreview = document.getElementById('closeImagePreview');
 //When any DR image is clicked
 document.addEventListener('click', (e) => {
   if (e.target.classList.contains('dr-image-preview')) {
-    const src = e.target.src;
+    const src = e.target.dataset.full || e.target.src;
     previewImage.src = src;
     imagePreviewModal.style.display = 'flex';
   }